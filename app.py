@@ -1,45 +1,422 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, Response, abort, request, jsonify, stream_with_context
 from flask_cors import CORS
-from recommendation_system import recommend
+from recommendation_system import (MODES, iter_recommend, parse_request, rank_request, recommend, recommend_batch,
+                                   response_etag, result_cache, similar_cars)
+from static_assets import AssetStore
+from worker_pool import BoundedExecutor, Overloaded
+import instrumentation
+import score_engine
+import hmac
 import os
+import time
 
-app = Flask(__name__, static_folder='static', static_url_path='/static')
+# /static is served by serve_static() below, from memory
+app = Flask(__name__, static_folder=None)
 CORS(app)  # Enable CORS for all routes
 
-@app.route("/recommend", methods=["POST"])
-def recommend_api():
-    data = request.get_json()
+# Upper bound on queries accepted by one /recommend/batch call
+MAX_BATCH_QUERIES = 5000
+
+# Upper bound on ?top_k= for /similar
+MAX_SIMILAR_CARS = 100
+
+# Scoring threads and how many more requests may wait for one (gunicorn.conf.py
+# sets the thread count; 0 scores on the request thread itself)
+scoring_pool = BoundedExecutor(
+    workers=int(os.environ.get("MOTORMONY_SCORING_THREADS", "0")),
+    queue=int(os.environ.get("MOTORMONY_SCORING_QUEUE", "32"))
+)
+
+# /recommend responses may be kept this long by browsers and (s-maxage) by a
+# CDN; past that they are revalidated against their ETag
+RECOMMEND_CACHE_CONTROL = os.environ.get("MOTORMONY_RECOMMEND_CACHE_CONTROL", "public, max-age=60, s-maxage=300")
+
+# index.html is always revalidated so a deploy shows up at once; static/
+# files are not fingerprinted, so they are only kept for an hour
+INDEX_CACHE_CONTROL = "no-cache"
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+index_assets = AssetStore(BASE_DIR)
+static_assets = AssetStore(os.path.join(BASE_DIR, "static"))
+
+# Endpoints whose responses carry a Server-Timing header
+TIMED_ENDPOINTS = {"recommend_api", "recommend_batch_api", "similar_api"}
+
+
+@app.before_request
+def start_timing():
+    if instrumentation.ENABLED and request.endpoint in TIMED_ENDPOINTS:
+        request.environ["motormony.start"] = time.perf_counter()
+        instrumentation.begin_request()
+
 
-    if "query" not in data:
-        return jsonify({"error": "Missing 'query' field"}), 400
+@app.after_request
+def add_server_timing(response):
+    start = request.environ.get("motormony.start")
+    if start is not None:
+        timings = instrumentation.end_request()
+        timings.append(("total", time.perf_counter() - start))
+        instrumentation.record("total", timings[-1][1])
+        response.headers["Server-Timing"] = instrumentation.server_timing_header(timings)
+    return response
 
-    query_text = data["query"]
+
+def request_data():
+    """The JSON object in the request body; ValueError when there is none."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    return data
+
+
+def query_string_data():
+    """A GET /recommend query string as the equivalent JSON body."""
+    data = dict(request.args.items())
+    for name in ("top_k", "offset"):
+        if name in data:
+            try:
+                data[name] = int(data[name])
+            except ValueError:
+                raise ValueError(f"'{name}' must be an integer") from None
+    if "objectives" in data:
+        data["objectives"] = [name for name in data["objectives"].split(",") if name]
+    if "stream" in data:
+        # ?stream=0 or ?stream=false is the regular, cacheable JSON response
+        data["stream"] = data["stream"].lower() in ("1", "true")
+    return data
+
+
+def paging_args(data):
+    """(top_k, offset) from the request body, validated."""
     top_k = data.get("top_k", 100)  # Default to 100 cars to show more results
+    offset = data.get("offset", 0)  # Rank position to start from, for "next page" requests
+    for name, value, minimum in (("top_k", top_k, 1), ("offset", offset, 0)):
+        if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+            raise ValueError(f"'{name}' must be an integer >= {minimum}")
+    return top_k, offset
+
+
+def mode_args(data):
+    """(mode, objectives) from the request body, validated; see recommend()."""
+    mode = data.get("mode", "rank")
+    objectives = data.get("objectives")
+    if mode not in MODES:
+        raise ValueError(f"'mode' must be one of {', '.join(MODES)}")
+    if objectives is not None:
+        if mode != "pareto":
+            raise ValueError("'objectives' needs \"mode\": \"pareto\"")
+        if (not isinstance(objectives, list) or not objectives
+                or any(not isinstance(name, str) or name not in score_engine.OBJECTIVES for name in objectives)):
+            raise ValueError(f"'objectives' must be a list of: {', '.join(score_engine.OBJECTIVES)}")
+    return mode, objectives
+
+
+def encoded(payload):
+    with instrumentation.stage("encode"):
+        return jsonify(payload)
+
+
+def cacheable(response, etag, cache_control):
+    """Tag `response` for conditional requests and shared caches."""
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def not_modified(etag, cache_control):
+    return cacheable(Response(status=304), etag, cache_control)
+
+
+def overloaded():
+    return jsonify({"error": "Server busy, try again shortly"}), 503, {"Retry-After": "1"}
+
+
+def internal_error():
+    # Log the traceback here; clients only learn that the request failed
+    app.logger.exception("Error while handling %s", request.path)
+    return jsonify({"error": "Internal server error"}), 500
+
+
+def recommendation_payload(query_text, recommendation_data, offset=0):
+    """JSON body for one query, shared by /recommend and /recommend/batch."""
+    results = recommendation_data.get("results", [])
+    total_matches = recommendation_data.get("total_matches", 0)
+    next_offset = offset + len(results)
+    payload = {
+        "query": query_text,
+        "results": results,
+        "carpilot_suggestion": recommendation_data.get("carpilot_suggestion"),
+        "total_available": len(results),
+        "total_matches": total_matches,
+        "next_offset": next_offset if next_offset < total_matches else None,
+        "dataset_version": recommendation_data.get("dataset_version")
+    }
+    if "objectives" in recommendation_data:
+        payload["objectives"] = recommendation_data["objectives"]
+    return payload
+
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def wants_stream(data):
+    """Streaming is opt-in: {"stream": true} in the body, ?stream=1 or Accept: application/x-ndjson."""
+    if data.get("stream") is True:
+        return True
+    # Must be named explicitly; a bare */* keeps the regular JSON response
+    return any(mimetype == NDJSON_MIMETYPE and quality > 0 for mimetype, quality in request.accept_mimetypes)
+
+
+def stream_recommendations(query_text, top_k, offset, ranked_request):
+    """
+    Newline-delimited JSON: one event per line, each car sent as soon as it
+    is formatted. `ranked_request` is rank_request()'s result, ranked on the
+    scoring pool like any other request.
+    """
+    def generate():
+        total_matches = 0
+        try:
+            for event in iter_recommend(query_text, top_k=top_k, offset=offset, ranked_request=ranked_request):
+                if event["type"] == "meta":
+                    event["query"] = query_text
+                    total_matches = event["total_matches"]
+                elif event["type"] == "end":
+                    next_offset = offset + event["total_available"]
+                    event["next_offset"] = next_offset if next_offset < total_matches else None
+                yield app.json.dumps(event) + "\n"
+        except Exception:
+            app.logger.exception("Error while streaming recommendations for %r", query_text)
+            yield app.json.dumps({"type": "error", "error": "Internal server error"}) + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+    # GET /recommend answers JSON or NDJSON by Accept; the stream itself is never cached
+    response.headers["Cache-Control"] = "no-store"
+    response.vary.add("Accept")
+    return response
+
 
+@app.route("/recommend", methods=["GET", "POST"])
+def recommend_api():
+    """
+    POST a JSON body, or GET /recommend?query=...&top_k=...&mode=pareto&objectives=price,safety.
+    GET responses carry an ETag and Cache-Control so browsers and CDNs can
+    keep them; a matching If-None-Match gets a 304 without ranking anything.
+    """
+    try:
+        data = query_string_data() if request.method == "GET" else request_data()
+        if "query" not in data:
+            return jsonify({"error": "Missing 'query' field"}), 400
+        query_text = data["query"]
+        if not isinstance(query_text, str):
+            raise ValueError("'query' must be a string")
+        top_k, offset = paging_args(data)
+        mode, objectives = mode_args(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        if wants_stream(data):
+            ranked_request = scoring_pool.run(rank_request, query_text, top_k=top_k, offset=offset, mode=mode,
+                                              objectives=objectives)
+            return stream_recommendations(query_text, top_k, offset, ranked_request)
+
+        if request.method != "GET":
+            recommendation_data = scoring_pool.run(recommend, query_text, top_k=top_k, offset=offset, mode=mode,
+                                                   objectives=objectives)
+            return encoded(recommendation_payload(query_text, recommendation_data, offset))
+
+        parsed = parse_request(query_text, mode, objectives)
+        etag = response_etag(query_text, parsed[1], top_k, offset, parsed[0])
+        if request.if_none_match.contains_weak(etag):
+            response = not_modified(etag, RECOMMEND_CACHE_CONTROL)
+        else:
+            recommendation_data = scoring_pool.run(recommend, query_text, top_k=top_k, offset=offset, parsed=parsed)
+            response = encoded(recommendation_payload(query_text, recommendation_data, offset))
+            cacheable(response, etag, RECOMMEND_CACHE_CONTROL)
+        # The same URL streams NDJSON to clients that ask for it
+        response.vary.add("Accept")
+        return response
+
+    except Overloaded:
+        return overloaded()
+    except Exception:
+        return internal_error()
+
+
+@app.route("/recommend/batch", methods=["POST"])
+def recommend_batch_api():
     try:
-        recommendation_data = recommend(query_text, top_k=top_k)
-        return jsonify({
-            "query": query_text,
-            "results": recommendation_data.get("results", []),
-            "carpilot_suggestion": recommendation_data.get("carpilot_suggestion"),
-            "total_available": len(recommendation_data.get("results", []))
+        data = request_data()
+        queries = data.get("queries")
+        if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+            raise ValueError("'queries' must be a list of strings")
+        if len(queries) > MAX_BATCH_QUERIES:
+            raise ValueError(f"At most {MAX_BATCH_QUERIES} queries per batch")
+        top_k, offset = paging_args(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        batch = scoring_pool.run(recommend_batch, queries, top_k=top_k, offset=offset)
+        return encoded({
+            "results": [
+                recommendation_payload(query_text, recommendation_data, offset)
+                for query_text, recommendation_data in zip(queries, batch)
+            ]
         })
 
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    except Overloaded:
+        return overloaded()
+    except Exception:
+        return internal_error()
+
+
+@app.route("/similar")
+def similar_api():
+    """Cars like ?name=Acura MDX, closest first; ?top_k= sets how many (default 10, at most MAX_SIMILAR_CARS)."""
+    name = request.args.get("name", "").strip()
+    if not name:
+        return jsonify({"error": "Missing 'name' parameter"}), 400
+    top_k = request.args.get("top_k", 10, type=int)
+    if top_k is None or not 1 <= top_k <= MAX_SIMILAR_CARS:
+        return jsonify({"error": f"'top_k' must be an integer from 1 to {MAX_SIMILAR_CARS}"}), 400
+
+    try:
+        similar = scoring_pool.run(similar_cars, name, top_k=top_k)
+    except Overloaded:
+        return overloaded()
+    except Exception:
+        return internal_error()
+
+    if similar is None:
+        return jsonify({"error": f"No car named {name!r}"}), 404
+    return encoded({"query": name, **similar})
+
+
+@app.route("/metrics")
+def metrics():
+    """Stage latency histograms, result cache counters and dataset info in Prometheus text format."""
+    cache = result_cache.stats()
+    dataset = score_engine.current_dataset()
+    rankings = dataset.rankings.memory_report()
+    extra = [
+        ("motormony_result_cache_hits_total", "counter", "Result cache lookups that hit.", cache["hits"]),
+        ("motormony_result_cache_misses_total", "counter", "Result cache lookups that missed.", cache["misses"]),
+        ("motormony_result_cache_evictions_total", "counter", "Entries evicted by the size bound.", cache["evictions"]),
+        ("motormony_result_cache_expirations_total", "counter", "Entries dropped after their TTL.", cache["expirations"]),
+        ("motormony_result_cache_entries", "gauge", "Entries currently cached.", cache["size"]),
+        ("motormony_dataset_cars", "gauge", "Cars in the loaded catalogue.", len(dataset.features)),
+        ("motormony_dataset_generation", "gauge", "Catalogue loads in this process.", dataset.generation),
+        ("motormony_dataset_bytes", "gauge", "Memory held by the catalogue's columns and feature matrix.",
+         dataset.catalogue.memory_report()["bytes"]),
+        ("motormony_intent_rankings_tables", "gauge", "Intent combinations with a precomputed order.", rankings["tables"]),
+        ("motormony_intent_rankings_bytes", "gauge", "Memory held by the precomputed orders.", rankings["bytes"])
+    ]
+    return Response(instrumentation.render_prometheus(extra), mimetype="text/plain; version=0.0.4")
+
+
+def is_admin():
+    """True when the X-Admin-Token header matches MOTORMONY_ADMIN_TOKEN."""
+    token = os.environ.get("MOTORMONY_ADMIN_TOKEN")
+    return bool(token) and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token)
+
+
+@app.route("/admin/reload", methods=["POST"])
+def reload_dataset_api():
+    """
+    Reload the catalogue without restarting. Needs the MOTORMONY_ADMIN_TOKEN
+    value in an X-Admin-Token header. Only reaches the worker that serves the
+    call; the other workers pick up file changes through the data file watcher.
+    Pass ?wait=1 to reload synchronously and get the new version back.
+    """
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+
+    if request.args.get("wait"):
+        try:
+            dataset = score_engine.load_dataset()
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        return jsonify({"status": "reloaded", "dataset_version": dataset.version})
+
+    started = score_engine.reload_in_background()
+    return jsonify({
+        "status": "reloading" if started else "reload already in progress",
+        "dataset_version": score_engine.current_dataset().version
+    }), 202
+
+
+@app.route("/admin/listings", methods=["POST"])
+def add_listings_api():
+    """
+    Fold new raw listings ({"listings": [{"make", "model", "body", "year",
+    "condition", "sellingprice"}, ...]}) into the catalogue on disk and
+    serve the result from this worker right away. Other workers pick the
+    new files up through the data file watcher. Needs the admin token.
+    """
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+
+    try:
+        listings = request_data().get("listings")
+        if not isinstance(listings, list) or not all(isinstance(item, dict) for item in listings):
+            raise ValueError("'listings' must be a list of objects")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # The ETL and pandas are only needed here, off the request path; a
+        # serving-only install (requirements.txt, Vercel) has neither
+        import pandas as pd
+        import dataset_updates
+    except ImportError:
+        return jsonify({"error": "Listing updates are not available on this deployment; "
+                                 "they need the ETL modules and requirements-dev.txt"}), 501
+
+    columns = ["make", "model", "body", "year", "condition", "sellingprice"]
+    try:
+        # update_catalogue() locks the data files against other workers
+        delta = dataset_updates.update_catalogue(pd.DataFrame(listings, columns=columns), score_engine.DATA_PATH)
+        dataset = score_engine.apply_delta(delta)
+    except OSError:
+        app.logger.exception("Could not write the catalogue files")
+        return jsonify({"error": "The catalogue files are not writable on this deployment"}), 503
+    except Exception:
+        return internal_error()
+
+    return jsonify({
+        "status": "updated",
+        "inserted": len(delta.inserted),
+        "updated": len(delta.changed) - len(delta.inserted),
+        "rescaled": delta.rescaled,
+        "dataset_version": dataset.version
+    })
+
+
+def asset_response(asset, cache_control):
+    """The smallest encoding of `asset` the client accepts, or 304 when its copy is current."""
+    if asset is None:
+        abort(404)
+    encoding, body, etag = asset.variant(request.accept_encodings)
+    if request.if_none_match.contains_weak(etag):
+        response = not_modified(etag, cache_control)
+    else:
+        response = cacheable(Response(body, mimetype=asset.mimetype), etag, cache_control)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
 
 
 @app.route("/")
 def home():
-    try:
-        return send_file('index.html')
-    except:
-        return send_from_directory('.', 'index.html')
+    return asset_response(index_assets.get("index.html"), INDEX_CACHE_CONTROL)
 
 
 @app.route("/static/<path:filename>")
 def serve_static(filename):
-    return send_from_directory('static', filename)
+    return asset_response(static_assets.get(filename), STATIC_CACHE_CONTROL)
 
 
 # Export for Vercel
@@ -0,0 +1,651 @@
+"""
+Benchmarks for the recommendation pipeline.
+
+Usage:
+    python benchmark.py [parser] [materialise] [pipeline] [etl] [names] [similar] [pareto] [store] [serving]
+        [--sizes 500,50000,1000000] [--output report.json]
+        [--compare baseline.json] [--tolerance 1.5]
+
+`pipeline` times every stage of a /recommend call (parsing, scoring,
+compute_scores, materialisation and the Flask endpoint) over the query
+corpus, on synthetic catalogues of each size. With --compare, any timing
+more than `tolerance` times slower than the baseline report fails the run.
+`etl` reports rows per second of normalize_car_prices.py per worker count.
+`names` times the brand/model name index on 1M synthetic names.
+`similar` reports latency and recall of the similar-cars index against an
+exact scan for each catalogue size.
+`store` compares the memory of the compact catalogue with the same data as
+a pandas DataFrame, and the peak allocation per request of each.
+`serving` load tests /recommend under the old `gunicorn app:app` and under
+gunicorn.conf.py: requests per second and p50/p99 latency.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from query_corpus import QUERIES
+
+# -------- TIMING HELPERS ------------
+
+
+def measure(fn, repeat=5, number=100):
+    """
+    Call fn() `number` times per round for `repeat` rounds.
+    Returns per-call timings in microseconds and calls per second.
+    """
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+
+    best = min(rounds)
+    return {
+        "best_us": best * 1e6,
+        "median_us": statistics.median(rounds) * 1e6,
+        "per_sec": 1.0 / best if best else float("inf")
+    }
+
+# -------- PARSER ------------
+
+
+def bench_parser(queries=QUERIES, repeat=5, number=50):
+    """Throughput of parse_query over the query corpus."""
+    from intent_parser import parse_query
+
+    def run():
+        for query in queries:
+            parse_query(query)
+
+    stats = measure(run, repeat=repeat, number=number)
+    return {
+        "queries": len(queries),
+        "us_per_query": stats["best_us"] / len(queries),
+        "queries_per_sec": stats["per_sec"] * len(queries)
+    }
+
+
+# -------- RESULT MATERIALISATION ------------
+
+
+def bench_materialise(top_ks=(10, 100, 1000), repeat=5, number=20):
+    """Cost per result of format_results() for pages of different sizes."""
+    import score_engine
+    from intent_parser import parse_query
+    from recommendation_system import format_results
+
+    dataset = score_engine.current_dataset()
+    params = parse_query("Family friendly 5 seater car under 12 lakhs with petrol engine")
+    report = {}
+    for top_k in top_ks:
+        rows, scores, _ = score_engine.rank(params["intents"], top_k=top_k, dataset=dataset)
+        stats = measure(lambda: format_results(rows, scores, params, dataset), repeat=repeat, number=number)
+        report[f"top_{top_k}"] = {
+            "results": len(rows),
+            "us_per_page": stats["best_us"],
+            "us_per_result": stats["best_us"] / max(len(rows), 1)
+        }
+    return report
+
+
+# -------- SYNTHETIC CATALOGUES ------------
+
+DEFAULT_SIZES = (500, 50_000, 1_000_000)
+
+
+def synthetic_catalogue(size, seed=0):
+    """A generated catalogue of `size` listings (see generate_catalogue.py) as a Catalogue."""
+    from dataset_store import Catalogue
+    from generate_catalogue import generate_catalogue
+
+    frame = generate_catalogue(size, seed=seed)
+    data = {col: frame[col].to_numpy() for col in frame.columns}
+    return Catalogue(data, frame.columns, checksum=f"synthetic-{size}-{seed}")
+
+# -------- END-TO-END PIPELINE ------------
+
+
+def _per_query(fn, queries, repeat):
+    """Median and best microseconds per query of fn(query) over the corpus."""
+    def run():
+        for query in queries:
+            fn(query)
+
+    stats = measure(run, repeat=repeat, number=1)
+    return {
+        "median_us": stats["median_us"] / len(queries),
+        "best_us": stats["best_us"] / len(queries)
+    }
+
+
+def bench_pipeline(sizes=DEFAULT_SIZES, queries=QUERIES, repeat=3, top_k=10):
+    """
+    Per-query latency of each /recommend stage on synthetic catalogues.
+    The real catalogue is put back once every size has been measured.
+    """
+    import score_engine
+    from app import app
+    from intent_parser import parse_query
+    from recommendation_system import format_results, recommend, result_cache
+
+    original = score_engine.current_dataset()
+    parsed = {query: parse_query(query) for query in queries}
+    client = app.test_client()
+
+    def rank(query, dataset):
+        params = parsed[query]
+        return score_engine.rank(
+            params["intents"],
+            budget=params.get("budget"),
+            min_seats=params.get("min_seats"),
+            fuel_type=params.get("fuel_type"),
+            body_type=params.get("body_type"),
+            top_k=top_k,
+            dataset=dataset
+        )
+
+    def compute_scores(query):
+        params = parsed[query]
+        score_engine.compute_scores(
+            params["intents"],
+            budget=params.get("budget"),
+            min_seats=params.get("min_seats"),
+            fuel_type=params.get("fuel_type"),
+            body_type=params.get("body_type"),
+            top_k=top_k
+        )
+
+    def cold_recommend(query):
+        result_cache.clear()
+        recommend(query, top_k=top_k)
+
+    def endpoint(query):
+        result_cache.clear()
+        response = client.post("/recommend", json={"query": query, "top_k": top_k})
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    report = {"parse": _per_query(parse_query, queries, repeat=repeat * 10)}
+    try:
+        for size in sizes:
+            start = time.perf_counter()
+            dataset = score_engine.install_catalogue(synthetic_catalogue(size))
+            load_s = time.perf_counter() - start
+            dataset.frame()     # compute_scores returns rows of the DataFrame view; build it once up front
+
+            pages = {query: rank(query, dataset) for query in queries}
+            report[f"cars_{size}"] = {
+                "cars": size,
+                "load_s": load_s,
+                "rank": _per_query(lambda q: rank(q, dataset), queries, repeat),
+                "compute_scores": _per_query(compute_scores, queries, repeat),
+                "materialise": _per_query(
+                    lambda q: format_results(pages[q][0], pages[q][1], parsed[q], dataset), queries, repeat
+                ),
+                "recommend_cold": _per_query(cold_recommend, queries, repeat),
+                "recommend_warm": _per_query(lambda q: recommend(q, top_k=top_k), queries, repeat),
+                "endpoint": _per_query(endpoint, queries, repeat)
+            }
+    finally:
+        score_engine.install_catalogue(original.catalogue, original.path, original.stamps)
+
+    return report
+
+
+# -------- ETL THROUGHPUT ------------
+
+
+def bench_etl(rows=1_000_000, workers=None, seed=0):
+    """
+    Rows per second of the normalize_car_prices.py ETL for each worker
+    count (default: 1, 2, 4, ... up to the number of cores) on a generated
+    auction dump of `rows` listings.
+    """
+    import os
+    import tempfile
+
+    from generate_catalogue import raw_listings
+    from normalize_car_prices import build_catalogue_parallel
+
+    cores = os.cpu_count() or 1
+    if workers is None:
+        workers = sorted({min(2 ** i, cores) for i in range(cores.bit_length() + 1)})
+
+    report = {"rows": rows, "cores": cores}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "car_prices.csv")
+        raw_listings(rows, seed=seed).to_csv(path, index=False)
+        report["input_mb"] = os.path.getsize(path) / 2 ** 20
+
+        for count in workers:
+            start = time.perf_counter()
+            _, rows_read = build_catalogue_parallel(path, workers=count)
+            seconds = time.perf_counter() - start
+            report[f"workers_{count}"] = {"seconds": seconds, "rows_per_sec": rows_read / seconds}
+    return report
+
+
+# -------- NAME LOOKUP ------------
+
+
+TRIMS = ["LE", "SE", "XLE", "Sport", "Touring", "Limited", "Hybrid", "Platinum", "GT", "Premium"]
+
+
+def synthetic_names(size, models=20_000, seed=0):
+    """
+    `size` distinct car names ("Toyota Velaro Touring 312") over the real
+    catalogue's brands: `models` made-up model words, each sold in many
+    trims and variants, as in a real marketplace.
+    """
+    import numpy as np
+    import pandas as pd
+
+    import score_engine
+
+    brands = np.unique(np.asarray(score_engine.current_dataset().catalogue["brand"]).astype(str))
+    rng = np.random.default_rng(seed)
+    syllables = np.array([c + v for c in "bcdfgklmnprstvz" for v in "aeiou"])
+    lengths = rng.integers(2, 5, models)
+    words = np.array(["".join(rng.choice(syllables, length)).title() for length in lengths])
+    model_brands = brands[rng.integers(0, len(brands), models)]
+
+    picks = rng.integers(0, models, size)
+    trims = np.array(TRIMS)[rng.integers(0, len(TRIMS), size)]
+    names = [f"{brand} {word} {trim} {n}"
+             for brand, word, trim, n in zip(model_brands[picks], words[picks], trims, range(size))]
+    return pd.DataFrame({"brand": model_brands[picks], "name": names})
+
+
+def _typo(word, rng):
+    """`word` with two neighbouring letters swapped."""
+    if len(word) < 4:
+        return word
+    i = int(rng.integers(1, len(word) - 2))
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def bench_names(size=1_000_000, repeat=5, number=5, seed=0):
+    """
+    Build time of the brand/model name index over `size` names, and the
+    cost of extracting mentions from corpus queries, from queries naming a
+    car and from the same queries with a typo.
+    """
+    import numpy as np
+
+    from name_index import NameIndex
+
+    frame = synthetic_names(size, seed=seed)
+    start = time.perf_counter()
+    index = NameIndex(frame)
+    report = {"names": size, "build_seconds": time.perf_counter() - start}
+
+    rng = np.random.default_rng(seed)
+    named = [f"{name.lower()} under 20 lakh" for name in frame["name"].sample(200, random_state=seed)]
+    typos = [" ".join(_typo(word, rng) if word.isalpha() else word for word in query.split()) for query in named]
+    for label, queries in (("corpus", QUERIES), ("named", named), ("typos", typos)):
+        # First pass on its own: typo corrections are cached after that
+        start = time.perf_counter()
+        for query in queries:
+            index.extract(query)
+        cold = (time.perf_counter() - start) / len(queries)
+        stats = measure(lambda: [index.extract(query) for query in queries], repeat=repeat, number=number)
+        report[label] = {
+            "queries": len(queries),
+            "first_pass_us": cold * 1e6,
+            "us_per_query": stats["best_us"] / len(queries),
+            "median_us": stats["median_us"] / len(queries)
+        }
+    return report
+
+
+# -------- SIMILAR CARS ------------
+
+
+def bench_similar(sizes=DEFAULT_SIZES, queries=100, top_k=10, nprobes=(2, 4, 8, 16), seed=0):
+    """
+    Build time of the similar-cars index on synthetic catalogues of each
+    size, and per query latency and recall@top_k of the index (for each
+    nprobe) against an exact scan. Like /similar, each query car's own
+    name is excluded. Recall counts results no further than the exact
+    top_k-th neighbour, so ties at the cut-off do not count against it.
+    """
+    import numpy as np
+
+    from name_index import NameIndex
+    from similarity_index import SimilarityIndex, car_vectors
+
+    report = {}
+    for size in sizes:
+        catalogue = synthetic_catalogue(size)
+        vectors = car_vectors(catalogue, catalogue.features)
+        names = NameIndex(catalogue)
+        name_keys = np.char.lower(np.asarray(catalogue["name"]).astype(str))
+        start = time.perf_counter()
+        index = SimilarityIndex(vectors)
+        entry = {"build_seconds": time.perf_counter() - start, "lists": index.lists,
+                 "memory_mb": index.memory_bytes() / 2 ** 20}
+
+        picks = np.random.default_rng(seed).choice(size, min(queries, size), replace=False)
+        cases = [(vectors[row], names.mask(models=(name_keys[row],))) for row in picks]
+
+        def run(**options):
+            found = []
+            start = time.perf_counter()
+            for query, exclude in cases:
+                found.append(index.search(query, top_k, exclude=exclude, **options)[1])
+            return found, (time.perf_counter() - start) / len(cases) * 1e6
+
+        exact, exact_us = run(exact=True)
+        entry["exact"] = {"median_us": exact_us}
+        if index.lists is not None:
+            for nprobe in nprobes:
+                approximate, us = run(nprobe=nprobe)
+                recall = [np.count_nonzero(got <= want[-1]) / len(want) for got, want in zip(approximate, exact)]
+                entry[f"nprobe_{nprobe}"] = {"median_us": us, "recall": float(np.mean(recall)),
+                                             "worst_recall": float(np.min(recall))}
+        report[str(size)] = entry
+    return report
+
+
+# -------- PARETO FRONT ------------
+
+PARETO_OBJECTIVES = (("price", "safety"), ("price", "safety", "power"), ("price", "safety", "power", "mileage"))
+
+
+def bench_pareto(sizes=DEFAULT_SIZES, objective_sets=PARETO_OBJECTIVES, repeat=3):
+    """
+    Latency and skyline size of a Pareto query (top 10) on synthetic
+    catalogues, over the whole catalogue and under a 20 lakh budget.
+    The real catalogue is put back afterwards.
+    """
+    import score_engine
+
+    original = score_engine.current_dataset()
+    report = {}
+    try:
+        for size in sizes:
+            dataset = score_engine.install_catalogue(synthetic_catalogue(size))
+            entry = {}
+            for objectives in objective_sets:
+                for label, filters in (("all", {}), ("budget_20", {"budget": 20})):
+                    def run():
+                        return score_engine.pareto(["general"], objectives, top_k=10, dataset=dataset, **filters)
+
+                    stats = measure(run, repeat=repeat, number=1)
+                    stats["skyline"] = run()[2]
+                    entry[f"{'_'.join(objectives)}/{label}"] = stats
+            report[f"cars_{size}"] = entry
+    finally:
+        score_engine.install_catalogue(original.catalogue, original.path, original.stamps)
+    return report
+
+
+# -------- CATALOGUE MEMORY ------------
+
+
+def _peak_bytes(fn):
+    """Peak bytes Python allocated while running fn()."""
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_store(sizes=DEFAULT_SIZES, queries=QUERIES, top_k=10):
+    """
+    Memory of the compact catalogue against the same data as a pandas
+    DataFrame, and the median peak allocation of a query answered from
+    each: compute_scores (rows of the DataFrame) versus rank + format_results.
+    The real catalogue is put back afterwards.
+    """
+    import score_engine
+    from intent_parser import parse_query
+    from recommendation_system import format_results
+
+    original = score_engine.current_dataset()
+    parsed = [parse_query(query) for query in queries]
+    filters = ("budget", "min_seats", "fuel_type", "body_type")
+    report = {}
+    try:
+        for size in sizes:
+            dataset = score_engine.install_catalogue(synthetic_catalogue(size))
+            frame = dataset.frame()
+
+            def compact(params):
+                rows, scores, _ = score_engine.rank(params["intents"], top_k=top_k, dataset=dataset,
+                                                    **{key: params.get(key) for key in filters})
+                return format_results(rows, scores, params, dataset)
+
+            def dataframe(params):
+                return score_engine.compute_scores(params["intents"], top_k=top_k,
+                                                   **{key: params.get(key) for key in filters})
+
+            compact_bytes = dataset.catalogue.memory_report()["bytes"]
+            frame_bytes = int(frame.memory_usage(deep=True).sum())
+            report[f"cars_{size}"] = {
+                "cars": size,
+                "compact_bytes": compact_bytes,
+                "dataframe_bytes": frame_bytes,
+                "ratio": frame_bytes / compact_bytes,
+                "compact_peak_bytes": statistics.median(_peak_bytes(lambda: compact(p)) for p in parsed),
+                "dataframe_peak_bytes": statistics.median(_peak_bytes(lambda: dataframe(p)) for p in parsed)
+            }
+    finally:
+        score_engine.install_catalogue(original.catalogue, original.path, original.stamps)
+    return report
+
+
+# -------- SERVING UNDER LOAD ------------
+
+# The Procfile's old command, and the production config
+SERVERS = {
+    "sync": ["gunicorn", "app:app"],
+    "threaded": ["gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+}
+
+
+def _free_port():
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(port, timeout=60.0):
+    import http.client
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/metrics")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not come up")
+
+
+def load_test(port, queries=QUERIES, clients=16, seconds=10.0, top_k=10):
+    """
+    `clients` threads POSTing /recommend back to back for `seconds`, cycling
+    through the query corpus. Returns requests per second and latency
+    percentiles in milliseconds.
+    """
+    import http.client
+    import threading
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def client(worker):
+        mine = []
+        failed = 0
+        i = worker
+        while time.monotonic() < stop:
+            body = json.dumps({"query": queries[i % len(queries)], "top_k": top_k})
+            i += clients
+            start = time.perf_counter()
+            try:
+                # A new connection per request: sync workers do not keep connections alive
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                conn.request("POST", "/recommend", body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                conn.close()
+                if response.status != 200:
+                    failed += 1
+                    continue
+            except OSError:
+                failed += 1
+                continue
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99)
+    }
+
+
+def bench_serving(servers=SERVERS, clients=16, seconds=10.0):
+    """
+    Requests per second and p50/p99 latency of /recommend for each server
+    setup, started one after the other on this machine.
+    """
+    import os
+    import subprocess
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    # "duration_s", not "seconds": the load test's length is a setting, not a timing
+    report = {"cores": os.cpu_count() or 1, "clients": clients, "duration_s": seconds}
+    for name, command in servers.items():
+        port = _free_port()
+        server = subprocess.Popen(command + ["--bind", f"127.0.0.1:{port}"], cwd=here,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_until_up(port)
+            load_test(port, clients=clients, seconds=1.0)     # warm up every worker
+            report[name] = load_test(port, clients=clients, seconds=seconds)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return report
+
+
+BENCHMARKS = {
+    "parser": bench_parser,
+    "materialise": bench_materialise,
+    "pipeline": bench_pipeline,
+    "etl": bench_etl,
+    "names": bench_names,
+    "similar": bench_similar,
+    "pareto": bench_pareto,
+    "store": bench_store,
+    "serving": bench_serving
+}
+
+# Benchmarks run once per --sizes entry
+SIZED = {"pipeline", "similar", "pareto", "store"}
+
+# -------- REGRESSION CHECK ------------
+
+
+# The timing a report entry is compared on, in order of preference, and its
+# scale to microseconds: parser and materialise report per query / page,
+# etl a run in seconds, serving its p99 latency
+TIMING_KEYS = (("median_us", 1.0), ("us_per_query", 1.0), ("us_per_page", 1.0), ("p99_ms", 1e3), ("seconds", 1e6))
+
+
+def timings(report, prefix=""):
+    """Flatten a report to {"path/to/metric": microseconds} for every timed stage (see TIMING_KEYS)."""
+    found = {}
+    for key, value in report.items():
+        if not isinstance(value, dict):
+            continue
+        path = f"{prefix}{key}"
+        for timing, scale in TIMING_KEYS:
+            if isinstance(value.get(timing), (int, float)):
+                found[path] = value[timing] * scale
+                break
+        found.update(timings(value, prefix=f"{path}/"))
+    return found
+
+
+def regressions(report, baseline, tolerance=1.5):
+    """(metric, baseline_us, current_us) for each timing over baseline * tolerance."""
+    before = timings(baseline)
+    slower = []
+    for metric, current in timings(report).items():
+        if metric in before and current > before[metric] * tolerance:
+            slower.append((metric, before[metric], current))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MotorMony benchmarks")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated catalogue sizes for the pipeline and similar benchmarks")
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="fail when a timing exceeds baseline * tolerance (default: 1.5)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    try:
+        sizes = [int(size) for size in args.sizes.split(",") if size]
+    except ValueError:
+        parser.error(f"--sizes must be comma-separated integers, got {args.sizes!r}")
+
+    report = {}
+    for name in args.names or BENCHMARKS:
+        report[name] = BENCHMARKS[name](sizes) if name in SIZED else BENCHMARKS[name]()
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        slower = regressions(report, baseline, args.tolerance)
+        for metric, before, current in slower:
+            print(f"REGRESSION {metric}: {before:.1f}us -> {current:.1f}us", file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
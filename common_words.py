@@ -0,0 +1,80 @@
+"""
+Everyday English words that turn up in car searches.
+
+NameIndex never treats these as misspelt car names ("quick" is not "buick")
+and never reads one on its own as a model ("black", "city", "escape"). A
+brand or model still matches when the query names its brand ("chevrolet
+black diamond", "honda city").
+"""
+# Loosely grouped; plurals and -ly/-er/-est/-ed/-ing forms are derived in is_common()
+COMMON_WORDS = frozenset("""
+    about above across after again against all almost alone along already also always am among
+    another anything anywhere around as ask at available away back bad be because been before
+    being between big both bring but by call came come could day days did do does done down
+    each easy either else enough even ever every everyday everything find first get give go
+    going gone got great had has he her here him his how however if into it its just keep kind
+    know last least less let lot lots made make many maybe more most much must near nearly
+    never next no nor not nothing now off often old one only other our out over own per please
+    plenty pretty quite rather really right same see seem she should since so some soon still
+    such suggest take tell then there these they thing things think this those though through
+    thus too two three four five six seven eight nine ten under until us use used very via was
+    way we well were what when where which while who whose why will wish would year years yet
+    you your
+
+    able active actual agile amazing ample attractive average awesome basic beautiful better
+    bold bright brilliant calm capable careful casual certain clean clever close comfy common
+    compact complete cool cozy cute daily decent dependable different dynamic early efficient
+    elegant entire excellent exciting expensive extra fancy fantastic favourite favorite fine
+    firm fit flashy fresh friendly full fun funky gentle genuine giant gorgeous handy happy
+    hard heavy high huge ideal important impressive large late latest light little long loud
+    lovely luxurious mid modern nice normal ordinary perfect plain pleasant popular posh
+    powerful practical premium proper proud pure quick quiet rapid real reasonable recent
+    regular reliable robust rough roomy rugged secure serious short silent simple sleek slow
+    small smooth soft solid sound spacious speedy stable standard steady stylish sturdy
+    superb sure swift tall tidy tiny tough trendy trusty typical ultimate unique usual versatile
+    warm whole wide wonderful young
+
+    beige black blue bronze brown colour color cream dark gold golden green grey gray maroon
+    orange pink purple red silver white yellow matte metallic shiny
+
+    air alarm alloy audio auto automatic bag bags boot brake brakes bumper cabin camera charge
+    charging climate console control cruise dashboard display door doors drive driver gear gears
+    glass heated interior keyless lamp lamps leather light lights manual mirror mirrors music
+    navigation panel parking power radio rear roof screen seat seats sensor sensors sound
+    speaker speakers steering storage sunroof system tank trunk tyre tyres tire tires touch
+    transmission trim turbo wheel wheels window windows wireless
+
+    adventure beach bridge business city coast commute commuting country countryside daily
+    distance errand errands escape farm highway hill hills holiday journey lane long mountain
+    mountains office park path place road roads route school shopping street town traffic
+    travel trip trips village weekend work
+
+    baby boss brother child couple dad daughter dog dogs father friend friends group guest
+    guests husband kid life mom mother mum parent parents partner pet pets senior son student
+    team wife woman man men women someone somebody everyone person
+
+    accent accord answer balance bit body build choice class cargo comfort connect
+    convertible coupe crown cube dart deal diamond duty edge element energy express feature
+    features flex flying focus frontier fusion ghost golf grand idea insight legacy level
+    liberty load match matrix mile miles model note offer option options passenger pickup
+    pilot plug police quality quest series size soul space spark speed sport style super
+    touring transit type wagon
+
+    afford avoid carry change check choose consider cover cross drop explore fill fly hunt
+    lease look move own park pay prefer pull purchase race recommend reach ride rent run save
+    sell shop spend start stay stop suit tow travel trust try turn upgrade wander
+""".split())
+
+_SUFFIXES = (("ies", "y"), ("es", ""), ("s", ""), ("ly", ""), ("er", ""), ("est", ""), ("ed", ""),
+             ("ing", ""), ("ing", "e"), ("ed", "e"))
+
+
+def is_common(token):
+    """True when `token` (lower case) is one of COMMON_WORDS or a simple inflection of one."""
+    if token in COMMON_WORDS:
+        return True
+    for suffix, ending in _SUFFIXES:
+        if token.endswith(suffix) and len(token) > len(suffix) + 2:
+            if token[:-len(suffix)] + ending in COMMON_WORDS:
+                return True
+    return False
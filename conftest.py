@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from generate_catalogue import raw_listings
+
+BODY_STYLES = ["SUV", "suv", "Sedan", "G Sedan", "Coupe", "Koup", "Hatchback", "Minivan", "Van",
+               "Crew Cab", "SuperCrew", "Regular Cab Pickup", "Wagon", "Convertible", None]
+
+
+def auction_dump(rows, seed=0):
+    """car_prices.csv-shaped data with the gaps and oddities of the real dump."""
+    rng = np.random.default_rng(seed)
+    raw = raw_listings(rows, seed=seed)
+
+    raw["body"] = rng.choice(np.array(BODY_STYLES, dtype=object), rows)
+    raw["year"] = rng.integers(2005, 2017, rows)
+    # Both condition scales of the dump (1.0-5.0 and 10-49), with gaps
+    condition = np.where(rng.random(rows) < 0.5, np.round(rng.uniform(1, 5, rows), 1), rng.integers(10, 50, rows))
+    raw["condition"] = np.where(rng.random(rows) < 0.05, np.nan, condition)
+    # Unrounded prices, outliers on both ends and missing ones
+    price = raw["sellingprice"].to_numpy() + rng.integers(0, 99, rows)
+    price[rng.random(rows) < 0.02] = 500
+    price[rng.random(rows) < 0.02] = 250000
+    raw["sellingprice"] = np.where(rng.random(rows) < 0.02, np.nan, price)
+
+    make = raw["make"].to_numpy(dtype=object)
+    make[rng.random(rows) < 0.01] = None
+    make[rng.random(rows) < 0.01] = "Tesla"
+    raw["make"] = make
+    model = raw["model"].to_numpy(dtype=object)
+    model[rng.random(rows) < 0.01] = "Prius"
+    model[rng.random(rows) < 0.01] = "Focus Electric"
+    raw["model"] = model
+    return raw
+
+
+@pytest.fixture(scope="session")
+def messy_auction_dump():
+    """auction_dump(rows, seed=0): car_prices.csv-shaped data with the gaps and oddities of the real dump."""
+    return auction_dump
@@ -0,0 +1,452 @@
+"""
+Compact binary form of the normalized car dataset.
+
+Next to `cars_dataset_normalized.csv` lives a `cars_dataset_normalized.store/`
+directory holding:
+
+    features.npy       float32 matrix of the *_norm columns, scored as-is
+    columns/<col>.npy  every column in its compact form (see compact_column):
+                       string codes, float32, small integers or float64
+    meta.json          column layout, string tables and the source CSV fingerprint
+
+The .npy files are opened with mmap, so gunicorn workers forked from one
+master share the same pages, columns the request path never reads are never
+paged in, and nothing is parsed at startup. The CSV is only parsed when the
+store is missing or older than the CSV.
+
+Rebuild the store from an existing CSV with:
+    python dataset_store.py [path/to/cars_dataset_normalized.csv]
+
+Nothing here imports pandas: the serving path only needs NumPy.
+"""
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.join(BASE_DIR, "cars_dataset_normalized.csv")
+
+STORE_FORMAT = 2
+
+# Column order of the feature matrix; weight vectors are laid out the same way
+FEATURE_COLUMNS = [
+    "price_min_lakh_norm",
+    "mileage_kmpl_norm",
+    "power_bhp_norm",
+    "safety_rating_norm",
+    "resale_value_5yr_norm"
+]
+
+STRING_COLUMNS = ["name", "brand", "fuel_type", "body_type"]
+
+# -------- COMPACT COLUMNS ------------
+#
+# Each column is kept in the smallest form that still gives back exactly
+# the values it was built from:
+#
+# - text: dictionary-encoded, int8/int16/int32 codes into a table of the
+#   distinct (interned) strings, so 1M listings of 20k models hold 20k strings
+# - decimals (prices, ratings, ...): float32 plus the number of decimals
+#   they were written with; reads round back to the exact float64 value
+# - integers: the narrowest integer type that holds them
+# - anything else: as given
+#
+# Indexing a column (`column[rows]`) decodes only those rows, and
+# np.asarray(column) decodes all of it, so code that treats columns as
+# NumPy arrays keeps working.
+
+# Most decimals a column may have and still be stored as float32
+MAX_DECIMALS = 6
+
+
+def _int_dtype(low, high):
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class EncodedColumn:
+    """Strings as small integer codes into `table`, an object array of the distinct values."""
+
+    dtype = np.dtype(object)
+
+    def __init__(self, codes, table):
+        self.codes = codes
+        self.table = table
+
+    @classmethod
+    def encode(cls, values):
+        ids = {}
+        codes = np.fromiter((ids.setdefault(value, len(ids)) for value in values), dtype=np.int64, count=len(values))
+        table = np.empty(len(ids), dtype=object)
+        table[:] = [sys.intern(value) if type(value) is str else value for value in ids]
+        return cls(codes.astype(_int_dtype(0, len(ids))), table)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key):
+        return self.table[self.codes[key]]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.table[self.codes]
+        return values if dtype is None else values.astype(dtype)
+
+    def tolist(self):
+        return self.table[self.codes].tolist()
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.table.nbytes + sum(sys.getsizeof(value) for value in self.table.tolist())
+
+
+class ScaledColumn:
+    """Values with at most `decimals` decimals, held as float32 and read back as the exact float64."""
+
+    dtype = np.dtype(np.float64)
+
+    def __init__(self, values, decimals):
+        self.values = values
+        self.decimals = decimals
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, key):
+        return self.values[key].astype(np.float64).round(self.decimals)
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:]
+        return values if dtype is None else values.astype(dtype)
+
+    def tolist(self):
+        return self[:].tolist()
+
+    # Rounding is monotone, so reducing the float32 values first is exact
+    def min(self):
+        return np.round(np.float64(self.values.min()), self.decimals)
+
+    def max(self):
+        return np.round(np.float64(self.values.max()), self.decimals)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+
+def _decimals(values):
+    """Decimals of a float64 column when float32 holds it exactly at that precision, else None."""
+    for decimals in range(MAX_DECIMALS + 1):
+        if np.array_equal(np.round(values, decimals), values, equal_nan=True):
+            narrow = values.astype(np.float32)
+            restored = np.round(narrow.astype(np.float64), decimals)
+            return decimals if np.array_equal(restored, values, equal_nan=True) else None
+    return None
+
+
+def compact_column(values):
+    """`values` in the smallest form that reads back the same (see above)."""
+    if isinstance(values, (EncodedColumn, ScaledColumn)):
+        return values
+    values = np.asarray(values)
+    if values.dtype.kind in "OUS":
+        return EncodedColumn.encode(values.tolist())
+    if values.dtype.kind in "iu" and len(values):
+        return values.astype(_int_dtype(values.min(), values.max()), copy=False)
+    if values.dtype == np.float64:
+        decimals = _decimals(values)
+        if decimals is not None:
+            return ScaledColumn(values.astype(np.float32), decimals)
+    return values
+
+
+def decoded(column):
+    """A column as a plain array in its original dtype family: object, float64 or int64."""
+    values = np.asarray(column)
+    return values.astype(np.int64) if values.dtype.kind in "iu" else values
+
+# -------- IN-MEMORY CATALOGUE ------------
+
+
+class Catalogue:
+    """
+    Column-oriented, pandas-free view of the dataset.
+
+    `columns` lists the column names in file order (as on a DataFrame) and
+    `catalogue[name]` returns that column in its compact form, which indexes
+    like a NumPy array. `features` is the float32 *_norm matrix the scoring
+    engine works on. `checksum` is the sha256 of the source data, when known.
+    Columns are compacted on the way in unless `compact` is False (the
+    store's columns already are).
+    """
+
+    def __init__(self, data, columns, features=None, checksum=None, compact=True):
+        self.columns = list(columns)
+        self.data = {col: compact_column(values) for col, values in data.items()} if compact else dict(data)
+        self.checksum = checksum
+        if features is None:
+            features = np.column_stack([np.asarray(self.data[col], dtype=np.float32) for col in FEATURE_COLUMNS])
+        self.features = features
+        self._memory = None
+
+    def __len__(self):
+        return len(self.features)
+
+    def __getitem__(self, column):
+        return self.data[column]
+
+    def __contains__(self, column):
+        return column in self.data
+
+    def view(self, i):
+        """Car `i` as a read-only mapping that reads each field from the columns when asked for it."""
+        return CarView(self, i)
+
+    def row(self, i):
+        """One car as a plain dict of Python scalars."""
+        return dict(self.view(i))
+
+    def decoded(self, column):
+        """`column` as a plain array (object, float64 or int64), as the CSV parses it."""
+        return decoded(self.data[column])
+
+    def to_frame(self):
+        """The catalogue as a pandas DataFrame (imports pandas on first use)."""
+        import pandas as pd
+        return pd.DataFrame({col: self.decoded(col) for col in self.columns})
+
+    def memory_report(self):
+        """Bytes held per column and in total, features included; mmapped columns count in full."""
+        if self._memory is None:
+            columns = {col: int(self.data[col].nbytes) for col in self.columns}
+            self._memory = {"columns": columns, "features": int(self.features.nbytes),
+                            "bytes": sum(columns.values()) + int(self.features.nbytes)}
+        return self._memory
+
+
+class CarView(Mapping):
+    """One catalogue row; nothing is copied until a field is read."""
+
+    __slots__ = ("catalogue", "row")
+
+    def __init__(self, catalogue, row):
+        self.catalogue = catalogue
+        self.row = row
+
+    def __getitem__(self, column):
+        return _scalar(self.catalogue.data[column][self.row])
+
+    def __iter__(self):
+        return iter(self.catalogue.columns)
+
+    def __len__(self):
+        return len(self.catalogue.columns)
+
+
+def _scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+# -------- PATHS & FINGERPRINTS ------------
+
+
+def store_path(csv_path=DEFAULT_CSV):
+    return os.path.splitext(csv_path)[0] + ".store"
+
+
+def aggregate_path(csv_path=DEFAULT_CSV):
+    """Running per-car aggregates kept by the ETL for incremental updates."""
+    return os.path.splitext(csv_path)[0] + ".aggregate.npz"
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path, checksum=None):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": checksum or file_checksum(path)}
+
+# -------- WRITING ------------
+
+
+def write_store(frame, csv_path=DEFAULT_CSV, unchanged=(), checksum=None):
+    """
+    Write `frame` (a DataFrame or Catalogue, already saved as `csv_path`)
+    as a binary store next to it. Columns named in `unchanged` are the same
+    as in the current store, and their files are linked instead of written
+    again. `checksum` is the CSV's sha256 when the caller already has it.
+    """
+    target = store_path(csv_path)
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    os.makedirs(os.path.join(tmp, "columns"))
+
+    # How each column file is read back: "strings" (codes + table), "scaled"
+    # (float32 + decimals), "int" or "float"
+    encodings = {}
+    current = read_meta(csv_path) if unchanged else None
+    for col in frame.columns:
+        if col in unchanged:
+            _link(os.path.join(target, "columns", f"{col}.npy"), os.path.join(tmp, "columns", f"{col}.npy"))
+            encodings[col] = current["encodings"][col]
+            continue
+        column = frame[col]
+        if col in STRING_COLUMNS and not isinstance(column, EncodedColumn):
+            column = np.asarray(column).astype(str)
+        column = compact_column(column)
+        if isinstance(column, EncodedColumn):
+            values = column.codes
+            encodings[col] = {"kind": "strings", "table": column.table.tolist()}
+        elif isinstance(column, ScaledColumn):
+            values = column.values
+            encodings[col] = {"kind": "scaled", "decimals": column.decimals}
+        else:
+            values = column
+            encodings[col] = {"kind": "int" if column.dtype.kind in "iu" else "float"}
+        np.save(os.path.join(tmp, "columns", f"{col}.npy"), np.ascontiguousarray(values))
+
+    features = np.column_stack([np.asarray(frame[col], dtype=np.float32) for col in FEATURE_COLUMNS])
+    np.save(os.path.join(tmp, "features.npy"), np.ascontiguousarray(features))
+
+    meta = {
+        "format": STORE_FORMAT,
+        "rows": len(frame),
+        "columns": list(frame.columns),
+        "encodings": encodings,
+        "feature_columns": FEATURE_COLUMNS,
+        "source": file_fingerprint(csv_path, checksum) if os.path.exists(csv_path) else None
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        # One dumps() call encodes the string tables in C; dump() goes chunk by chunk in Python
+        f.write(json.dumps(meta))
+
+    # Swap the finished store into place so readers never see a half-written one
+    old = target + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(target):
+        os.rename(target, old)
+    os.rename(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+def _link(source, target):
+    """Hard-link a column file into the new store; copy it where links are not supported."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+# -------- READING ------------
+
+
+def read_meta(csv_path=DEFAULT_CSV):
+    try:
+        with open(os.path.join(store_path(csv_path), "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(meta, csv_path=DEFAULT_CSV):
+    """True when the store matches the CSV (or the store is all that was shipped)."""
+    if meta is None or meta.get("format") != STORE_FORMAT or meta.get("feature_columns") != FEATURE_COLUMNS:
+        return False
+    if not os.path.exists(csv_path):
+        return True
+
+    source = meta.get("source")
+    if not source:
+        return False
+
+    # Cheap check first; a fresh checkout changes mtimes, so fall back to the checksum
+    stat = os.stat(csv_path)
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime_ns == source["mtime_ns"]:
+        return True
+    return file_checksum(csv_path) == source["sha256"]
+
+
+def load_store(csv_path=DEFAULT_CSV, meta=None):
+    """Open the store with mmap and return it as a Catalogue."""
+    meta = meta or read_meta(csv_path)
+    path = store_path(csv_path)
+
+    features = np.load(os.path.join(path, "features.npy"), mmap_mode="r")
+
+    data = {}
+    for col in meta["columns"]:
+        encoding = meta["encodings"][col]
+        # A plain ndarray over the mapped pages indexes faster than the memmap itself
+        values = np.asarray(np.load(os.path.join(path, "columns", f"{col}.npy"), mmap_mode="r"))
+        if encoding["kind"] == "strings":
+            table = np.empty(len(encoding["table"]), dtype=object)
+            table[:] = [sys.intern(value) if type(value) is str else value for value in encoding["table"]]
+            data[col] = EncodedColumn(values, table)
+        elif encoding["kind"] == "scaled":
+            data[col] = ScaledColumn(values, encoding["decimals"])
+        else:
+            data[col] = values
+
+    source = meta.get("source")
+    checksum = source["sha256"] if source else file_checksum(os.path.join(path, "meta.json"))
+    return Catalogue(data, meta["columns"], features, checksum, compact=False)
+
+
+def read_csv(csv_path=DEFAULT_CSV):
+    """
+    Parse the CSV into a Catalogue without pandas. Columns that parse as
+    integers become int64, other numeric columns float64, the rest stay str.
+    """
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+
+    data = {}
+    for j, col in enumerate(header):
+        raw = np.array([row[j] for row in rows], dtype=object)
+        if col in STRING_COLUMNS:
+            data[col] = raw
+            continue
+        for dtype in (np.int64, np.float64):
+            try:
+                data[col] = raw.astype(str).astype(dtype)
+                break
+            except ValueError:
+                continue
+        else:
+            data[col] = raw
+
+    return Catalogue(data, header, checksum=file_checksum(csv_path))
+
+
+def load_dataset(csv_path=DEFAULT_CSV):
+    """
+    The catalogue: from the binary store when it is up to date, otherwise
+    parsed from the CSV.
+    """
+    meta = read_meta(csv_path)
+    if is_fresh(meta, csv_path):
+        return load_store(csv_path, meta)
+    return read_csv(csv_path)
+
+
+if __name__ == "__main__":
+    csv_file = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CSV
+    print(f"Wrote {write_store(read_csv(csv_file), csv_file)}")
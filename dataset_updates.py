@@ -0,0 +1,289 @@
+"""
+Fold new listings into the catalogue without rerunning the whole ETL.
+
+    python dataset_updates.py new_listings.csv [--data cars_dataset_normalized.csv]
+
+normalize_car_prices.py leaves its running per-car aggregates next to the
+catalogue (cars_dataset_normalized.aggregate.npz). New listings, in the
+car_prices.csv layout, are estimated and added to those aggregates, and
+only the cars they touch are recomputed. A feature's *_norm column is
+rescaled as a whole only when its min or max moves; otherwise only the
+touched rows are normalized. The result is exactly the catalogue a full
+rebuild over the old and the new listings would give. Only the changed
+rows are formatted: the other CSV lines are copied as they are, and store
+columns the update cannot change are linked into the new store.
+
+Catalogues written before the aggregates were kept start from their
+rounded values, one listing per car, so the first update only approximates
+a full rebuild. Run normalize_car_prices.py once to get exact aggregates.
+"""
+import argparse
+import hashlib
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+from dataset_store import Catalogue
+from normalize_car_prices import ROUNDING, RunningAggregate, clean, estimate_columns
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): only threads of this process are kept apart
+    fcntl = None
+
+MEAN_COLUMNS = RunningAggregate.MEAN_COLUMNS
+
+_process_lock = threading.Lock()
+
+# -------- RUNNING STATE ------------
+
+
+def scale_feature(values, low, high):
+    """MinMaxScaler's transform for one column, with the same rounding."""
+    data_range = high - low
+    # sklearn treats (near) constant columns as having a range of 1
+    scale = 1.0 / (data_range if data_range >= 10 * np.finfo(np.float64).eps else 1.0)
+    return values * scale + (0.0 - low * scale)
+
+
+def bootstrap_aggregate(catalogue):
+    """Running aggregates for a catalogue without any: each car is one listing."""
+    totals = RunningAggregate(capacity=max(len(catalogue), 1))
+    totals.names = np.asarray(catalogue["name"]).tolist()
+    totals.slots = {name: i for i, name in enumerate(totals.names)}
+    totals.firsts = {col: np.asarray(catalogue[col]).tolist() for col in RunningAggregate.FIRST_COLUMNS}
+    n = len(totals.names)
+    totals.sums[:n] = np.column_stack([np.asarray(catalogue[col], dtype=np.float64) for col in MEAN_COLUMNS])
+    totals.counts[:n] = 1
+    totals.maxima[:n] = np.column_stack([np.asarray(catalogue[col], dtype=np.float64)
+                                         for col in RunningAggregate.MAX_COLUMNS])
+    return totals
+
+
+def load_aggregate(csv_path, catalogue):
+    """The saved running aggregates of the catalogue at csv_path, in its row order."""
+    path = dataset_store.aggregate_path(csv_path)
+    if os.path.exists(path):
+        totals = RunningAggregate.load(path)
+        if totals.names == np.asarray(catalogue["name"]).tolist():
+            return totals
+    return bootstrap_aggregate(catalogue)
+
+# -------- UPDATES ------------
+
+
+@contextmanager
+def catalogue_lock(csv_path):
+    """
+    Exclusive hold on the catalogue at csv_path while it is read, updated
+    and written back: an flock on `<csv>.lock`, which keeps every thread and
+    process (gunicorn workers, the command line) apart.
+    """
+    if fcntl is None:
+        with _process_lock:
+            yield
+        return
+    with open(csv_path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _grown(column, moved, inserted, values):
+    """
+    `column` with its old rows at `moved` and `values` at the `inserted`
+    rows, compact. Strings keep their table and only gain the new values.
+    """
+    size = len(moved) + len(inserted)
+    if isinstance(column, dataset_store.EncodedColumn):
+        ids = {value: code for code, value in enumerate(column.table.tolist())}
+        new_codes = [ids.setdefault(value, len(ids)) for value in values]
+        table = column.table
+        if len(ids) > len(table):
+            table = np.empty(len(ids), dtype=object)
+            table[:] = list(ids)
+        codes = np.empty(size, dtype=dataset_store._int_dtype(0, len(ids)))
+        codes[moved] = column.codes
+        codes[inserted] = new_codes
+        return dataset_store.EncodedColumn(codes, table)
+    old = dataset_store.decoded(column)
+    grown = np.empty(size, dtype=old.dtype)
+    grown[moved] = old
+    grown[inserted] = values
+    return dataset_store.compact_column(grown)
+
+
+def write_csv_rows(catalogue, csv_path, moved, rows):
+    """
+    Write `catalogue` over the CSV at csv_path, as save() would, formatting
+    only `rows`. Every other row is copied as the bytes of its old line
+    (`moved` maps old rows to new ones). Returns the new file's sha256.
+    """
+    with open(csv_path, "rb") as f:
+        old_lines = f.readlines()
+    if not old_lines[-1].endswith(b"\n"):
+        old_lines[-1] += b"\n"
+    lines = np.empty(len(catalogue), dtype=object)
+    lines[moved] = old_lines[1:]
+
+    frame = pd.DataFrame({col: dataset_store.decoded(catalogue[col][rows]) for col in catalogue.columns})
+    lines[rows] = io.BytesIO(frame.to_csv(index=False, header=False).encode("utf-8")).readlines()
+    content = old_lines[0] + b"".join(lines.tolist())
+
+    # Readers (other workers' file watchers) only ever see a complete CSV
+    tmp = f"{csv_path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, csv_path)
+    return hashlib.sha256(content).hexdigest()
+
+
+class CatalogueDelta:
+    """
+    What update_catalogue() changed. `catalogue` is the complete updated
+    catalogue; `inserted` are the rows of new cars and `changed` every row
+    whose values changed (inserted ones included), both in its numbering.
+    `rescaled` names the *_norm columns whose bounds moved. `base_version`
+    is the version of the catalogue the listings were added to.
+    """
+
+    def __init__(self, catalogue, base_version, inserted, changed, rescaled):
+        self.catalogue = catalogue
+        self.base_version = base_version
+        self.inserted = inserted
+        self.changed = changed
+        self.rescaled = rescaled
+
+
+def _bounds(means, low, high, before, after):
+    """
+    Per-feature (low, high) after the cars with means `before` now have
+    `after`. Only falls back to a scan of all means when a car that held a
+    bound moved away from it.
+    """
+    new_low = np.minimum(low, after.min(axis=0)) if len(after) else low.copy()
+    new_high = np.maximum(high, after.max(axis=0)) if len(after) else high.copy()
+    left_low = ((before == low) & (after[:len(before)] > low)).any(axis=0)
+    left_high = ((before == high) & (after[:len(before)] < high)).any(axis=0)
+    rescan = np.flatnonzero(left_low | left_high)
+    if len(rescan):
+        current = means()
+        new_low[rescan] = current[:, rescan].min(axis=0)
+        new_high[rescan] = current[:, rescan].max(axis=0)
+    return new_low, new_high
+
+
+def update_catalogue(listings, csv_path=dataset_store.DEFAULT_CSV):
+    """
+    Add raw listings (a DataFrame shaped like car_prices.csv) to the
+    catalogue at csv_path, write the updated CSV, binary store and running
+    aggregates, and return a CatalogueDelta. Concurrent updates of the same
+    catalogue run one after the other (see catalogue_lock).
+    """
+    csv_path = os.path.abspath(csv_path)
+    with catalogue_lock(csv_path):
+        return _update_catalogue(listings, csv_path)
+
+
+def _update_catalogue(listings, csv_path):
+    # Like dataset_store.load_dataset(), noting whether the store's column files can be reused
+    meta = dataset_store.read_meta(csv_path)
+    stored = dataset_store.is_fresh(meta, csv_path)
+    catalogue = dataset_store.load_store(csv_path, meta) if stored else dataset_store.read_csv(csv_path)
+    totals = load_aggregate(csv_path, catalogue)
+    n = len(catalogue)
+
+    old_means = totals.means()
+    low, high = old_means.min(axis=0), old_means.max(axis=0)
+
+    added = estimate_columns(clean(listings))
+    totals.add(added)
+    touched = np.array([totals.slots[name] for name in pd.unique(added["name"])], dtype=np.intp)
+    existing = np.sort(touched[touched < n])
+    new = np.array(sorted(touched[touched >= n], key=totals.names.__getitem__), dtype=np.intp)
+
+    # New cars slot into name order, exactly where a full rebuild puts them
+    names = np.asarray(catalogue["name"], dtype=object)
+    positions = np.searchsorted(names, np.array([totals.names[s] for s in new], dtype=object))
+    if len(new):
+        totals = totals.reordered(np.insert(np.arange(n), positions, new))
+    inserted = positions + np.arange(len(new))
+    moved = np.arange(n) + np.searchsorted(positions, np.arange(n), side="right")
+    changed = np.union1d(moved[existing], inserted)
+
+    # Existing cars first, so _bounds can pair them with their old means
+    touched_rows = np.concatenate([moved[existing], inserted])
+    touched_means = totals.means(touched_rows)
+    new_low, new_high = _bounds(totals.means, low, high, old_means[existing], touched_means)
+    rescaled = [f"{col}_norm" for j, col in enumerate(MEAN_COLUMNS)
+                if new_low[j] != low[j] or new_high[j] != high[j]]
+
+    # Only the columns an update writes are rebuilt; with no new cars the
+    # others stay exactly as stored, in their compact form
+    size = n + len(new)
+    fresh_values = {"name": [totals.names[row] for row in inserted]}
+    fresh_values.update({col: [totals.firsts[col][row] for row in inserted] for col in RunningAggregate.FIRST_COLUMNS})
+    written = RunningAggregate.MAX_COLUMNS + MEAN_COLUMNS + [f"{col}_norm" for col in MEAN_COLUMNS]
+    unchanged = [] if len(new) else [col for col in catalogue.columns if col not in written]
+
+    data = {}
+    for col in catalogue.columns:
+        if col in unchanged:
+            data[col] = catalogue[col]
+        elif col in fresh_values:
+            data[col] = _grown(catalogue[col], moved, inserted, fresh_values[col])
+        else:
+            old = catalogue.decoded(col)
+            data[col] = np.empty(size, dtype=old.dtype)
+            data[col][moved] = old
+    for j, col in enumerate(RunningAggregate.MAX_COLUMNS):
+        data[col][touched_rows] = totals.maxima[touched_rows, j]
+    all_means = totals.means() if rescaled else None
+    for j, col in enumerate(MEAN_COLUMNS):
+        data[col][touched_rows] = np.round(touched_means[:, j], ROUNDING[col])
+        norm = f"{col}_norm"
+        if norm in rescaled:
+            data[norm] = scale_feature(all_means[:, j], new_low[j], new_high[j])
+        else:
+            data[norm][touched_rows] = scale_feature(touched_means[:, j], low[j], high[j])
+
+    features = np.empty((size, len(dataset_store.FEATURE_COLUMNS)), dtype=np.float32)
+    features[moved] = catalogue.features
+    for j, col in enumerate(dataset_store.FEATURE_COLUMNS):
+        if col in rescaled:
+            features[:, j] = data[col]
+        else:
+            features[touched_rows, j] = data[col][touched_rows]
+
+    data = {col: dataset_store.compact_column(values) for col, values in data.items()}
+    updated = Catalogue(data, catalogue.columns, features, compact=False)
+    # A rescaled *_norm column changes every line of the CSV
+    lines = np.arange(size) if rescaled else changed
+    updated.checksum = write_csv_rows(updated, csv_path, moved, lines)
+    dataset_store.write_store(updated, csv_path, unchanged if stored else (), updated.checksum)
+    totals.save(dataset_store.aggregate_path(csv_path))
+
+    base_version = (catalogue.checksum or "unversioned")[:12]
+    return CatalogueDelta(updated, base_version, inserted, changed, rescaled)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add new listings to the normalized catalogue")
+    parser.add_argument("listings", help="CSV of new listings in the car_prices.csv layout")
+    parser.add_argument("--data", default=dataset_store.DEFAULT_CSV, help="catalogue CSV to update")
+    args = parser.parse_args()
+
+    delta = update_catalogue(pd.read_csv(args.listings), args.data)
+    print(f"{len(delta.inserted)} new cars, {len(delta.changed) - len(delta.inserted)} updated; "
+          f"rescaled: {', '.join(delta.rescaled) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
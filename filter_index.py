@@ -0,0 +1,168 @@
+import numpy as np
+
+# -------- FILTER INDEXES BUILT ONCE AT LOAD TIME ------------
+#
+# Every filter resolves to a packed bitset (one bit per car, np.packbits
+# layout) so several filters combine with a cheap bitwise AND before any
+# scoring happens.
+
+
+def _pack(mask):
+    return np.packbits(mask)
+
+
+class FilterIndex:
+    """
+    Precomputed lookup structures for the budget, seat, fuel and body filters.
+
+    - price: row ids sorted by price_min_lakh, binary searched per budget
+    - seats: one bitset per distinct seat count ("at least N seats")
+    - fuel_type / body_type: one bitset per lower-cased category
+    """
+
+    def __init__(self, frame):
+        # `frame` is anything indexable by column name: a Catalogue or a DataFrame
+        self.size = len(frame)
+
+        prices = np.asarray(frame["price_min_lakh"], dtype=np.float64)
+        self.price_order = np.argsort(prices, kind="stable")
+        self.sorted_prices = prices[self.price_order]
+
+        seats = np.asarray(frame["seats"])
+        self.seat_levels = np.unique(seats)
+        self.seat_bits = {int(level): _pack(seats >= level) for level in self.seat_levels}
+
+        self.fuel_bits = self._category_bits(frame["fuel_type"])
+        self.body_bits = self._category_bits(frame["body_type"])
+
+        self._empty = _pack(np.zeros(self.size, dtype=bool))
+
+    def updated(self, frame, inserted, changed):
+        """
+        The index of `frame`: the indexed catalogue with new rows at
+        `inserted` and new values in rows `changed` (both in the numbering
+        of `frame`; `changed` includes `inserted`). Only those rows are
+        looked at again; nothing is re-sorted.
+        """
+        index = FilterIndex.__new__(FilterIndex)
+        index.size = len(frame)
+        kept = np.ones(index.size, dtype=bool)
+        kept[inserted] = False
+        old_to_new = np.flatnonzero(kept)
+
+        def remapped(bits):
+            mask = np.zeros(index.size, dtype=bool)
+            mask[old_to_new] = np.unpackbits(bits, count=self.size).astype(bool)
+            return mask
+
+        # Price order: drop the changed rows, then merge them back in at
+        # their (price, row) position, as a stable argsort would place them
+        prices = np.asarray(frame["price_min_lakh"], dtype=np.float64)
+        order = old_to_new[self.price_order]
+        order = order[~np.isin(order, changed)]
+        sorted_prices = prices[order]
+        moved = changed[np.lexsort((changed, prices[changed]))]
+        lo = np.searchsorted(sorted_prices, prices[moved], side="left")
+        hi = np.searchsorted(sorted_prices, prices[moved], side="right")
+        at = [start + np.searchsorted(order[start:stop], row) for row, start, stop in zip(moved, lo, hi)]
+        index.price_order = np.insert(order, np.asarray(at, dtype=np.intp), moved)
+        index.sorted_prices = prices[index.price_order]
+
+        seats = np.asarray(frame["seats"])
+        index.seat_levels = np.union1d(self.seat_levels, seats[changed])
+        index.seat_bits = {}
+        for level in index.seat_levels:
+            level = int(level)
+            if level in self.seat_bits:
+                mask = remapped(self.seat_bits[level])
+                mask[changed] = seats[changed] >= level
+            else:
+                mask = seats >= level
+            index.seat_bits[level] = _pack(mask)
+
+        index.fuel_bits = self._updated_category_bits(self.fuel_bits, frame["fuel_type"], changed, remapped)
+        index.body_bits = self._updated_category_bits(self.body_bits, frame["body_type"], changed, remapped)
+        index._empty = _pack(np.zeros(index.size, dtype=bool))
+        return index
+
+    @staticmethod
+    def _updated_category_bits(bits, column, changed, remapped):
+        keys = np.char.lower(np.asarray(column)[changed].astype(str))
+        updated = {}
+        for key in set(bits) | set(keys.tolist()):
+            mask = remapped(bits[key]) if key in bits else np.zeros(len(column), dtype=bool)
+            mask[changed] = keys == key
+            updated[key] = _pack(mask)
+        return updated
+
+    @staticmethod
+    def _category_bits(column):
+        # Lower-case each distinct value once, not once per request
+        values = np.asarray(column).astype(str)
+        categories, codes = np.unique(values, return_inverse=True)
+        bits = {}
+        for code, category in enumerate(categories):
+            key = category.lower()
+            packed = _pack(codes == code)
+            if key in bits:
+                # "SUV" and "suv" in the data end up in the same bitmap
+                packed = np.bitwise_or(bits[key], packed)
+            bits[key] = packed
+        return bits
+
+    # ---------------- single filters ----------------
+
+    def budget_bits(self, budget):
+        count = np.searchsorted(self.sorted_prices, budget, side="right")
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.price_order[:count]] = True
+        return _pack(mask)
+
+    def seats_bits(self, min_seats):
+        # "At least min_seats" is the bitset of the smallest level that satisfies it
+        pos = np.searchsorted(self.seat_levels, min_seats, side="left")
+        if pos == len(self.seat_levels):
+            return self._empty
+        return self.seat_bits[int(self.seat_levels[pos])]
+
+    def fuel_type_bits(self, fuel_type):
+        return self.fuel_bits.get(fuel_type.lower(), self._empty)
+
+    def body_type_bits(self, body_type):
+        return self.body_bits.get(body_type.lower(), self._empty)
+
+    # ---------------- combined filters ----------------
+
+    def bits(self, budget=None, min_seats=None, fuel_type=None, body_type=None):
+        """AND together every requested filter. Returns None when nothing filters."""
+        parts = []
+        if budget:
+            parts.append(self.budget_bits(budget))
+        if min_seats:
+            parts.append(self.seats_bits(min_seats))
+        if fuel_type:
+            parts.append(self.fuel_type_bits(fuel_type))
+        if body_type:
+            parts.append(self.body_type_bits(body_type))
+
+        if not parts:
+            return None
+
+        combined = parts[0]
+        for part in parts[1:]:
+            combined = np.bitwise_and(combined, part)
+        return combined
+
+    def mask(self, **filters):
+        """Boolean mask over all cars, or None when no filter applies."""
+        combined = self.bits(**filters)
+        if combined is None:
+            return None
+        return np.unpackbits(combined, count=self.size).astype(bool)
+
+    def rows(self, **filters):
+        """Sorted row ids passing every filter, or None when no filter applies."""
+        mask = self.mask(**filters)
+        if mask is None:
+            return None
+        return np.flatnonzero(mask)
@@ -0,0 +1,106 @@
+"""
+Synthetic car catalogues of any size, for scale testing.
+
+    python generate_catalogue.py 500000 [--seed 0] [--output cars_synthetic_500000.csv]
+
+Each row is one marketplace listing. Make, model, body style, model year and
+price level are drawn from the cars in cars_dataset_normalized.csv; the
+specs are then filled in by the estimators in normalize_car_prices.py and
+the *_norm columns are scaled over the generated rows. The CSV is written
+together with its binary store, so it can be served as-is.
+
+The same seed always gives the same catalogue.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import DEFAULT_CSV
+from normalize_car_prices import USD_TO_INR, estimate_columns, normalize_features, round_values, save
+
+# Raw auction body style for each normalized body type
+RAW_BODY_STYLES = {
+    "SUV": "SUV",
+    "Sedan": "Sedan",
+    "Coupe": "Coupe",
+    "Hatchback": "Hatchback",
+    "MPV": "Minivan",
+    "Wagon": "Wagon",
+    "Truck": "Crew Cab Pickup"
+}
+
+OLDEST_YEAR = 2010
+
+# -------- RAW LISTINGS ------------
+
+
+def reference_models(path=DEFAULT_CSV):
+    """The cars listings are drawn from: make, model, body style, newest year and price."""
+    cars = pd.read_csv(path, usecols=["name", "brand", "body_type", "price_min_lakh", "year"])
+    models = [name[len(brand):].strip() if name.startswith(brand) else name
+              for name, brand in zip(cars["name"], cars["brand"])]
+    return pd.DataFrame({
+        "make": cars["brand"],
+        "model": models,
+        "body": cars["body_type"].map(RAW_BODY_STYLES).fillna("Sedan"),
+        "year": cars["year"],
+        "sellingprice": cars["price_min_lakh"] * 100000 / USD_TO_INR
+    })
+
+
+def raw_listings(size, seed=0, models=None):
+    """
+    `size` listings in the column layout of car_prices.csv. Each one is a
+    reference model at most five years older than its newest year, in a
+    1.0-5.0 condition, priced around the model's price with 7% lost per
+    year of age.
+    """
+    models = reference_models() if models is None else models
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(models), size)
+
+    newest = models["year"].to_numpy()[picks]
+    age = np.minimum(rng.geometric(0.5, size) - 1, 5)
+    year = np.maximum(newest - age, OLDEST_YEAR)
+
+    condition = np.round(np.clip(rng.normal(3.5, 0.9, size), 1.0, 5.0), 1)
+
+    price = models["sellingprice"].to_numpy()[picks] * rng.lognormal(0.0, 0.25, size) * 0.93 ** (newest - year)
+    # Auction prices end in hundreds and stay inside the range clean() keeps
+    price = np.clip(np.round(price, -2), 1100, 199900)
+
+    return pd.DataFrame({
+        "make": models["make"].to_numpy()[picks],
+        "model": models["model"].to_numpy()[picks],
+        "body": models["body"].to_numpy()[picks],
+        "year": year.astype(np.int64),
+        "condition": condition,
+        "sellingprice": price
+    })
+
+# -------- CATALOGUE ------------
+
+
+def generate_catalogue(size, seed=0, models=None):
+    """A normalized catalogue of `size` listings, columns laid out like the real one."""
+    catalogue = estimate_columns(raw_listings(size, seed=seed, models=models))
+    return round_values(normalize_features(catalogue))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic MotorMony catalogue")
+    parser.add_argument("size", type=int, help="number of listings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="CSV path (default: cars_synthetic_<size>.csv)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(os.path.dirname(DEFAULT_CSV), f"cars_synthetic_{args.size}.csv")
+    catalogue = generate_catalogue(args.size, seed=args.seed)
+    store = save(catalogue, output)
+    print(f"Wrote {len(catalogue)} listings to {output} and {store}")
+
+
+if __name__ == "__main__":
+    main()
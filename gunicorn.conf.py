@@ -0,0 +1,41 @@
+"""
+Production server settings:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app and the catalogue (feature matrix, filter indexes, precomputed
+intent rankings) are loaded once in the master before it forks, so every
+worker shares them copy-on-write instead of building its own. Each worker
+runs threads that accept requests and hand the scoring to a bounded pool
+(see worker_pool.py); NumPy drops the GIL inside its array loops, so the
+threads of one worker overlap on the heavy part of a request.
+
+WEB_CONCURRENCY, MOTORMONY_THREADS, MOTORMONY_SCORING_THREADS and
+MOTORMONY_SCORING_QUEUE override the defaults below.
+"""
+import gc
+import os
+
+cores = os.cpu_count() or 1
+
+preload_app = True
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", cores))
+# Request threads per worker: enough to keep the scoring threads fed while
+# others parse HTTP and write responses
+threads = int(os.environ.get("MOTORMONY_THREADS", "8"))
+
+# Read by app.py when the master imports it
+os.environ.setdefault("MOTORMONY_SCORING_THREADS", "2")
+os.environ.setdefault("MOTORMONY_SCORING_QUEUE", "32")
+
+
+def when_ready(server):
+    # Runs in the master after preloading the app and before any worker is forked
+    import score_engine
+
+    dataset = score_engine.current_dataset()
+    # Keep the garbage collector from touching (and so copying) the shared pages
+    gc.freeze()
+    server.log.info("Catalogue %s loaded: %d cars, shared by %d workers",
+                    dataset.version, len(dataset.features), workers)
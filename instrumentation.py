@@ -0,0 +1,161 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# -------- PER-STAGE TIMING ------------
+#
+# Code wraps each stage of a request in `with stage("score"):`. Every timing
+# goes into a per-stage latency histogram (served by /metrics in Prometheus
+# text format) and, while a request is being recorded, into that request's
+# list of timings (sent back as a Server-Timing header).
+#
+# Set MOTORMONY_TIMING=0 to turn it off: stage() then hands back one shared
+# no-op context manager and nothing is measured.
+
+ENABLED = os.environ.get("MOTORMONY_TIMING", "1") != "0"
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+METRIC_NAME = "motormony_stage_duration_seconds"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, safe to update from several threads."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)     # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        slot = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """(cumulative bucket counts, sum, count), read consistently."""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = []
+        running = 0
+        for n in counts:
+            running += n
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+HISTOGRAMS = {}
+_histograms_lock = threading.Lock()
+
+# Timings of the request being served in this context, or None when not recording
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def histogram(name):
+    found = HISTOGRAMS.get(name)
+    if found is None:
+        with _histograms_lock:
+            found = HISTOGRAMS.setdefault(name, Histogram())
+    return found
+
+
+def record(name, seconds):
+    histogram(name).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_DISABLED = nullcontext()
+
+
+def stage(name):
+    """Context manager timing one stage; a shared no-op when timing is off."""
+    if not ENABLED:
+        return _DISABLED
+    return _Stage(name)
+
+
+def reset():
+    with _histograms_lock:
+        HISTOGRAMS.clear()
+
+# -------- PER-REQUEST TIMINGS ------------
+
+
+def begin_request():
+    """Start collecting the timings of the current request."""
+    if ENABLED:
+        _request_timings.set([])
+
+
+def end_request():
+    """Stop collecting and return the request's [(stage, seconds), ...]."""
+    timings = _request_timings.get()
+    _request_timings.set(None)
+    return timings or []
+
+
+def server_timing_header(timings):
+    """
+    Server-Timing header value, e.g. "parse;dur=0.041, score;dur=0.310".
+    Durations are in milliseconds; repeated stages are added together.
+    """
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in totals.items())
+
+# -------- PROMETHEUS EXPOSITION ------------
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(extra=()):
+    """
+    Every stage histogram in Prometheus text format, followed by the
+    `extra` metrics given as (name, type, help, value) tuples.
+    """
+    lines = [
+        f"# HELP {METRIC_NAME} Time spent in each stage of a recommendation request.",
+        f"# TYPE {METRIC_NAME} histogram"
+    ]
+    for name in sorted(HISTOGRAMS):
+        cumulative, total, count = HISTOGRAMS[name].snapshot()
+        bounds = [repr(bound) for bound in BUCKETS] + ["+Inf"]
+        for bound, n in zip(bounds, cumulative):
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{name}",le="{bound}"}} {n}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{name}"}} {total!r}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{name}"}} {count}')
+
+    for name, kind, description, value in extra:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
@@ -40,90 +40,170 @@ BODY_TYPE_WORDS = {
     "mpv": ["mpv", "minivan"]
 }
 
-# ------------------- PARSING FUNCTIONS -------------------
-
-def detect_intents(text):
-    text = text.lower()
-    intents = []
+# Words naming what a Pareto query trades off (see score_engine.OBJECTIVES)
+OBJECTIVE_WORDS = {
+    "price": ["cheap", "cheapest", "affordable", "low cost", "price", "budget"],
+    "safety": ["safe", "safest", "safety"],
+    "power": ["powerful", "power", "fast", "fastest", "bhp", "performance"],
+    "mileage": ["mileage", "efficient", "economical", "kmpl"],
+    "resale": ["resale", "value hold"]
+}
 
-    if any(word in text for word in FAMILY_WORDS):
-        intents.append("family")
+# ------------------- COMPILED MATCHER -------------------
+#
+# Every keyword table is compiled at import time into one word-boundary
+# regex, so a query is lowercased once and scanned once. Each keyword maps
+# to the (field, label) pairs it signals, e.g. "electric" -> intent "ev"
+# and fuel "ev".
+
+INTENT_TABLE = [
+    ("family", FAMILY_WORDS),
+    ("budget", BUDGET_WORDS),
+    ("performance", PERFORMANCE_WORDS),
+    ("collector", COLLECTOR_WORDS),
+    ("ev", EV_WORDS),
+    ("resale", RESALE_WORDS)
+]
 
-    if any(word in text for word in BUDGET_WORDS):
-        intents.append("budget")
+INTENT_ORDER = [intent for intent, _ in INTENT_TABLE]
+FUEL_ORDER = list(FUEL_WORDS)
+BODY_TYPE_ORDER = list(BODY_TYPE_WORDS)
+
+
+def _keyword_labels():
+    direct = {}
+    for intent, words in INTENT_TABLE:
+        for word in words:
+            direct.setdefault(word, set()).add(("intent", intent))
+    for fuel, words in FUEL_WORDS.items():
+        for word in words:
+            direct.setdefault(word, set()).add(("fuel_type", fuel))
+    for body, words in BODY_TYPE_WORDS.items():
+        for word in words:
+            direct.setdefault(word, set()).add(("body_type", body))
+
+    # A phrase also signals every shorter keyword it contains as whole words
+    # ("value hold" is a resale phrase but still says "value"), because the
+    # scan consumes the longest phrase and never sees the shorter one.
+    labels = {}
+    for phrase in direct:
+        labels[phrase] = set()
+        for word, word_labels in direct.items():
+            if re.search(r"\b" + re.escape(word) + r"\b", phrase):
+                labels[phrase] |= word_labels
+    return labels
+
+
+KEYWORD_LABELS = _keyword_labels()
+
+# Longest phrases first so "good resale" wins over "resale"
+_KEYWORDS = sorted(KEYWORD_LABELS, key=len, reverse=True)
+
+QUERY_PATTERN = re.compile(
+    r"(?P<seats>\d+)[\s-]*(?P<seat_unit>seaters?|people|persons)\b"
+    r"|(?P<lakh>\d+(?:\.\d+)?)\s*(?:lakhs?|la|l)\b"
+    r"|\b(?P<rupees>\d{5,7})\b"
+    r"|\b(?P<keyword>" + "|".join(re.escape(k) for k in _KEYWORDS) + r")s?\b"
+)
+
+OBJECTIVE_PATTERN = re.compile(
+    r"\b(?P<word>" + "|".join(re.escape(w) for w in sorted(
+        (w for words in OBJECTIVE_WORDS.values() for w in words), key=len, reverse=True)) + r")\b"
+)
+_OBJECTIVE_OF = {word: objective for objective, words in OBJECTIVE_WORDS.items() for word in words}
+
+
+def scan_query(text):
+    """
+    Single pass over the lowercased query. Returns the raw findings:
+    sets of intents / fuels / body types plus the first budget and seat numbers.
+    """
+    found = {"intent": set(), "fuel_type": set(), "body_type": set()}
+    lakh = rupees = seats = None
+
+    for match in QUERY_PATTERN.finditer(text.lower()):
+        keyword, number = match.group("keyword"), match.group("seats")
+        if keyword is not None:
+            labels = KEYWORD_LABELS[keyword]
+        elif number is not None:
+            if seats is None:
+                seats = int(number)
+            # "7 seater" is itself a family keyword
+            labels = ()
+            if match.group("seat_unit").startswith("seater"):
+                labels = KEYWORD_LABELS.get(f"{number} seater", ())
+        elif match.group("lakh") is not None:
+            if lakh is None:
+                lakh = float(match.group("lakh"))
+            continue
+        else:
+            if rupees is None:
+                rupees = float(match.group("rupees")) / 100000.0
+            continue
+
+        for field, label in labels:
+            found[field].add(label)
 
-    if any(word in text for word in PERFORMANCE_WORDS):
-        intents.append("performance")
+    return {
+        "intents": found["intent"],
+        "fuel_types": found["fuel_type"],
+        "body_types": found["body_type"],
+        "budget": lakh if lakh is not None else rupees,
+        "min_seats": seats
+    }
 
-    if any(word in text for word in COLLECTOR_WORDS):
-        intents.append("collector")
 
-    if any(word in text for word in EV_WORDS):
-        intents.append("ev")
+def _first_in_order(order, labels):
+    for label in order:
+        if label in labels:
+            return label
+    return None
 
-    if any(word in text for word in RESALE_WORDS):
-        intents.append("resale")
+# ------------------- PARSING FUNCTIONS -------------------
 
+def _intents(scan):
+    intents = [intent for intent in INTENT_ORDER if intent in scan["intents"]]
     if len(intents) == 0:
         intents.append("general")
-
     return intents
 
 
-def extract_budget(text):
-    text = text.lower()
+def detect_intents(text):
+    return _intents(scan_query(text))
 
-    # Match: "under 10 lakh", "below 12 lakhs", "15 L", etc.
-    match = re.search(r"(\d+)\s*(lakh|lakhs|l|la)", text)
-    if match:
-        return float(match.group(1))
 
-    # Match rupees directly: "under 500000"
-    match2 = re.search(r"(\d{5,7})", text)
-    if match2:
-        amount = float(match2.group(1)) / 100000.0
-        return amount
+def detect_objectives(text):
+    """Objectives the query names, in OBJECTIVE_WORDS order; empty when it names none."""
+    found = {_OBJECTIVE_OF[match.group("word")] for match in OBJECTIVE_PATTERN.finditer(text.lower())}
+    return [objective for objective in OBJECTIVE_WORDS if objective in found]
 
-    return None
+
+def extract_budget(text):
+    # "under 10 lakh", "below 12.5 lakhs", "15 L", or rupees directly: "under 500000"
+    return scan_query(text)["budget"]
 
 
 def extract_seats(text):
-    match = re.search(r"(\d+)\s*(seater|seaters|people|persons)", text.lower())
-    if match:
-        return int(match.group(1))
-    return None
+    return scan_query(text)["min_seats"]
 
 
 def extract_fuel(text):
-    text = text.lower()
-    for fuel, keywords in FUEL_WORDS.items():
-        if any(word in text for word in keywords):
-            return fuel
-    return None
+    return _first_in_order(FUEL_ORDER, scan_query(text)["fuel_types"])
 
 
 def extract_body_type(text):
-    text = text.lower()
-    for body, keywords in BODY_TYPE_WORDS.items():
-        if any(word in text for word in keywords):
-            return body
-    return None
+    return _first_in_order(BODY_TYPE_ORDER, scan_query(text)["body_types"])
 
 
 # ------------------- MAIN PARSER -------------------
 
 def parse_query(text):
-    intents = detect_intents(text)
-    budget = extract_budget(text)
-    min_seats = extract_seats(text)
-    fuel_type = extract_fuel(text)
-    body_type = extract_body_type(text)
+    scan = scan_query(text)
 
     return {
-        "intents": intents,
-        "budget": budget,
-        "min_seats": min_seats,
-        "fuel_type": fuel_type,
-        "body_type": body_type
+        "intents": _intents(scan),
+        "budget": scan["budget"],
+        "min_seats": scan["min_seats"],
+        "fuel_type": _first_in_order(FUEL_ORDER, scan["fuel_types"]),
+        "body_type": _first_in_order(BODY_TYPE_ORDER, scan["body_types"])
     }
-
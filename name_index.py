@@ -0,0 +1,327 @@
+import bisect
+import re
+
+import numpy as np
+
+from common_words import is_common
+from intent_parser import KEYWORD_LABELS
+
+# -------- BRAND / MODEL NAME INDEX BUILT ONCE AT LOAD TIME ------------
+#
+# Finds brand and model mentions in a query ("Honda City under 12 lakh",
+# "toyta corola") without scanning the name column:
+#
+# - brands: token phrase -> brand, looked up directly ("land rover")
+# - models: every car's model tokens ("5 series gran turismo"), sorted, so
+#   all cars whose model starts with a phrase are one bisect range
+# - typos: swapped or extra letters are looked up directly; otherwise a
+#   trigram index over the vocabulary, bucketed by token length, proposes
+#   a few candidates that are checked by edit distance; everyday words
+#   ("quick", "navigation") are never corrected
+#
+# Only a brand spelt exactly restricts the results: to the brand, or to one
+# of its models when that follows, spelt exactly too. Anything weaker moves
+# those cars to the top instead: a corrected brand or model, or a model
+# named without its brand. Everyday words on their own are never a model
+# ("black" is not the Black Diamond Avalanche, "city" not the Honda City).
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Never read as a brand or a bare model: query filler, everyday words that
+# are also brand names, and every keyword the intent parser already reads
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "best", "buy", "can", "car", "cars", "cheap", "for", "from", "good",
+    "have", "i", "in", "is", "like", "looking", "me", "mini", "my", "need", "new", "of", "on", "or",
+    "price", "show", "smart", "something", "than", "that", "the", "to", "top", "under", "below", "upto",
+    "up", "want", "with", "within", "lakh", "lakhs", "seater", "seaters", "people", "persons", "engine"
+} | {token for keyword in KEYWORD_LABELS for token in TOKEN_PATTERN.findall(keyword)}
+
+# Shortest token that may be a typo, and how many of the known words
+# sharing the most trigrams with it are compared letter by letter
+MIN_FUZZY_LENGTH = 4
+MAX_CANDIDATES = 32
+
+
+def tokens(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def ordinary(token):
+    """Query filler, parser keywords and everyday English: never read as a typo or a bare model."""
+    return token in STOPWORDS or is_common(token)
+
+
+def max_edits(token):
+    return 1 if len(token) < 8 else 2
+
+
+def _trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein (adjacent swaps count as one edit); limit + 1 once it is over `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _grouped(codes, count):
+    """Row ids grouped by code: rows of code c are order[starts[c]:starts[c + 1]]."""
+    order = np.argsort(codes, kind="stable")
+    starts = np.searchsorted(codes[order], np.arange(count + 1))
+    return order, starts
+
+
+class NameIndex:
+    """
+    Brand and model lookups over the `name` and `brand` columns. Brands and
+    names are matched case-insensitively; keys are their lower-cased forms.
+    """
+
+    def __init__(self, frame):
+        brands = np.char.lower(np.asarray(frame["brand"]).astype(str))
+        names = np.char.lower(np.asarray(frame["name"]).astype(str))
+        brand_keys, brand_codes = np.unique(brands, return_inverse=True)
+        name_keys, name_codes = np.unique(names, return_inverse=True)
+        self._index_rows(brand_keys, brand_codes, name_keys, name_codes)
+        self._index_names()
+
+    def _index_rows(self, brand_keys, brand_codes, name_keys, name_codes):
+        self.size = len(name_codes)
+        self.brand_keys, self.name_keys = brand_keys, name_keys
+        self.brand_codes, self.name_codes = brand_codes.astype(np.int32), name_codes.astype(np.int32)
+        self.brand_ids = {key: i for i, key in enumerate(self.brand_keys.tolist())}
+        self.name_ids = {key: i for i, key in enumerate(self.name_keys.tolist())}
+        self._brand_rows = _grouped(self.brand_codes, len(self.brand_keys))
+        self._name_rows = _grouped(self.name_codes, len(self.name_keys))
+
+    def _index_names(self):
+        # Brand of every name (names always start with their brand)
+        first_row = self._name_rows[0][self._name_rows[1][:-1]]
+        name_brand = self.brand_keys[self.brand_codes[first_row]].tolist()
+
+        self.brand_phrases = {tuple(tokens(brand)): brand for brand in self.brand_ids}
+        self.longest_brand = max((len(phrase) for phrase in self.brand_phrases), default=0)
+
+        # (model tokens, name key) sorted, per brand and across all brands
+        by_brand = {}
+        for name, brand in zip(self.name_keys.tolist(), name_brand):
+            model = tuple(tokens(name)[len(tokens(brand)):])
+            if model:
+                by_brand.setdefault(brand, []).append((model, name))
+        self.models = {brand: sorted(entries) for brand, entries in by_brand.items()}
+        self.all_models = sorted(entry for entries in self.models.values() for entry in entries)
+        self.brand_names = {}
+        for name, brand in zip(self.name_keys.tolist(), name_brand):
+            self.brand_names.setdefault(brand, []).append(name)
+
+        self._build_vocabulary()
+        self._corrections = {}
+
+    # Built from the distinct names only, so an update that names no new car shares them
+    NAME_ATTRIBUTES = ("brand_phrases", "longest_brand", "models", "all_models", "brand_names", "vocabulary",
+                       "words", "word_set", "trigram_postings", "_corrections")
+
+    def updated(self, frame, inserted, changed):
+        """
+        The index of `frame`: the indexed catalogue with new rows at
+        `inserted` and new values in rows `changed` (both in the numbering
+        of `frame`; `changed` includes `inserted`). Only those rows are read
+        again; the model and typo tables are rebuilt only when a new brand
+        or name shows up.
+        """
+        kept = np.ones(len(frame), dtype=bool)
+        kept[inserted] = False
+        old_to_new = np.flatnonzero(kept)
+        brands = np.char.lower(np.asarray(frame["brand"][changed]).astype(str))
+        names = np.char.lower(np.asarray(frame["name"][changed]).astype(str))
+
+        def recoded(keys, codes, changed_keys):
+            # Keys no car uses any more are kept; they simply match no rows
+            all_keys = np.union1d(keys, changed_keys)
+            new_codes = np.empty(len(frame), dtype=np.int32)
+            new_codes[old_to_new] = np.searchsorted(all_keys, keys)[codes]
+            new_codes[changed] = np.searchsorted(all_keys, changed_keys)
+            return all_keys, new_codes
+
+        index = NameIndex.__new__(NameIndex)
+        index._index_rows(*recoded(self.brand_keys, self.brand_codes, brands),
+                          *recoded(self.name_keys, self.name_codes, names))
+        if len(index.name_keys) == len(self.name_keys) and len(index.brand_keys) == len(self.brand_keys):
+            for attr in self.NAME_ATTRIBUTES:
+                setattr(index, attr, getattr(self, attr))
+        else:
+            index._index_names()
+        return index
+
+    def _build_vocabulary(self):
+        vocabulary = set()
+        for phrase in self.brand_phrases:
+            vocabulary.update(phrase)
+        for model, _ in self.all_models:
+            vocabulary.update(model)
+        self.vocabulary = vocabulary
+
+        # Only alphabetic words are typo targets; "1500" or "x6" are not misspelt
+        words = sorted(word for word in vocabulary if word.isalpha() and len(word) >= MIN_FUZZY_LENGTH)
+        self.words = words
+        self.word_set = set(words)
+        postings = {}
+        for word_id, word in enumerate(words):
+            for gram in _trigrams(word):
+                postings.setdefault((len(word), gram), []).append(word_id)
+        self.trigram_postings = {key: np.asarray(ids, dtype=np.int32) for key, ids in postings.items()}
+
+    # ---------------- typo tolerance ----------------
+
+    def correct(self, token):
+        """`token` itself when it is known (or not a candidate), else its closest known word or None."""
+        if token in self.vocabulary:
+            return token
+        if not token.isalpha() or len(token) < MIN_FUZZY_LENGTH or ordinary(token):
+            return None
+        try:
+            return self._corrections[token]
+        except KeyError:
+            pass
+        # Another thread may clear the cache at any point, so return our own result
+        closest = self._closest(token)
+        if len(self._corrections) > 10000:
+            self._corrections.clear()
+        self._corrections[token] = closest
+        return closest
+
+    def _closest(self, token):
+        # Swapped or doubled letters first, straight from the word set: short
+        # words can lose every trigram to a swap ("cbie" for "cibe")
+        near = {token[:i] + token[i + 1] + token[i] + token[i + 2:] for i in range(len(token) - 1)}
+        near |= {token[:i] + token[i + 1:] for i in range(len(token))}
+        found = sorted(near & self.word_set)
+        if found:
+            return found[0]
+
+        limit = max_edits(token)
+        grams = _trigrams(token)
+        lists = [self.trigram_postings[key]
+                 for length in range(len(token) - limit, len(token) + limit + 1)
+                 for key in ((length, gram) for gram in grams) if key in self.trigram_postings]
+        if not lists:
+            return None
+        ids, counts = np.unique(np.concatenate(lists), return_counts=True)
+        # Each edit breaks at most four trigrams (a swap of two letters)
+        keep = counts >= max(1, len(grams) - 4 * limit)
+        ids, counts = ids[keep], counts[keep]
+
+        # Most shared trigrams first (then alphabetical); one edit is as close
+        # as an unknown token gets, so the first word that close wins
+        best, best_distance = None, limit + 1
+        for word_id in ids[np.lexsort((ids, -counts))][:MAX_CANDIDATES].tolist():
+            distance = edit_distance(token, self.words[word_id], best_distance - 1)
+            if distance < best_distance:
+                best, best_distance = self.words[word_id], distance
+                if distance == 1:
+                    break
+        return best
+
+    # ---------------- query extraction ----------------
+
+    @staticmethod
+    def _model_range(entries, phrase):
+        lo = bisect.bisect_left(entries, (phrase,))
+        hi = bisect.bisect_left(entries, (phrase + ("\uffff",),))
+        return lo, hi
+
+    def _longest_model(self, entries, words, start):
+        """(names, end) of the longest run of words from `start` that begins a model, or (None, start)."""
+        found, end = None, start
+        lo, hi = 0, len(entries)
+        for stop in range(start + 1, len(words) + 1):
+            if words[stop - 1] is None:
+                break
+            lo, hi = self._model_range(entries, tuple(words[start:stop]))
+            if lo == hi:
+                break
+            found, end = entries[lo:hi], stop
+        return ([name for _, name in found] if found else None), end
+
+    def _brand_at(self, words, start):
+        for stop in range(min(len(words), start + self.longest_brand), start, -1):
+            phrase = tuple(words[start:stop])
+            if None not in phrase and phrase in self.brand_phrases:
+                return self.brand_phrases[phrase], stop
+        return None, start
+
+    def extract(self, text):
+        """
+        Brand and model mentions in a query, as parse_query-style params:
+        "brands" and "models" (name keys) to filter on, "boost" (name keys)
+        for corrected names and models named without their brand. Empty
+        tuples when none.
+        """
+        raw = tokens(text)
+        words = [self.correct(token) for token in raw]
+        brands, models, boost = set(), set(), set()
+
+        def exact(start, stop):
+            return raw[start:stop] == words[start:stop]
+
+        i = 0
+        while i < len(words):
+            brand, end = self._brand_at(words, i)
+            if brand is not None and raw[i] not in STOPWORDS:
+                names, after = self._longest_model(self.models.get(brand, []), words, end)
+                if not exact(i, end):
+                    boost.update(names or self.brand_names.get(brand, ()))
+                elif names and exact(end, after):
+                    models.update(names)
+                else:
+                    brands.add(brand)
+                    boost.update(names or ())
+                i = after if names else end
+                continue
+            if words[i] is not None and raw[i].isalpha() and not ordinary(raw[i]) and not ordinary(words[i]) \
+                    and len(raw[i]) >= 3:
+                names, after = self._longest_model(self.all_models, words, i)
+                if names:
+                    boost.update(names)
+                    i = after
+                    continue
+            i += 1
+
+        return {"brands": tuple(sorted(brands)), "models": tuple(sorted(models)), "boost": tuple(sorted(boost))}
+
+    # ---------------- filters ----------------
+
+    def _rows(self, grouped, ids):
+        order, starts = grouped
+        if not ids:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([order[starts[i]:starts[i + 1]] for i in ids])
+
+    def mask(self, brands=(), models=()):
+        """Cars of any of `brands` or named any of `models`; None when both are empty."""
+        if not brands and not models:
+            return None
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self._rows(self._brand_rows, [self.brand_ids[b] for b in brands if b in self.brand_ids])] = True
+        mask[self._rows(self._name_rows, [self.name_ids[n] for n in models if n in self.name_ids])] = True
+        return mask
+
+    def bits(self, brands=(), models=()):
+        """mask() packed like the FilterIndex bitsets."""
+        mask = self.mask(brands, models)
+        return None if mask is None else np.packbits(mask)
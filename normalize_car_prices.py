@@ -1,31 +1,78 @@
+"""
+Build cars_dataset_normalized.csv from the raw auction data in car_prices.csv.
+
+    python normalize_car_prices.py [car_prices.csv] [--chunk-rows 200000] [--workers N]
+
+The estimate_* helpers fill in the specs the raw data does not have, one
+listing at a time. estimate_columns() is the same logic over whole columns,
+which is what the pipeline runs: the input is streamed in chunks, each
+chunk is cleaned and estimated, and the per-car aggregates are accumulated
+across chunks, so memory is bounded by the number of distinct cars rather
+than the size of the input. The output is identical to running the row by
+row helpers over the whole file at once.
+
+With --workers N the file is split into N byte ranges that are processed
+in parallel and their aggregates merged. Means are then summed in a
+different order, so the unrounded values can differ from the serial output
+in the last binary place. The default, --workers 1, gives the exact serial
+result.
+"""
+import argparse
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
-print("Loading car_prices.csv...")
-df = pd.read_csv("car_prices.csv")
-
-print(f"Original dataset: {len(df)} rows, {len(df.columns)} columns")
-print("\nColumns:", df.columns.tolist())
+# Convert price to lakhs (1 USD ≈ 83 INR, 1 Lakh = 100,000 INR)
+USD_TO_INR = 83
 
-# Clean and prepare the data
-print("\n1. Cleaning data...")
+# Normalized to a 0-1 scale as <feature>_norm for scoring
+FEATURES_TO_NORMALIZE = [
+    'price_min_lakh', 'mileage_kmpl', 'power_bhp', 
+    'safety_rating', 'resale_value_5yr'
+]
 
-# Remove rows with missing critical values
-df = df.dropna(subset=['make', 'model', 'sellingprice', 'year'])
+# Group by name and take representative values
+AGG_DICT = {
+    'brand': 'first',
+    'price_min_lakh': 'mean',
+    'seats': 'first',
+    'mileage_kmpl': 'mean',
+    'power_bhp': 'mean',
+    'safety_rating': 'mean',
+    'fuel_type': 'first',
+    'body_type': 'first',
+    'resale_value_5yr': 'mean',
+    'year': 'max'  # Take the newest year
+}
 
-# Remove outliers (very cheap or very expensive cars)
-df = df[(df['sellingprice'] > 1000) & (df['sellingprice'] < 200000)]
+# Columns the pipeline reads from car_prices.csv, in compact dtypes. The
+# condition is float64 as pandas infers it for the auction dump (it has
+# missing values), since the estimators look at its text form.
+RAW_DTYPES = {
+    'make': 'category',
+    'model': 'category',
+    'body': 'category',
+    'year': 'Int16',
+    'condition': 'float64',
+    'sellingprice': 'float64'
+}
 
-# Filter for recent years (2010-2015 range, as dataset doesn't have newer cars)
-df = df[df['year'] >= 2010]
+CHUNK_ROWS = 200_000
 
-# Convert price to lakhs (1 USD ≈ 83 INR, 1 Lakh = 100,000 INR)
-USD_TO_INR = 83
-df['price_min_lakh'] = (df['sellingprice'] * USD_TO_INR) / 100000
+# Decimals kept for each raw value in the output
+ROUNDING = {
+    'price_min_lakh': 2,
+    'mileage_kmpl': 1,
+    'power_bhp': 0,
+    'safety_rating': 1,
+    'resale_value_5yr': 1
+}
 
-# Create a combined name
-df['name'] = df['make'] + ' ' + df['model']
-df['brand'] = df['make']
+# -------- ESTIMATORS ------------
 
 # Estimate seats based on body type
 def estimate_seats(body):
@@ -39,7 +86,6 @@ def estimate_seats(body):
     else:
         return 5  # default
 
-df['seats'] = df['body'].apply(estimate_seats)
 
 # Estimate mileage based on year and type (rough estimates)
 def estimate_mileage(year, body):
@@ -61,7 +107,6 @@ def estimate_mileage(year, body):
     
     return max(10, base_mileage + year_bonus + type_adjustment)
 
-df['mileage_kmpl'] = df.apply(lambda x: estimate_mileage(x['year'], x['body']), axis=1)
 
 # Estimate power based on price and body type
 def estimate_power(price, body):
@@ -83,7 +128,6 @@ def estimate_power(price, body):
     
     return min(500, base_power + price_factor + type_adjustment)
 
-df['power_bhp'] = df.apply(lambda x: estimate_power(x['sellingprice'], x['body']), axis=1)
 
 # Estimate safety rating based on year and condition
 def estimate_safety(year, condition):
@@ -108,7 +152,6 @@ def estimate_safety(year, condition):
     
     return min(5.0, base_rating + year_bonus + condition_bonus)
 
-df['safety_rating'] = df.apply(lambda x: estimate_safety(x['year'], x['condition']), axis=1)
 
 # Create fuel_type based on make and model
 def estimate_fuel_type(make, model, year):
@@ -127,7 +170,6 @@ def estimate_fuel_type(make, model, year):
     else:
         return 'Petrol'
 
-df['fuel_type'] = df.apply(lambda x: estimate_fuel_type(x['make'], x['model'], x['year']), axis=1)
 
 # Map body types
 def normalize_body_type(body):
@@ -149,7 +191,6 @@ def normalize_body_type(body):
     else:
         return 'Sedan'
 
-df['body_type'] = df['body'].apply(normalize_body_type)
 
 # Add resale value estimate (based on condition and year)
 def estimate_resale(year, condition, price):
@@ -167,56 +208,510 @@ def estimate_resale(year, condition, price):
     resale_pct = max(30, (1 - depreciation) * 100 * condition_factor)
     return min(95, resale_pct)
 
-df['resale_value_5yr'] = df.apply(lambda x: estimate_resale(x['year'], x['condition'], x['sellingprice']), axis=1)
 
-# Select and aggregate data (take average for duplicate car models)
-print("\n2. Aggregating data by make and model...")
+# -------- VECTORISED ESTIMATORS ------------
+#
+# The same rules as the estimate_* functions above, over whole columns. Text
+# tests run once per distinct value (make, model, body and condition have
+# few of them) and the arithmetic is done in the same order, so every value
+# matches the row by row result exactly.
 
-# Group by name and take representative values
-agg_dict = {
-    'brand': 'first',
-    'price_min_lakh': 'mean',
-    'seats': 'first',
-    'mileage_kmpl': 'mean',
-    'power_bhp': 'mean',
-    'safety_rating': 'mean',
-    'fuel_type': 'first',
-    'body_type': 'first',
-    'resale_value_5yr': 'mean',
-    'year': 'max'  # Take the newest year
-}
 
-df_grouped = df.groupby('name').agg(agg_dict).reset_index()
+def _contains(values, *needles):
+    """Per row: does str(value).lower() contain any of `needles`."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    hits = np.array([any(needle in str(value).lower() for needle in needles) for value in uniques], dtype=bool)
+    return hits[codes]
 
-print(f"Aggregated to {len(df_grouped)} unique cars")
 
-# Normalize columns for scoring (0-1 scale)
-print("\n3. Normalizing features...")
+def _mapped(fn, values):
+    """fn(value) per row, evaluated once per distinct value."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return np.array([fn(value) for value in uniques], dtype=object)[codes]
 
-from sklearn.preprocessing import MinMaxScaler
 
-features_to_normalize = [
-    'price_min_lakh', 'mileage_kmpl', 'power_bhp', 
-    'safety_rating', 'resale_value_5yr'
-]
+def seats_column(body):
+    return np.select(
+        [_contains(body, 'suv', 'van'), _contains(body, 'sedan', 'coupe', 'hatchback'), _contains(body, 'truck')],
+        [7, 5, 2],
+        default=5
+    )
+
+
+def mileage_column(year, body):
+    type_adjustment = np.select(
+        [_contains(body, 'suv', 'truck'), _contains(body, 'sedan'), _contains(body, 'hatchback')],
+        [-5, 2, 5],
+        default=0
+    )
+    year_bonus = (year - 2010) * 0.5
+    return np.maximum(10, 20 + year_bonus + type_adjustment)
+
+
+def power_column(price, body):
+    type_adjustment = np.select(
+        [_contains(body, 'suv', 'truck'), _contains(body, 'sedan'), _contains(body, 'coupe')],
+        [50, 20, 40],
+        default=0
+    )
+    price_factor = (price / 10000) * 10
+    return np.minimum(500, 80 + price_factor + type_adjustment)
+
+
+def safety_column(year, condition):
+    year_bonus = np.select([year >= 2020, year >= 2015, year >= 2012], [1.5, 1.0, 0.5], default=0)
+    condition_bonus = np.where(_contains(condition, 'excellent', '5.0', '4.9'), 0.5, 0)
+    return np.minimum(5.0, 3.0 + year_bonus + condition_bonus)
+
+
+def fuel_type_column(make, model):
+    electric = _contains(make, 'tesla') | _contains(model, 'electric', 'ev')
+    hybrid = _contains(model, 'hybrid', 'prius')
+    return np.where(electric, 'EV', np.where(hybrid, 'Hybrid', 'Petrol')).astype(object)
+
+
+def resale_column(year, condition):
+    depreciation = (2025 - year) * 0.08
+    condition_factor = np.select(
+        [_contains(condition, 'excellent', '5.0'), _contains(condition, '4')],
+        [1.0, 0.9],
+        default=0.8
+    )
+    return np.minimum(95, np.maximum(30, (1 - depreciation) * 100 * condition_factor))
+
+
+def estimate_columns(df):
+    """
+    The output columns of every listing in a cleaned frame: what
+    add_estimates() derives, without a Python call per row.
+    """
+    make = df['make'].astype(str).to_numpy(dtype=object)
+    model = df['model'].astype(str).to_numpy(dtype=object)
+    body = df['body'].to_numpy(dtype=object)
+    year = df['year'].to_numpy(dtype=np.float64)
+    condition = df['condition'].to_numpy(dtype=object)
+    price = df['sellingprice'].to_numpy(dtype=np.float64)
+
+    return pd.DataFrame({
+        'name': make + ' ' + model,
+        'brand': make,
+        'price_min_lakh': (price * USD_TO_INR) / 100000,
+        'seats': seats_column(body),
+        'mileage_kmpl': mileage_column(year, body),
+        'power_bhp': power_column(price, body),
+        'safety_rating': safety_column(year, condition),
+        'fuel_type': fuel_type_column(make, model),
+        'body_type': _mapped(normalize_body_type, body),
+        'resale_value_5yr': resale_column(year, condition),
+        'year': year.astype(np.int64)
+    })
+
+
+# -------- PIPELINE STEPS ------------
+
+
+def clean(df):
+    # Remove rows with missing critical values
+    df = df.dropna(subset=['make', 'model', 'sellingprice', 'year'])
+
+    # Remove outliers (very cheap or very expensive cars)
+    df = df[(df['sellingprice'] > 1000) & (df['sellingprice'] < 200000)]
+
+    # Filter for recent years (2010-2015 range, as dataset doesn't have newer cars)
+    df = df[df['year'] >= 2010]
+    return df.copy()
+
+
+def add_estimates(df):
+    """Derive every output column of one listing from the raw auction columns."""
+    df['price_min_lakh'] = (df['sellingprice'] * USD_TO_INR) / 100000
+
+    # Create a combined name
+    df['name'] = df['make'] + ' ' + df['model']
+    df['brand'] = df['make']
+
+    df['seats'] = df['body'].apply(estimate_seats)
+    df['mileage_kmpl'] = df.apply(lambda x: estimate_mileage(x['year'], x['body']), axis=1)
+    df['power_bhp'] = df.apply(lambda x: estimate_power(x['sellingprice'], x['body']), axis=1)
+    df['safety_rating'] = df.apply(lambda x: estimate_safety(x['year'], x['condition']), axis=1)
+    df['fuel_type'] = df.apply(lambda x: estimate_fuel_type(x['make'], x['model'], x['year']), axis=1)
+    df['body_type'] = df['body'].apply(normalize_body_type)
+    df['resale_value_5yr'] = df.apply(lambda x: estimate_resale(x['year'], x['condition'], x['sellingprice']), axis=1)
+    return df
+
+
+def aggregate(df):
+    """One row per car model (duplicate listings are averaged)."""
+    return df.groupby('name').agg(AGG_DICT).reset_index()
+
+
+def normalize_features(df):
+    from sklearn.preprocessing import MinMaxScaler
+
+    scaler = MinMaxScaler()
+    for feature in FEATURES_TO_NORMALIZE:
+        if feature in df.columns:
+            df[f'{feature}_norm'] = scaler.fit_transform(df[[feature]])
+    return df
+
+
+def round_values(df):
+    for column, decimals in ROUNDING.items():
+        df[column] = df[column].round(decimals)
+    return df
+
+
+# -------- CHUNKED AGGREGATION ------------
+
+
+class RunningAggregate:
+    """
+    aggregate() computed incrementally: add() estimated chunks in file order,
+    then result() gives the frame aggregate() would give for all of them.
+
+    Means are kept as Kahan-compensated sums and counts, updated in row order
+    exactly the way pandas' groupby mean accumulates, so they come out
+    bit-identical. `first` columns keep the earliest value seen and `year`
+    its maximum.
+    """
+
+    MEAN_COLUMNS = [col for col, how in AGG_DICT.items() if how == 'mean']
+    FIRST_COLUMNS = [col for col, how in AGG_DICT.items() if how == 'first']
+    MAX_COLUMNS = [col for col, how in AGG_DICT.items() if how == 'max']
+
+    def __init__(self, capacity=1024):
+        self.slots = {}                      # name -> row in the arrays below
+        self.names = []
+        self.firsts = {col: [] for col in self.FIRST_COLUMNS}
+        self.sums = np.zeros((capacity, len(self.MEAN_COLUMNS)))
+        self.compensation = np.zeros((capacity, len(self.MEAN_COLUMNS)))
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.maxima = np.full((capacity, len(self.MAX_COLUMNS)), -np.inf)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _reserve(self, size):
+        if size <= len(self.counts):
+            return
+        capacity = max(size, 2 * len(self.counts))
+        for attr in ("sums", "compensation", "counts", "maxima"):
+            old = getattr(self, attr)
+            grown = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            if attr == "maxima":
+                grown.fill(-np.inf)
+            grown[:len(old)] = old
+            setattr(self, attr, grown)
+
+    def add(self, chunk):
+        """Fold one estimated chunk (estimate_columns output) into the aggregates."""
+        if not len(chunk):
+            return
+        codes, uniques = pd.factorize(chunk['name'])
+        _, first_rows = np.unique(codes, return_index=True)
+
+        slot_of_code = np.empty(len(uniques), dtype=np.intp)
+        for code, name in enumerate(uniques):
+            slot = self.slots.get(name)
+            if slot is None:
+                slot = self.slots[name] = len(self.names)
+                self.names.append(name)
+                for col in self.FIRST_COLUMNS:
+                    self.firsts[col].append(chunk[col].iat[first_rows[code]])
+            slot_of_code[code] = slot
+        self._reserve(len(self.names))
+
+        slots = slot_of_code[codes]
+        np.add.at(self.counts, slots, 1)
+        for j, col in enumerate(self.MAX_COLUMNS):
+            np.maximum.at(self.maxima[:, j], slots, chunk[col].to_numpy(dtype=np.float64))
+        self._kahan_add(slots, chunk[self.MEAN_COLUMNS].to_numpy(dtype=np.float64))
+
+    def merge(self, other):
+        """
+        Fold in the aggregates of the rows that follow this one's in the file
+        (a later shard). Counts add up, compensated sums are added as one more
+        Kahan step, `first` values of cars seen here win and maxima combine.
+        """
+        n = len(other.names)
+        slots = np.empty(n, dtype=np.intp)
+        for i, name in enumerate(other.names):
+            slot = self.slots.get(name)
+            if slot is None:
+                slot = self.slots[name] = len(self.names)
+                self.names.append(name)
+                for col in self.FIRST_COLUMNS:
+                    self.firsts[col].append(other.firsts[col][i])
+            slots[i] = slot
+        self._reserve(len(self.names))
+
+        # Every name appears once in `slots`, so plain fancy-index updates are safe
+        self.counts[slots] += other.counts[:n]
+        self.maxima[slots] = np.maximum(self.maxima[slots], other.maxima[:n])
+
+        total = self.sums[slots]
+        y = (other.sums[:n] - other.compensation[:n]) - self.compensation[slots]
+        t = total + y
+        compensation = t - total - y
+        compensation[compensation != compensation] = 0
+        self.compensation[slots] = compensation
+        self.sums[slots] = t
+
+    def _kahan_add(self, slots, values):
+        # Rows are visited in waves: wave k holds the k-th row of every car in
+        # the chunk. Within a wave each car appears once, so one vectorised
+        # step per wave applies the same sequential update pandas does per row.
+        order = np.argsort(slots, kind='stable')
+        by_car = slots[order]
+        starts = np.flatnonzero(np.r_[True, by_car[1:] != by_car[:-1]])
+        wave = np.arange(len(by_car)) - np.repeat(starts, np.diff(np.r_[starts, len(by_car)]))
+
+        by_wave = order[np.argsort(wave, kind='stable')]
+        bounds = np.searchsorted(np.sort(wave), np.arange(wave.max() + 2))
+        for k in range(len(bounds) - 1):
+            rows = by_wave[bounds[k]:bounds[k + 1]]
+            cars = slots[rows]
+            total = self.sums[cars]
+            y = values[rows] - self.compensation[cars]
+            t = total + y
+            compensation = t - total - y
+            compensation[compensation != compensation] = 0
+            self.compensation[cars] = compensation
+            self.sums[cars] = t
+
+    def means(self, slots=slice(None)):
+        """Current mean of every MEAN_COLUMNS column, for all cars or just `slots`."""
+        n = len(self.names)
+        return self.sums[:n][slots] / self.counts[:n][slots, None]
+
+    def reordered(self, order):
+        """A copy whose slot i holds the car in slot order[i] of this one."""
+        order = np.asarray(order, dtype=np.intp)
+        copy = RunningAggregate(capacity=max(len(order), 1))
+        copy.names = [self.names[i] for i in order]
+        copy.slots = {name: i for i, name in enumerate(copy.names)}
+        copy.firsts = {col: [values[i] for i in order] for col, values in self.firsts.items()}
+        for attr in ("sums", "compensation", "counts", "maxima"):
+            getattr(copy, attr)[:len(order)] = getattr(self, attr)[order]
+        return copy
+
+    def in_name_order(self):
+        """A copy with the cars in catalogue (name) order."""
+        return self.reordered(sorted(range(len(self.names)), key=self.names.__getitem__))
+
+    def result(self):
+        """One row per car, sorted by name, with the columns of aggregate()."""
+        n = len(self.names)
+        order = sorted(range(n), key=self.names.__getitem__)
+        means = self.means(order)
+
+        columns = {'name': np.array(self.names, dtype=object)[order]}
+        for col in AGG_DICT:
+            if col in self.MEAN_COLUMNS:
+                columns[col] = means[:, self.MEAN_COLUMNS.index(col)]
+            elif col in self.FIRST_COLUMNS:
+                columns[col] = pd.Series(self.firsts[col]).to_numpy()[order]
+            else:
+                columns[col] = self.maxima[:n, self.MAX_COLUMNS.index(col)][order].astype(np.int64)
+        return pd.DataFrame(columns)
+
+    def save(self, path):
+        """Write the running state (in the current slot order) as an .npz file."""
+        n = len(self.names)
+        np.savez(
+            path,
+            names=np.array(self.names, dtype=str),
+            sums=self.sums[:n],
+            compensation=self.compensation[:n],
+            counts=self.counts[:n],
+            maxima=self.maxima[:n],
+            **{f"first_{col}": np.array(values) for col, values in self.firsts.items()}
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            totals = cls(capacity=max(len(data["names"]), 1))
+            totals.names = data["names"].tolist()
+            totals.slots = {name: i for i, name in enumerate(totals.names)}
+            totals.firsts = {col: data[f"first_{col}"].tolist() for col in cls.FIRST_COLUMNS}
+            n = len(totals.names)
+            for attr in ("sums", "compensation", "counts", "maxima"):
+                getattr(totals, attr)[:n] = data[attr]
+        return totals
+
+
+def read_chunks(input_file, chunk_rows=CHUNK_ROWS):
+    """The columns the pipeline needs from car_prices.csv, chunk by chunk."""
+    return pd.read_csv(input_file, usecols=list(RAW_DTYPES), dtype=RAW_DTYPES, chunksize=chunk_rows)
+
+
+def aggregate_chunks(chunks, progress=None):
+    """Clean, estimate and aggregate raw chunks; returns (RunningAggregate, rows read)."""
+    totals = RunningAggregate()
+    rows_read = 0
+    for chunk in chunks:
+        rows_read += len(chunk)
+        totals.add(estimate_columns(clean(chunk)))
+        if progress:
+            progress(rows_read, len(totals))
+    return totals, rows_read
+
+
+def catalogue_from(totals):
+    """The normalized, rounded catalogue for a RunningAggregate."""
+    return round_values(normalize_features(totals.result()))
+
+
+def build_catalogue(input_file, chunk_rows=CHUNK_ROWS, progress=None):
+    """
+    Clean, estimate and aggregate car_prices.csv one chunk at a time.
+    Returns the normalized, rounded catalogue and the number of rows read.
+    """
+    totals, rows_read = aggregate_chunks(read_chunks(input_file, chunk_rows), progress)
+    return catalogue_from(totals), rows_read
+
+# -------- PARALLEL SHARDS ------------
+
+
+class ByteRange(io.RawIOBase):
+    """Read-only view of bytes [start, end) of a file."""
+
+    def __init__(self, path, start, end):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._file.read(min(len(buffer), self._remaining))
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def byte_shards(input_file, count):
+    """
+    The CSV's header columns and up to `count` (start, end) byte ranges that
+    cover its data rows. Every range starts at the beginning of a line.
+    Fields with embedded line breaks are not supported.
+    """
+    size = os.path.getsize(input_file)
+    with open(input_file, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        bounds = [f.tell()]
+        for i in range(1, count):
+            target = bounds[0] + (size - bounds[0]) * i // count
+            if target <= bounds[-1]:
+                continue
+            # Step back one byte so a target that is already a line start is kept
+            f.seek(target - 1)
+            f.readline()
+            if f.tell() >= size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+        bounds.append(size)
+    return header, list(zip(bounds, bounds[1:]))
+
+
+def read_shard_chunks(input_file, start, end, header, chunk_rows=CHUNK_ROWS):
+    """read_chunks() for the rows in one byte range."""
+    text = io.TextIOWrapper(io.BufferedReader(ByteRange(input_file, start, end)), encoding="utf-8", newline="")
+    return pd.read_csv(text, header=None, names=header, usecols=list(RAW_DTYPES), dtype=RAW_DTYPES, chunksize=chunk_rows)
+
+
+def _aggregate_shard(job):
+    input_file, start, end, header, chunk_rows = job
+    return aggregate_chunks(read_shard_chunks(input_file, start, end, header, chunk_rows))
+
+
+def aggregate_parallel(input_file, workers=1, chunk_rows=CHUNK_ROWS):
+    """
+    aggregate_chunks() over the whole file with the input split into byte
+    ranges that are aggregated in a process pool; the partial aggregates
+    are merged in file order. workers=1 (the default) reads the file
+    serially and is exact; workers=None uses one process per core.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return aggregate_chunks(read_chunks(input_file, chunk_rows))
+
+    header, shards = byte_shards(input_file, workers)
+    jobs = [(input_file, start, end, header, chunk_rows) for start, end in shards]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        parts = list(pool.map(_aggregate_shard, jobs))
+
+    totals, rows_read = parts[0]
+    for part, rows in parts[1:]:
+        totals.merge(part)
+        rows_read += rows
+    return totals, rows_read
+
+
+def build_catalogue_parallel(input_file, workers=1, chunk_rows=CHUNK_ROWS):
+    """build_catalogue() on `workers` processes; the MinMax scaling runs after the merge."""
+    totals, rows_read = aggregate_parallel(input_file, workers, chunk_rows)
+    return catalogue_from(totals), rows_read
+
+# -------- OUTPUT ------------
+
+
+def save(df, output_file, totals=None):
+    """
+    Write the CSV plus the columnar binary copy the scoring engine memory-maps.
+    With `totals`, also keep the running aggregates next to them so
+    dataset_updates.py can fold in new listings later.
+    """
+    from dataset_store import aggregate_path, write_store
+
+    # Readers (other workers' file watchers) only ever see a complete CSV
+    tmp = f"{output_file}.tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, output_file)
+    store = write_store(df, os.path.abspath(output_file))
+    if totals is not None:
+        totals.in_name_order().save(aggregate_path(os.path.abspath(output_file)))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize the raw car auction data")
+    parser.add_argument("input_file", nargs="?", default="car_prices.csv")
+    parser.add_argument("--output", default="cars_dataset_normalized.csv")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows read per chunk")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes to split the input across (default 1, the exact serial output; 0 = one per core)")
+    args = parser.parse_args()
+
+    print(f"Streaming {args.input_file} in chunks of {args.chunk_rows} rows, {args.workers} worker(s)...")
+    print("\n1. Cleaning, estimating and aggregating by make and model...")
+    if args.workers == 1:
+        totals, rows_read = aggregate_chunks(
+            read_chunks(args.input_file, args.chunk_rows),
+            progress=lambda rows, cars: print(f"   {rows} rows read, {cars} cars so far")
+        )
+    else:
+        totals, rows_read = aggregate_parallel(args.input_file, args.workers, args.chunk_rows)
+    df_grouped = catalogue_from(totals)
+
+    print(f"Original dataset: {rows_read} rows")
+    print(f"Aggregated to {len(df_grouped)} unique cars")
+
+    # Save the normalized dataset, plus the running aggregates for incremental updates
+    print(f"\n2. Binary store written to {save(df_grouped, args.output, totals)}")
+
+    print(f"\n✅ Success! Saved {len(df_grouped)} cars to {args.output}")
+    print("\nSample of processed data:")
+    print(df_grouped[['name', 'brand', 'price_min_lakh', 'seats', 'mileage_kmpl', 'power_bhp', 'safety_rating']].head(10))
+    print("\nColumns in output:", df_grouped.columns.tolist())
+
 
-scaler = MinMaxScaler()
-for feature in features_to_normalize:
-    if feature in df_grouped.columns:
-        df_grouped[f'{feature}_norm'] = scaler.fit_transform(df_grouped[[feature]])
-
-# Round numerical values
-df_grouped['price_min_lakh'] = df_grouped['price_min_lakh'].round(2)
-df_grouped['mileage_kmpl'] = df_grouped['mileage_kmpl'].round(1)
-df_grouped['power_bhp'] = df_grouped['power_bhp'].round(0)
-df_grouped['safety_rating'] = df_grouped['safety_rating'].round(1)
-df_grouped['resale_value_5yr'] = df_grouped['resale_value_5yr'].round(1)
-
-# Save the normalized dataset
-output_file = "cars_dataset_normalized.csv"
-df_grouped.to_csv(output_file, index=False)
-
-print(f"\n✅ Success! Saved {len(df_grouped)} cars to {output_file}")
-print("\nSample of processed data:")
-print(df_grouped[['name', 'brand', 'price_min_lakh', 'seats', 'mileage_kmpl', 'power_bhp', 'safety_rating']].head(10))
-print("\nColumns in output:", df_grouped.columns.tolist())
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# -------- REALISTIC SEARCH QUERIES ------------
+#
+# Shared by the parser regression tests and the benchmarks. Worded the way
+# people type into the search box: mixed case, plurals, rupee amounts,
+# several intents per query and plenty with no filter at all.
+
+QUERIES = [
+    "Family friendly 5 seater car under 12 lakhs with petrol engine",
+    "Looking for a sporty performance car under 25 lakhs",
+    "Show me rare collector cars",
+    "Electric SUV with long range",
+    "Budget car with good mileage under 8 lakhs",
+    "Performance SUV with high power",
+    "Electric vehicle with good range",
+    "safe car for my kids",
+    "cheap hatchback for city driving",
+    "7 seater MPV for a big family",
+    "affordable sedan under 10 lakh",
+    "fast coupe with lots of torque",
+    "vintage classic cars",
+    "limited special edition sports car",
+    "hybrid sedan with good resale",
+    "car that holds value, good resale value",
+    "diesel SUV under 20 lakhs",
+    "best car under 500000",
+    "zero emission car with battery range",
+    "comfortable car for children and grandparents",
+    "low cost car for every day commute",
+    "seven seater for weekend trips",
+    "minivan for 7 people",
+    "EVs under 15 L",
+    "I want a fast car with great acceleration",
+    "petrol hatchback under 6 lakhs",
+    "gasoline sedan for a family of 5 persons",
+    "premium luxury SUV",
+    "good value family SUV with 7 seaters",
+    "quick car with 300 bhp",
+    "rare collector car with good resale",
+    "cheap electric car",
+    "suv",
+    "Tesla",
+    "something reliable",
+    "12.5 lakh budget sedan",
+    "car under 9 lakhs with 12 litre boot",
+    "safe and cheap car",
+    "Hybrid MPV for family trips under 30 lakhs",
+    "show me every car you have",
+]
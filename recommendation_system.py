@@ -1,139 +1,397 @@
-from intent_parser import parse_query
-from score_engine import compute_scores
+from intent_parser import detect_objectives, parse_query
+import hashlib
+
+import numpy as np
+
+import score_engine
+from instrumentation import stage
+from result_cache import ResultCache
+from score_engine import default_objectives, objective_key, pareto, rank, rank_batch
+from suggestion_templates import SuggestionTemplates, car_facts
+
+# Ranked pages keyed on the parsed params, so every wording of the same search
+# shares one entry. Dropped whenever the dataset is reloaded.
+result_cache = ResultCache(maxsize=512, ttl=600)
+score_engine.RELOAD_HOOKS.append(result_cache.clear)
+
+# CarPilot text per (car, intents), shared by every request that suggests that car
+suggestion_templates = SuggestionTemplates()
 
 def generate_carpilot_suggestion(top_car, query_text, intents, params):
     """
     Generate intelligent CarPilot suggestion with detailed reasoning.
+    The car- and intent-specific text is rendered once and reused (see suggestion_templates.py).
     """
-    car = top_car
-    reasons = []
-    
-    # Analyze why this car is the best match
-    if "family" in intents:
-        reasons.append(f"✅ **Perfect for Families**: With {int(car['seats'])} comfortable seats and a {car.get('safety_rating', 'good')} star safety rating, this car prioritizes your family's wellbeing")
-        if car.get('mileage_kmpl'):
-            reasons.append(f"💰 **Cost-Efficient**: {car['mileage_kmpl']} km/l mileage keeps running costs low for daily school runs and weekend trips")
-    
-    if "performance" in intents:
-        if car.get('power_bhp'):
-            reasons.append(f"🏎️ **Powerful Performance**: {int(car['power_bhp'])} BHP delivers thrilling acceleration and highway confidence")
-        reasons.append(f"⚡ **Dynamic Driving**: Built for enthusiasts who demand responsive handling and spirited performance")
-    
-    if "budget" in intents:
-        reasons.append(f"💵 **Budget Champion**: At just ₹{car['price_min_lakh']}L, this offers exceptional value without compromising quality")
-        if car.get('mileage_kmpl'):
-            reasons.append(f"📊 **Low Running Costs**: {car['mileage_kmpl']} km/l efficiency means more money stays in your pocket")
-        if car.get('resale_value_5yr'):
-            reasons.append(f"📈 **Strong Resale**: Retains approximately {int(car.get('resale_value_5yr', 0))}% value after 5 years")
-    
-    if "ev" in intents or car.get('fuel_type', '').lower() == 'electric':
-        reasons.append(f"🌱 **Eco-Friendly Choice**: Zero emissions driving helps protect the environment")
-        reasons.append(f"⚡ **Future-Ready**: Electric powertrain means lower maintenance and no fuel expenses")
-    
-    if "luxury" in intents or car['price_min_lakh'] > 50:
-        reasons.append(f"👑 **Premium Experience**: {car['brand']} craftsmanship delivers refined comfort and cutting-edge technology")
-        if car.get('safety_rating'):
-            reasons.append(f"🛡️ **Top-Tier Safety**: {car['safety_rating']} star rating with advanced driver assistance systems")
-    
-    # Add budget context if specified
-    if params.get('budget'):
-        reasons.append(f"✓ **Within Budget**: Fits comfortably under your ₹{params['budget']}L budget")
-    
-    # Add general strengths
-    if car.get('safety_rating') and car['safety_rating'] >= 4 and "family" not in intents:
-        reasons.append(f"🛡️ **Safety First**: {car['safety_rating']} star safety rating for peace of mind")
-    
-    if car.get('resale_value_5yr') and car['resale_value_5yr'] >= 60 and "budget" not in intents:
-        reasons.append(f"💎 **Smart Investment**: Strong {int(car['resale_value_5yr'])}% resale value retention")
-    
-    # Generate recommendation summary
-    intent_text = ", ".join(intents).title()
-    summary = f"Based on your search for '{query_text}', our AI identified {intent_text} priorities. The **{car['name']}** scored {car['final_score']:.3f} - our highest match for your needs."
-    
-    return {
-        "car_name": car['name'],
-        "brand": car['brand'],
-        "score": float(car['final_score']),
-        "summary": summary,
-        "reasons": reasons,
-        "key_specs": {
-            "price": f"₹{car['price_min_lakh']}L",
-            "seats": int(car['seats']),
-            "power": f"{int(car['power_bhp'])} BHP" if car.get('power_bhp') else "N/A",
-            "mileage": f"{car['mileage_kmpl']} km/l" if car.get('mileage_kmpl') else "N/A",
-            "safety": f"{car['safety_rating']} ⭐" if car.get('safety_rating') else "N/A"
-        }
-    }
+    return suggestion_templates.render(top_car, query_text, intents, params)
+
+
+# "rank" orders every matching car by its intent score; "pareto" returns
+# only the cars no other car beats on all of the chosen objectives
+MODES = ("rank", "pareto")
 
-def recommend(query_text, top_k=5):
+
+def query_objectives(query_text, intents, objectives=None):
     """
-    Input: free‑form text query from user.
-    Output: list of top_k cars with final_score and reasons + CarPilot suggestion.
+    Objectives of a Pareto query: `objectives` when given, else the ones the
+    query names ("safe and cheap"), else the two its intents weigh most.
+    """
+    if objectives:
+        unknown = [name for name in objectives if name not in score_engine.OBJECTIVES]
+        if unknown:
+            raise ValueError(f"Unknown objectives: {', '.join(map(str, unknown))}")
+        return objective_key(objectives)
+    return objective_key(detect_objectives(query_text)) or default_objectives(intents)
+
+
+def parse(query_text, dataset, mode="rank", objectives=None):
+    """
+    parse_query() plus the brand and model mentions the dataset's name index
+    finds, and in "pareto" mode the objectives to trade off.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    params = dict(parse_query(query_text), **dataset.names.extract(query_text))
+    if mode == "pareto":
+        params["objectives"] = query_objectives(query_text, params["intents"], objectives)
+    return params
+
+
+def cache_key(params, top_k, offset, dataset):
+    """Canonical, hashable form of everything the ranked page depends on."""
+    return (
+        dataset.version,
+        tuple(params.get("intents", ["general"])),
+        params.get("budget"),
+        params.get("min_seats"),
+        params.get("fuel_type"),
+        params.get("body_type"),
+        params.get("brands", ()),
+        params.get("models", ()),
+        params.get("boost", ()),
+        params.get("objectives"),
+        top_k,
+        offset
+    )
+
+
+def rank_filters(params):
+    """rank() keyword arguments for the filters and boosts in `params`."""
+    filters = {name: params.get(name) for name in score_engine.FILTERS}
+    filters["boost"] = params.get("boost")
+    return filters
+
+
+def ranked(params, top_k, offset, dataset):
+    """(rows, scores, total) for parsed params: pareto() when they carry objectives, else rank()."""
+    intents = params.get("intents", ["general"])
+    if params.get("objectives"):
+        return pareto(intents, params["objectives"], top_k=top_k, offset=offset, dataset=dataset,
+                      **rank_filters(params))
+    return rank(intents, top_k=top_k, offset=offset, dataset=dataset, **rank_filters(params))
+
+
+def build_results(params, top_k=5, offset=0, dataset=None):
+    """
+    Rank and format one page of cars for already-parsed params.
+    Returns (results, total_matches); nothing here depends on the raw query text.
+    """
+    dataset = dataset or score_engine.current_dataset()
+
+    # Filter (budget, seats, fuel_type, body_type, brand/model) and rank only the requested page
+    rows, scores, total = ranked(params, top_k, offset, dataset)
+    with stage("format"):
+        return format_results(rows, scores, params, dataset), total
+
+
+def _optional(values, cast):
+    # Missing or NaN becomes None; a genuine 0 / 0.0 is kept
+    return [None if v is None or v != v else cast(v) for v in values]
+
+
+def _column(catalogue, column, rows, default=None):
+    if column not in catalogue:
+        return [default] * len(rows)
+    return catalogue[column][rows].tolist()
+
+
+def format_results(rows, scores, params, dataset):
+    """
+    Turn ranked catalogue rows and their scores into the JSON-ready result dicts.
+
+    Every needed column is gathered for all selected rows in one NumPy fancy
+    index and converted with tolist(), so the per-result work is one dict
+    and one reason string.
     """
-    # 1) Parse the user text into structured params
-    params = parse_query(query_text)
     intents = params.get("intents", ["general"])
     budget = params.get("budget")          # in lakhs, or None
     min_seats = params.get("min_seats")    # or None
-    fuel_type = params.get("fuel_type")    # currently unused, but ready for future filters
-    body_type = params.get("body_type")    # currently unused, but ready for future filters
+    catalogue = dataset.catalogue
+    rows = np.asarray(rows, dtype=np.intp)
+
+    names = _column(catalogue, "name", rows)
+    brands = _column(catalogue, "brand", rows)
+    final_scores = np.asarray(scores, dtype=np.float64).tolist()
+    prices = _column(catalogue, "price_min_lakh", rows)
+    seats = _column(catalogue, "seats", rows)
+    power = _optional(_column(catalogue, "power_bhp", rows), float)
+    mileage = _optional(_column(catalogue, "mileage_kmpl", rows), float)
+    safety = _optional(_column(catalogue, "safety_rating", rows), float)
+    fuel_types = _optional(_column(catalogue, "fuel_type", rows), str)
+    body_types = _optional(_column(catalogue, "body_type", rows), str)
+    resale = _optional(_column(catalogue, "resale_value_5yr", rows), float)
+    years = _optional(_column(catalogue, "year", rows), int)
 
-    # 2) Compute ranking scores
-    results = compute_scores(intents, budget=budget, min_seats=min_seats)
+    # Parts of the reason that are the same for every car on the page
+    intent_part = f"Intent: {', '.join(intents)}"
+    filter_parts = ""
+    # If budget or seats were specified, echo that
+    if budget is not None:
+        filter_parts += f"; Budget ≤ ₹{budget}L"
+    if min_seats is not None:
+        filter_parts += f"; Seats ≥ {min_seats}"
+    if params.get("objectives"):
+        filter_parts += f"; Pareto-optimal on {', '.join(params['objectives'])}"
 
-    # 3) Optionally filter by fuel_type or body_type if provided
-    if fuel_type:
-        # e.g., filter EV only if intent includes ev, or if user explicitly says petrol/diesel
-        # only keep rows where fuel_type matches; our dataset column is 'fuel_type' not normalized
-        results = results[results["fuel_type"].str.lower() == fuel_type.lower()]
+    output = []
+    for i in range(len(rows)):
+        output.append({
+            "name": names[i],
+            "brand": brands[i],
+            "final_score": final_scores[i],
+            "price_min_lakh": float(prices[i]),
+            "seats": int(seats[i]),
+            "power_bhp": power[i],
+            "mileage_kmpl": mileage[i],
+            "safety_rating": safety[i],
+            "fuel_type": fuel_types[i] if fuel_types[i] is not None else "N/A",
+            "body_type": body_types[i] if body_types[i] is not None else "N/A",
+            "resale_value_5yr": resale[i],
+            "year": years[i],
+            "reason": f"{intent_part}; Score: {final_scores[i]:.3f}; {car_facts(prices[i], seats[i])}{filter_parts}"
+        })
 
-    if body_type:
-        results = results[results["body_type"].str.lower() == body_type.lower()]
+    return output
 
-    # 4) Select top_k results
-    top_results = results.head(top_k)
 
-    # 5) Prepare a tidy list for return or display
-    output = []
+def iter_cars(rows, scores, params, dataset, chunk=32):
+    """
+    format_results() as a generator: the first car is materialised on its
+    own so it can be sent immediately, the rest in chunks of `chunk`.
+    """
+    bounds = [0, 1] + list(range(1 + chunk, len(rows), chunk)) + [len(rows)]
+    for start, stop in zip(bounds, bounds[1:]):
+        if start < stop:
+            yield from format_results(rows[start:stop], scores[start:stop], params, dataset)
+
+
+def cached_results(params, top_k=5, offset=0, dataset=None):
+    """build_results() behind the LRU cache; the entry is shared, so hand out fresh_copies() of it."""
+    dataset = dataset or score_engine.current_dataset()
+    key = cache_key(params, top_k, offset, dataset)
+    entry = result_cache.get(key)
+    if entry is None:
+        entry = build_results(params, top_k=top_k, offset=offset, dataset=dataset)
+        result_cache.put(key, entry)
+    return entry
+
+
+def fresh_copies(cars):
+    """New dicts for cached cars, so a caller editing its results cannot change the cache."""
+    return [dict(car) for car in cars]
+
+
+# Part of every ETag; bump it when the same inputs start producing a different body
+RESPONSE_FORMAT = 1
+
+
+def parse_request(query_text, mode="rank", objectives=None):
+    """(dataset, params): the catalogue snapshot a request is answered from and its parsed query."""
+    # One dataset snapshot for the whole request, even if a reload lands meanwhile
+    dataset = score_engine.current_dataset()
+    with stage("parse"):
+        return dataset, parse(query_text, dataset, mode, objectives)
+
+
+def response_etag(query_text, params, top_k, offset, dataset):
+    """
+    ETag of what recommend() returns for these inputs: a digest of the
+    ranked page's cache key (dataset version and parsed query) and of the
+    query text, which the CarPilot summary quotes.
+    """
+    key = repr((RESPONSE_FORMAT, cache_key(params, top_k, offset, dataset), query_text))
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def recommend(query_text, top_k=5, offset=0, mode="rank", objectives=None, parsed=None):
+    """
+    Input: free‑form text query from user.
+    Output: list of top_k cars with final_score and reasons + CarPilot suggestion.
+    Pass offset to fetch the next page without ranking the earlier ones again.
+    dataset_version names the catalogue the results were scored against.
+    With mode="pareto" only the Pareto-optimal cars on `objectives` (see
+    query_objectives) are returned, and "objectives" names them.
+    `parsed` is parse_request()'s result when the caller already has it.
+    """
+    # 1) Parse the user text into structured params
+    dataset, params = parsed or parse_request(query_text, mode, objectives)
+    intents = params.get("intents", ["general"])
+
+    # 2) Ranked page, shared by every query that parses to the same params
+    output, total = cached_results(params, top_k=top_k, offset=offset, dataset=dataset)
+
+    # 3) Only the CarPilot text depends on the raw query, so render it per call
     carpilot_suggestion = None
-    
-    for idx, (_, row) in enumerate(top_results.iterrows()):
-        # Build a quick reason summary
-        reason_parts = [
-            f"Intent: {', '.join(intents)}",
-            f"Score: {row['final_score']:.3f}",
-            f"Price (min): ₹{row['price_min_lakh']}L",
-            f"Seats: {row['seats']}"
-        ]
-        # If budget or seats were specified, echo that
-        if budget is not None:
-            reason_parts.append(f"Budget ≤ ₹{budget}L")
-        if min_seats is not None:
-            reason_parts.append(f"Seats ≥ {min_seats}")
-
-        car_data = {
-            "name": row["name"],
-            "brand": row["brand"],
-            "final_score": float(row["final_score"]),
-            "price_min_lakh": float(row["price_min_lakh"]),
-            "seats": int(row["seats"]),
-            "power_bhp": float(row.get("power_bhp", 0)) if row.get("power_bhp") else None,
-            "mileage_kmpl": float(row.get("mileage_kmpl", 0)) if row.get("mileage_kmpl") else None,
-            "safety_rating": float(row.get("safety_rating", 0)) if row.get("safety_rating") else None,
-            "fuel_type": str(row.get("fuel_type", "N/A")),
-            "body_type": str(row.get("body_type", "N/A")),
-            "resale_value_5yr": float(row.get("resale_value_5yr", 0)) if row.get("resale_value_5yr") else None,
-            "year": int(row.get("year", 0)) if row.get("year") else None,
-            "reason": "; ".join(reason_parts)
-        }
-        
-        output.append(car_data)
-        
-        # Generate CarPilot suggestion for top car
-        if idx == 0:
-            carpilot_suggestion = generate_carpilot_suggestion(car_data, query_text, intents, params)
-
-    return {
-        "results": output,
-        "carpilot_suggestion": carpilot_suggestion
+    if output and offset == 0:
+        with stage("suggestion"):
+            carpilot_suggestion = generate_carpilot_suggestion(output[0], query_text, intents, params)
+
+    response = {
+        "results": fresh_copies(output),
+        "carpilot_suggestion": carpilot_suggestion,
+        "total_matches": total,
+        "dataset_version": dataset.version
     }
+    if params.get("objectives"):
+        response["objectives"] = list(params["objectives"])
+    return response
+
+
+def rank_request(query_text, top_k=5, offset=0, mode="rank", objectives=None):
+    """
+    The ranking half of iter_recommend(): parse the query and rank its page,
+    or find the page in the result cache. Nothing is formatted yet.
+    """
+    dataset, params = parse_request(query_text, mode, objectives)
+    key = cache_key(params, top_k, offset, dataset)
+    entry = result_cache.get(key)
+    page = ranked(params, top_k, offset, dataset) if entry is None else None
+    return dataset, params, key, entry, page
+
+
+def iter_recommend(query_text, top_k=5, offset=0, mode="rank", objectives=None, ranked_request=None):
+    """
+    recommend() as a stream of events, for clients that render cars as they
+    arrive. Each car is formatted only when it is about to be yielded:
+
+        {"type": "meta", "total_matches": ..., "dataset_version": ...}
+        {"type": "car", "rank": 1, "car": {...}}
+        {"type": "carpilot_suggestion", "carpilot_suggestion": {...}}   (first page, after the first car)
+        {"type": "car", "rank": 2, "car": {...}}
+        ...
+        {"type": "end", "total_available": ...}
+
+    A fully consumed stream fills the result cache just like recommend().
+    `ranked_request` is rank_request()'s result when the caller already has it.
+    """
+    dataset, params, key, entry, page = ranked_request or rank_request(query_text, top_k, offset, mode, objectives)
+    intents = params.get("intents", ["general"])
+
+    if entry is not None:
+        cars, total = iter(entry[0]), entry[1]
+    else:
+        rows, scores, total = page
+        cars = iter_cars(rows, scores, params, dataset)
+
+    meta = {"type": "meta", "total_matches": total, "dataset_version": dataset.version}
+    if params.get("objectives"):
+        meta["objectives"] = list(params["objectives"])
+    yield meta
+
+    output = []
+    for car in cars:
+        output.append(car)
+        yield {"type": "car", "rank": offset + len(output), "car": dict(car)}
+
+        if len(output) == 1 and offset == 0:
+            yield {
+                "type": "carpilot_suggestion",
+                "carpilot_suggestion": generate_carpilot_suggestion(car, query_text, intents, params)
+            }
+
+    if entry is None:
+        result_cache.put(key, (output, total))
+
+    yield {"type": "end", "total_available": len(output)}
+
+
+def similar_cars(name, top_k=10):
+    """
+    The top_k cars closest to the car called `name` (misspelt or without its
+    brand is fine) in feature, fuel and body type space, closest first.
+    None when no car goes by that name.
+    """
+    dataset = score_engine.current_dataset()
+    with stage("parse"):
+        key = name.strip().lower()
+        if key not in dataset.names.name_ids:
+            mentions = dataset.names.extract(name)
+            found = mentions["models"] or mentions["boost"]
+            if not found:
+                return None
+            key = found[0]
+        same_name = dataset.names.mask(models=(key,))
+        target = int(np.argmax(same_name))
+
+    with stage("search"):
+        rows, distances = dataset.similar.search(dataset.similar.vectors[target], top_k, exclude=same_name)
+    distances = np.sqrt(distances.astype(np.float64))
+
+    with stage("format"):
+        car = format_results([target], [1.0], {"intents": ["general"]}, dataset)[0]
+        params = {"intents": [f"similar to {car['name']}"]}
+        results = format_results(rows, 1.0 / (1.0 + distances), params, dataset)
+    for result, distance in zip(results, distances.tolist()):
+        result["distance"] = distance
+
+    return {"car": car, "results": results, "dataset_version": dataset.version}
+
+
+def recommend_batch(queries, top_k=5, offset=0):
+    """
+    recommend() for a list of queries, returned in the same order.
+
+    Queries that parse to identical params are ranked once, and every
+    distinct weight vector that is not already cached is scored in a single
+    batched pass over the feature matrix. Each entry is identical to what
+    recommend() returns for that query on its own.
+    """
+    dataset = score_engine.current_dataset()
+    with stage("parse"):
+        parsed = [parse(query_text, dataset) for query_text in queries]
+    keys = [cache_key(params, top_k, offset, dataset) for params in parsed]
+
+    pages = {}
+    missing = {}
+    for key, params in zip(keys, parsed):
+        if key in pages or key in missing:
+            continue
+        entry = result_cache.get(key)
+        if entry is None:
+            missing[key] = params
+        else:
+            pages[key] = entry
+
+    if missing:
+        ranked = rank_batch(list(missing.values()), top_k=top_k, offset=offset, dataset=dataset)
+        for (key, params), (rows, scores, total) in zip(missing.items(), ranked):
+            with stage("format"):
+                entry = (format_results(rows, scores, params, dataset), total)
+            result_cache.put(key, entry)
+            pages[key] = entry
+
+    batch = []
+    for query_text, params, key in zip(queries, parsed, keys):
+        output, total = pages[key]
+        carpilot_suggestion = None
+        if output and offset == 0:
+            carpilot_suggestion = generate_carpilot_suggestion(
+                output[0], query_text, params.get("intents", ["general"]), params
+            )
+        batch.append({
+            "results": fresh_copies(output),
+            "carpilot_suggestion": carpilot_suggestion,
+            "total_matches": total,
+            "dataset_version": dataset.version
+        })
+
+    return batch
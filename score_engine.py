@@ -1,7 +1,24 @@
-import pandas as pd
+import itertools
+import logging
+import os
+import threading
+import time
 
-# Load normalized dataset
-df = pd.read_csv("cars_dataset_normalized.csv")
+import numpy as np
+
+import dataset_store
+from dataset_store import FEATURE_COLUMNS
+from filter_index import FilterIndex
+from name_index import NameIndex
+from similarity_index import SimilarityIndex
+from skyline import skyline
+from instrumentation import stage
+
+# Normalized dataset (resolved next to this file, not the working directory),
+# loaded by load_dataset() further down
+DATA_PATH = dataset_store.DEFAULT_CSV
+
+logger = logging.getLogger(__name__)
 
 # -------- INTENT WEIGHT PROFILES (Updated for new dataset) -------------
 
@@ -53,9 +70,19 @@ INTENT_WEIGHTS = {
 
 # --------- COMBINE WEIGHTS FROM MULTIPLE INTENTS ------------
 
+def intent_key(intent_list):
+    """
+    The known intents of `intent_list`, once each, in INTENT_WEIGHTS order.
+    Weights are always merged in this order, so "family, budget" and
+    "budget, family" score every car bit-identically.
+    """
+    found = set(intent_list)
+    return tuple(intent for intent in INTENT_WEIGHTS if intent in found)
+
+
 def merge_intent_weights(intent_list):
     combined = {}
-    for intent in intent_list:
+    for intent in intent_key(intent_list):
         w = INTENT_WEIGHTS.get(intent, {})
         for key, val in w.items():
             combined[key] = combined.get(key, 0) + val
@@ -67,26 +94,625 @@ def merge_intent_weights(intent_list):
 
     return combined
 
-# -------------- COMPUTE SCORES FOR ALL CARS ----------------
+# -------------- FEATURE MATRIX ----------------
+
+# The *_norm columns live in one contiguous float32 matrix
+# (LoadedDataset.features) whose column order is dataset_store.FEATURE_COLUMNS.
+
+
+def weight_vector(weights):
+    """Turn a merged weight dict into a vector aligned with FEATURE_COLUMNS."""
+    return np.array([weights.get(col, 0.0) for col in FEATURE_COLUMNS], dtype=np.float32)
+
+
+def score_matrix(features, weights):
+    """
+    Product of the feature matrix (n x f) with one or more weight vectors
+    (f or m x f), returned as an n x m score matrix.
+
+    The product is accumulated one feature column at a time instead of going
+    through BLAS: gemv and gemm round differently, and a query scored inside
+    a batch must get bit-identical scores to the same query scored alone.
+    """
+    weights = np.atleast_2d(weights)
+    scores = features[:, 0:1] * weights[:, 0]
+    for j in range(1, features.shape[1]):
+        scores += features[:, j:j + 1] * weights[:, j]
+    return scores
+
+# -------------- PRECOMPUTED INTENT RANKINGS ----------------
+#
+# Every query scores the catalogue with one of the 2^7 intent combinations,
+# so the full ranked order of each combination is computed once per loaded
+# dataset. An unfiltered query is then a slice of its order, and a filtered
+# one walks the order, skipping cars that fail the filters, until its page
+# is full. The orders are kept up to MOTORMONY_RANKING_BUDGET_MB (default
+# 64, 0 turns them off); combinations that do not fit, fewest intents
+# last, are scored per query as before.
+
+RANKING_BUDGET_MB = float(os.environ.get("MOTORMONY_RANKING_BUDGET_MB", "64"))
+
+
+def _intent_combinations():
+    """Every intent_key(), fewest intents first (the most common queries)."""
+    intents = list(INTENT_WEIGHTS)
+    combos = []
+    for size in range(1, len(intents) + 1):
+        combos.extend(itertools.combinations(intents, size))
+    return combos
+
+
+class IntentRankings:
+    """
+    Row ids of the catalogue best first (ties in row order) for each intent
+    combination that fits in `budget_bytes`, keyed by intent_key(). With
+    lazy=True no order is computed up front; each is built on first use.
+    """
+
+    def __init__(self, features, budget_bytes, lazy=False):
+        n = len(features)
+        self.features = features
+        self.dtype = np.int32 if n < 2 ** 31 else np.intp
+        self.budget_bytes = budget_bytes
+        self.table_bytes = n * np.dtype(self.dtype).itemsize
+        self.combinations = _intent_combinations()
+
+        fits = int(budget_bytes // self.table_bytes) if self.table_bytes else len(self.combinations)
+        self.stored = frozenset(self.combinations[:fits])
+        self.orders = {}
+        if lazy:
+            return
+        stored = self.combinations[:fits]
+        for start in range(0, len(stored), BATCH_BLOCK):
+            block = stored[start:start + BATCH_BLOCK]
+            scores = score_matrix(features, _combination_weights(block))
+            for j, combo in enumerate(block):
+                self.orders[combo] = np.argsort(-scores[:, j], kind="stable").astype(self.dtype)
+
+    def updated(self, features, inserted, changed):
+        """
+        The rankings of `features`: the ranked catalogue with new rows at
+        `inserted` and new values in rows `changed` (both in the numbering
+        of `features`; `changed` includes `inserted`). Every order drops the
+        changed rows and merges them back in at their (score, row) position,
+        as the stable argsort would place them; nothing is re-sorted. Orders
+        not built yet stay lazy.
+        """
+        rankings = IntentRankings(features, self.budget_bytes, lazy=True)
+        kept = np.ones(len(features), dtype=bool)
+        kept[inserted] = False
+        # New row id of each old row, -1 for the changed ones
+        renumbered = np.flatnonzero(kept).astype(self.dtype)
+        kept[changed] = False
+        renumbered[~kept[renumbered]] = -1
+
+        for combo, order in self.orders.items():
+            if combo not in rankings.stored:
+                continue
+            weights = _combination_weights([combo])
+            order = renumbered[order]
+            order = order[order >= 0]
+            merged = _merged(order, changed, lambda rows: score_matrix(features[rows], weights)[:, 0])
+            rankings.orders[combo] = merged.astype(rankings.dtype)
+        return rankings
+
+    def order(self, intent_list):
+        """The precomputed order for these intents, or None when it does not fit the budget."""
+        key = intent_key(intent_list)
+        order = self.orders.get(key)
+        if order is None and key in self.stored:
+            # Two threads may both build it; the results are identical
+            scores = score_matrix(self.features, _combination_weights([key]))[:, 0]
+            order = self.orders[key] = np.argsort(-scores, kind="stable").astype(self.dtype)
+        return order
+
+    def memory_report(self):
+        """How many orders are stored and what they cost."""
+        stored = sum(order.nbytes for order in list(self.orders.values()))
+        return {
+            "tables": len(self.orders),
+            "combinations": len(self.combinations),
+            "bytes_per_table": self.table_bytes,
+            "bytes": stored,
+            "budget_bytes": int(self.budget_bytes),
+            "dtype": np.dtype(self.dtype).name
+        }
+
+
+def _combination_weights(combos):
+    return np.stack([weight_vector(merge_intent_weights(combo)) for combo in combos])
+
+
+def _merged(order, rows, scores_of):
+    """
+    `order` (best score first, ties in row order) with `rows` merged in
+    exactly where a stable argsort of every score puts them. scores_of(ids)
+    scores row ids; only the rows a binary search probes are scored, so
+    the cost is len(rows) * log(len(order)) scores plus one copy.
+    """
+    if not len(order):
+        return rows[np.lexsort((rows, -scores_of(rows)))]
+    keys = -scores_of(rows)
+    by_key = np.lexsort((rows, keys))
+    rows, keys = rows[by_key], keys[by_key]
+    lo = np.zeros(len(rows), dtype=np.intp)
+    hi = np.full(len(rows), len(order), dtype=np.intp)
+    active = lo < hi
+    while active.any():
+        mid = (lo + hi) // 2
+        probe = order[np.minimum(mid, len(order) - 1)]
+        probe_keys = -scores_of(probe)
+        before = (probe_keys < keys) | ((probe_keys == keys) & (probe < rows))
+        lo = np.where(active & before, mid + 1, lo)
+        hi = np.where(active & ~before, mid, hi)
+        active = lo < hi
+    return np.insert(order, lo, rows)
+
+
+def _walk(order, mask, count):
+    """
+    The first `count` entries of `order` whose mask is set (all of them for
+    count=None). Reads the order in growing chunks, so a page of a broad
+    filter stops long before the end of the catalogue.
+    """
+    if count is None:
+        return order[mask[order]]
+
+    found = []
+    have = 0
+    start = 0
+    # Chunk sized from the filter's selectivity, doubled while it falls short
+    step = max(64, 2 * count * len(order) // max(int(np.count_nonzero(mask)), 1))
+    while have < count and start < len(order):
+        chunk = order[start:start + step]
+        hits = chunk[mask[chunk]]
+        found.append(hits)
+        have += len(hits)
+        start += step
+        step *= 2
+    return np.concatenate(found)[:count] if found else order[:0]
+
+
+def _rank_from_order(dataset, order, w, filters, boost, top_k, offset):
+    """rank() for a precomputed order; the same rows and scores as scoring in full."""
+    with stage("filter"):
+        mask = filter_mask(dataset, **filters)
+        boosted = boost_mask(dataset, boost)
+    with stage("sort"):
+        end = None if top_k is None else offset + top_k
+        total = len(order) if mask is None else int(np.count_nonzero(mask))
+        if boosted is None and mask is None:
+            picked = order[offset:end]
+        elif boosted is None:
+            picked = _walk(order, mask, end)[offset:]
+        else:
+            # Boosted cars first, then the rest, each in ranked order
+            first = boosted if mask is None else mask & boosted
+            head = _walk(order, first, end)
+            rest = end is None or len(head) < end
+            tail = _walk(order, ~first if mask is None else mask & ~boosted,
+                         None if end is None else end - len(head)) if rest else order[:0]
+            picked = np.concatenate([head, tail])[offset:]
+        picked = picked.astype(np.intp)
+    with stage("score"):
+        # Row by row the products are the same as over the full matrix
+        scores = score_matrix(dataset.features[picked], w)[:, 0]
+    return picked, scores, total
+
+# -------------- DATASET LOADING & HOT RELOAD ----------------
+#
+# Nothing is read at import time: the catalogue is loaded on first use, so
+# importing the app (a serverless cold start) only pays for NumPy.
+#
+# Each load produces an immutable LoadedDataset. A reload builds the new one
+# completely (feature matrix and indexes) before swapping the module-level
+# reference, so a request that grabbed a dataset keeps a consistent view
+# while the next request sees the new version.
+
+# Seconds between checks of the data files for changes; 0 turns watching off
+WATCH_INTERVAL = float(os.environ.get("MOTORMONY_WATCH_INTERVAL", "30"))
+
+
+def _data_file_stamps(path):
+    """(mtime, size) of the CSV and of the binary store's meta.json."""
+    stamps = []
+    for name in (path, os.path.join(dataset_store.store_path(path), "meta.json")):
+        try:
+            stat = os.stat(name)
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+class LoadedDataset:
+    """
+    One loaded catalogue together with its feature matrix and filter indexes.
+
+    `version` identifies the data itself (a prefix of its checksum), so every
+    worker serving the same file reports the same version. `generation`
+    counts loads within this process.
+
+    With `base` and `delta` (a dataset_updates.CatalogueDelta made against
+    base's catalogue) every index is patched from base's for the changed
+    rows instead of built from scratch. Intent orders are merged too, unless
+    a feature was rescaled: then every score moved, and each order is
+    rebuilt the first time a query needs it.
+    """
+
+    def __init__(self, catalogue, generation, path, stamps, base=None, delta=None):
+        self.catalogue = catalogue
+        self.features = catalogue.features
+        if base is None:
+            self.index = FilterIndex(catalogue)
+            self.names = NameIndex(catalogue)
+            self.similar = SimilarityIndex.of(catalogue, self.features)
+            self.rankings = IntentRankings(self.features, RANKING_BUDGET_MB * 1024 * 1024)
+        else:
+            inserted, changed = delta.inserted, delta.changed
+            self.index = base.index.updated(catalogue, inserted, changed)
+            self.names = base.names.updated(catalogue, inserted, changed)
+            self.similar = base.similar.updated(catalogue, self.features, inserted, changed)
+            if delta.rescaled:
+                self.rankings = IntentRankings(self.features, base.rankings.budget_bytes, lazy=True)
+            else:
+                self.rankings = base.rankings.updated(self.features, inserted, changed)
+        self.version = (catalogue.checksum or "unversioned")[:12]
+        self.generation = generation
+        self.path = path
+        self.stamps = stamps
+        self.next_check = time.monotonic() + WATCH_INTERVAL
+        self._frame = None
+
+    def frame(self):
+        """pandas view of the catalogue, for callers that still want a DataFrame."""
+        if self._frame is None:
+            self._frame = self.catalogue.to_frame()
+        return self._frame
+
+
+# Bumped on every (re)load; callbacks in RELOAD_HOOKS run after each reload
+DATASET_VERSION = 0
+RELOAD_HOOKS = []
+
+_dataset = None
+_load_lock = threading.RLock()      # one loader at a time
+_reload_thread = None
+# Guards _reload_thread only, never held while loading, so callers never wait on a reload
+_reload_thread_lock = threading.Lock()
+
+
+def load_dataset(path=None):
+    """(Re)load the catalogue, build its matrix and indexes, then swap it in."""
+    path = path or DATA_PATH
+    with _load_lock:
+        # Stamp before reading, so a write that lands mid-load triggers another reload
+        stamps = _data_file_stamps(path)
+        # mmap'd binary store when it is current, CSV otherwise
+        return install_catalogue(dataset_store.load_dataset(path), path, stamps)
+
+
+def install_catalogue(catalogue, path=None, stamps=None, base=None, delta=None):
+    """
+    Serve `catalogue`, swapping it in exactly like a reload. Catalogues that
+    did not come from a file (path=None) are never watched for changes.
+    `base` and `delta` are passed on to LoadedDataset.
+    """
+    global _dataset, DATASET_VERSION
+
+    with _load_lock:
+        dataset = LoadedDataset(catalogue, DATASET_VERSION + 1, path, stamps, base, delta)
+
+        DATASET_VERSION = dataset.generation
+        _dataset = dataset
+
+        for hook in RELOAD_HOOKS:
+            hook()
+
+    return dataset
 
-def compute_scores(intent_list, budget=None, min_seats=None):
+
+def apply_delta(delta, path=None):
+    """
+    Serve the catalogue of a dataset_updates.CatalogueDelta. When the delta
+    was made against the catalogue being served, its indexes are patched for
+    the changed rows instead of rebuilt; otherwise the data files are simply
+    reloaded.
+    """
+    path = path or DATA_PATH
+    with _load_lock:
+        current = _dataset
+        if current is None or current.version != delta.base_version:
+            return load_dataset(path)
+        return install_catalogue(delta.catalogue, path, _data_file_stamps(path), current, delta)
+
+
+def _reload_quietly(path):
+    try:
+        dataset = load_dataset(path)
+        logger.info("Dataset reloaded: version %s (generation %d)", dataset.version, dataset.generation)
+    except Exception:
+        # Keep serving the version we have; the watcher retries on the next check
+        logger.exception("Dataset reload failed")
+
+
+def reload_in_background(path=None):
+    """Rebuild the dataset on a background thread. False if a reload is already running."""
+    global _reload_thread
+
+    with _reload_thread_lock:
+        if _reload_thread is not None and _reload_thread.is_alive():
+            return False
+        _reload_thread = threading.Thread(
+            target=_reload_quietly, args=(path,), name="dataset-reload", daemon=True
+        )
+        _reload_thread.start()
+        return True
+
+
+def _check_for_changes(dataset):
+    # Polled from current_dataset() rather than a watcher thread, so it
+    # keeps working in every worker forked from a preloading master
+    now = time.monotonic()
+    if dataset.path is None or now < dataset.next_check:
+        return
+    dataset.next_check = now + WATCH_INTERVAL
+    if _data_file_stamps(dataset.path) != dataset.stamps:
+        reload_in_background(dataset.path)
+
+
+def current_dataset():
+    """
+    The dataset to serve from, loading it on first use. Callers should grab
+    it once per request and use that object throughout.
+    """
+    dataset = _dataset
+    if dataset is None:
+        with _load_lock:
+            dataset = _dataset or load_dataset()
+    elif WATCH_INTERVAL > 0:
+        _check_for_changes(dataset)
+    return dataset
+
+
+def __getattr__(name):
+    # df / FEATURES / INDEX used to be module globals filled at import time;
+    # keep them available, resolved lazily against the current dataset
+    if name == "df":
+        return current_dataset().frame()
+    if name == "FEATURES":
+        return current_dataset().features
+    if name == "INDEX":
+        return current_dataset().index
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# -------------- TOP-K SELECTION ----------------
+
+def top_k_rows(scores, k, offset=0):
+    """
+    Positions of the best scores from rank `offset` to `offset + k`, best first.
+
+    Uses a partial partition instead of a full sort, so the cost is
+    O(n + (offset + k) log(offset + k)). Equal scores keep their original
+    position order, exactly as a stable descending sort would.
+    """
+    n = len(scores)
+    end = min(n, offset + k)
+    if end <= offset:
+        return np.empty(0, dtype=np.intp)
+
+    if end < n:
+        # Value of the end-th best score: everything strictly better is in,
+        # and ties at the boundary are taken in position order
+        threshold = np.partition(scores, n - end)[n - end]
+        better = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[: end - len(better)]
+        candidates = np.concatenate([better, ties])
+    else:
+        candidates = np.arange(n)
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][offset:end]
+
+
+def _pick(scores, top_k, offset, boosted=None):
+    """
+    Page of positions into `scores`, best first. With `boosted` (a mask
+    over the same positions) every boosted position ranks ahead of the rest.
+    """
+    if boosted is not None:
+        first, rest = np.flatnonzero(boosted), np.flatnonzero(~boosted)
+        head = first[_pick(scores[first], top_k, offset)]
+        need = None if top_k is None else top_k - len(head)
+        tail = rest[_pick(scores[rest], need, max(0, offset - len(first)))] if need != 0 else rest[:0]
+        return np.concatenate([head, tail])
+    if top_k is None:
+        return np.argsort(-scores, kind="stable")[offset:]
+    return top_k_rows(scores, top_k, offset)
+
+
+# Keyword arguments of rank() that restrict which cars are ranked
+FILTERS = ("budget", "min_seats", "fuel_type", "body_type", "brands", "models")
+
+
+def filter_mask(dataset, budget=None, min_seats=None, fuel_type=None, body_type=None, brands=None, models=None):
+    """Boolean mask of the cars passing every filter, or None when nothing filters."""
+    mask = dataset.index.mask(budget=budget, min_seats=min_seats, fuel_type=fuel_type, body_type=body_type)
+    names = dataset.names.mask(brands or (), models or ())
+    if names is None:
+        return mask
+    return names if mask is None else mask & names
+
+
+def boost_mask(dataset, boost):
+    """Mask of the cars named in `boost`, or None."""
+    return dataset.names.mask(models=boost) if boost else None
+
+
+def rank(intent_list, budget=None, min_seats=None, fuel_type=None, body_type=None, top_k=None, offset=0, dataset=None,
+         brands=None, models=None, boost=None):
+    """
+    Filter and score the catalogue (`dataset`, or the current one).
+
+    Returns (rows, scores, total): catalogue row ids best first, their scores,
+    and how many cars passed the filters. With top_k set only the requested
+    page is ranked; otherwise every matching car is returned. `brands` and
+    `models` (name keys, see NameIndex) filter like the rest; cars named in
+    `boost` rank ahead of all others.
+    """
+    dataset = dataset or current_dataset()
+    weights = merge_intent_weights(intent_list)
+    w = weight_vector(weights)
+    filters = dict(budget=budget, min_seats=min_seats, fuel_type=fuel_type, body_type=body_type,
+                   brands=brands, models=models)
+
+    order = dataset.rankings.order(intent_list)
+    if order is not None:
+        return _rank_from_order(dataset, order, w, filters, boost, top_k, offset)
+
+    # Filter first through the precomputed indexes, then score only the survivors
+    with stage("filter"):
+        mask = filter_mask(dataset, **filters)
+        boosted = boost_mask(dataset, boost)
+    with stage("score"):
+        if mask is None:
+            rows = np.arange(len(dataset.features))
+            scores = score_matrix(dataset.features, w)[:, 0]
+        else:
+            rows = np.flatnonzero(mask)
+            scores = score_matrix(dataset.features[rows], w)[:, 0]
+
+    with stage("sort"):
+        picked = _pick(scores, top_k, offset, None if boosted is None else boosted[rows])
+    return rows[picked], scores[picked], len(rows)
+
+
+# Distinct weight vectors scored together per block; bounds the n x m score matrix
+BATCH_BLOCK = 64
+
+
+def rank_batch(param_list, top_k=None, offset=0, dataset=None):
+    """
+    rank() for many parsed queries at once; returns one (rows, scores, total)
+    per entry of `param_list` (dicts shaped like parse_query output).
+
+    Queries whose intents have a precomputed order are answered from it.
+    Every other distinct intent combination becomes one row of a weight
+    matrix and all of them are scored against the feature matrix in a single
+    score_matrix call (per block of BATCH_BLOCK). Filters and top-k selection
+    then run per query, so the output matches rank() exactly.
+    """
+    dataset = dataset or current_dataset()
+    by_intents = {}
+    ranked = [None] * len(param_list)
+    for i, params in enumerate(param_list):
+        intents = params.get("intents", ["general"])
+        order = dataset.rankings.order(intents)
+        if order is None:
+            by_intents.setdefault(intent_key(intents), []).append(i)
+            continue
+        filters = {name: params.get(name) for name in FILTERS}
+        w = weight_vector(merge_intent_weights(intents))
+        ranked[i] = _rank_from_order(dataset, order, w, filters, params.get("boost"), top_k, offset)
+
+    combos = list(by_intents)
+
+    for start in range(0, len(combos), BATCH_BLOCK):
+        block = combos[start:start + BATCH_BLOCK]
+        weights = np.stack([weight_vector(merge_intent_weights(list(combo))) for combo in block])
+        with stage("score"):
+            all_scores = score_matrix(dataset.features, weights)
+
+        for j, combo in enumerate(block):
+            for i in by_intents[combo]:
+                params = param_list[i]
+                with stage("filter"):
+                    mask = filter_mask(dataset, **{name: params.get(name) for name in FILTERS})
+                    boosted = boost_mask(dataset, params.get("boost"))
+                if mask is None:
+                    rows = np.arange(len(dataset.features))
+                    scores = all_scores[:, j]
+                else:
+                    rows = np.flatnonzero(mask)
+                    scores = all_scores[rows, j]
+
+                with stage("sort"):
+                    picked = _pick(scores, top_k, offset, None if boosted is None else boosted[rows])
+                ranked[i] = (rows[picked], scores[picked], len(rows))
+
+    return ranked
+
+# -------------- PARETO FRONT ----------------
+
+# Objectives a Pareto query can trade off: the feature column and whether
+# more of it is better (+1) or worse (-1), the same sign the intent weights use
+OBJECTIVES = {
+    "price": ("price_min_lakh_norm", -1),
+    "safety": ("safety_rating_norm", 1),
+    "power": ("power_bhp_norm", 1),
+    "mileage": ("mileage_kmpl_norm", 1),
+    "resale": ("resale_value_5yr_norm", 1)
+}
+
+
+def objective_key(objectives):
+    """The known objectives of `objectives`, once each, in OBJECTIVES order."""
+    found = set(objectives)
+    return tuple(name for name in OBJECTIVES if name in found)
+
+
+def default_objectives(intent_list, count=2):
+    """The `count` objectives the intents weigh most, for queries that name none."""
     weights = merge_intent_weights(intent_list)
-    df_filtered = df.copy()
+    ranked = sorted(OBJECTIVES, key=lambda name: -abs(weights.get(OBJECTIVES[name][0], 0.0)))
+    return objective_key(ranked[:count])
+
 
-    if budget:
-        df_filtered = df_filtered[df_filtered["price_min_lakh"] <= budget]
+def pareto(intent_list, objectives, budget=None, min_seats=None, fuel_type=None, body_type=None, top_k=None,
+           offset=0, dataset=None, brands=None, models=None, boost=None):
+    """
+    The cars no other car beats on every one of `objectives` (names from
+    OBJECTIVES), among those passing the filters.
 
-    if min_seats:
-        df_filtered = df_filtered[df_filtered["seats"] >= min_seats]
+    Returns (rows, scores, total) like rank(): the skyline is ordered by the
+    intents' weighted score so pages are stable, and total is its size.
+    """
+    dataset = dataset or current_dataset()
+    key = objective_key(objectives)
+    if not key:
+        raise ValueError(f"objectives must name at least one of {', '.join(OBJECTIVES)}")
 
-    scores = []
-    for _, row in df_filtered.iterrows():
-        score = 0
-        for feat, w in weights.items():
-            if feat in row:
-                score += row[feat] * w
-        scores.append(score)
+    with stage("filter"):
+        mask = filter_mask(dataset, budget=budget, min_seats=min_seats, fuel_type=fuel_type, body_type=body_type,
+                           brands=brands, models=models)
+        boosted = boost_mask(dataset, boost)
+    rows = np.arange(len(dataset.features)) if mask is None else np.flatnonzero(mask)
 
-    df_filtered["final_score"] = scores
-    return df_filtered.sort_values("final_score", ascending=False)
+    with stage("skyline"):
+        columns = [FEATURE_COLUMNS.index(OBJECTIVES[name][0]) for name in key]
+        signs = np.array([-OBJECTIVES[name][1] for name in key], dtype=np.float32)
+        # skyline() minimises, so flip the objectives where more is better
+        rows = rows[skyline(dataset.features[rows][:, columns] * signs)]
+
+    with stage("score"):
+        scores = score_matrix(dataset.features[rows], weight_vector(merge_intent_weights(intent_list)))[:, 0]
+    with stage("sort"):
+        picked = _pick(scores, top_k, offset, None if boosted is None else boosted[rows])
+    return rows[picked], scores[picked], len(rows)
+
+# -------------- COMPUTE SCORES FOR ALL CARS ----------------
 
+def compute_scores(intent_list, budget=None, min_seats=None, fuel_type=None, body_type=None, top_k=None, offset=0):
+    dataset = current_dataset()
+    rows, scores, _ = rank(
+        intent_list,
+        budget=budget,
+        min_seats=min_seats,
+        fuel_type=fuel_type,
+        body_type=body_type,
+        top_k=top_k,
+        offset=offset,
+        dataset=dataset
+    )
+    with stage("frame"):
+        return dataset.frame().iloc[rows].assign(final_score=scores.astype(np.float64))
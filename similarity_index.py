@@ -0,0 +1,197 @@
+import numpy as np
+
+# -------- "SIMILAR CARS" INDEX BUILT ONCE AT LOAD TIME ------------
+#
+# Every car is a vector: its *_norm features followed by one-hot fuel and
+# body type columns. Similar cars are its nearest neighbours by Euclidean
+# distance.
+#
+# Small catalogues are searched exactly: a vectorised scan over a few
+# thousand rows beats any tree. From EXACT_LIMIT cars on, an IVF index
+# (inverted file) is built: k-means splits the cars into sqrt(n) / 2
+# lists, and a query scans only the `nprobe` lists whose centroids are
+# closest to it.
+#
+# A catalogue update (dataset_updates) patches the index instead: only the
+# changed rows are vectorised and assigned to a list again, against the
+# centroids of the last full build.
+
+# One-hot value of a fuel or body type: a different fuel type weighs as
+# much as half the price range
+CATEGORY_WEIGHT = 0.5
+
+EXACT_LIMIT = 50_000
+
+# Lists scanned per query; the recall benchmark in benchmark.py keeps this honest
+NPROBE = 8
+
+KMEANS_ITERATIONS = 8
+TRAIN_PER_LIST = 64
+ASSIGN_BLOCK = 65_536
+
+
+ONEHOT_COLUMNS = ("fuel_type", "body_type")
+
+
+def car_vectors(catalogue, features):
+    """float32 matrix of feature columns plus weighted one-hot fuel and body types."""
+    return _car_vectors(catalogue, features)[0]
+
+
+def _car_vectors(catalogue, features, layout=None, rows=slice(None)):
+    """
+    (vectors of `rows`, layout): the one-hot columns follow `layout` (the
+    sorted categories per column), or the catalogue's own categories when
+    it is None. Rows with a category outside `layout` give None vectors.
+    """
+    parts = [np.asarray(features[rows], dtype=np.float32)]
+    n = len(parts[0])
+    found = {}
+    for column in ONEHOT_COLUMNS:
+        values = np.char.lower(np.asarray(catalogue[column][rows]).astype(str))
+        if layout is None:
+            categories, codes = np.unique(values, return_inverse=True)
+        else:
+            categories = layout[column]
+            codes = np.minimum(np.searchsorted(categories, values), max(len(categories) - 1, 0))
+            if len(values) and (not len(categories) or np.any(categories[codes] != values)):
+                return None, None
+        found[column] = categories
+        onehot = np.zeros((n, len(categories)), dtype=np.float32)
+        onehot[np.arange(n), codes] = CATEGORY_WEIGHT
+        parts.append(onehot)
+    return np.ascontiguousarray(np.hstack(parts)), found
+
+
+def _distances(vectors, rows, query):
+    diff = vectors[rows] - query
+    return np.einsum("ij,ij->i", diff, diff)
+
+
+def _nearest(rows, distances, k):
+    """The k closest of `rows`, closest first; equal distances in row order."""
+    if k < len(rows):
+        keep = np.argpartition(distances, k - 1)[:k]
+        threshold = distances[keep].max()
+        # Take every tie at the cut-off, then let the row order decide
+        keep = np.flatnonzero(distances <= threshold)
+        rows, distances = rows[keep], distances[keep]
+    order = np.lexsort((rows, distances))[:k]
+    return rows[order], distances[order]
+
+
+class SimilarityIndex:
+    """k-nearest-neighbour search over car_vectors(); exact below EXACT_LIMIT cars."""
+
+    def __init__(self, vectors, exact_limit=EXACT_LIMIT, seed=0, layout=None):
+        self.vectors = vectors
+        self.exact_limit = exact_limit
+        self.seed = seed
+        # One-hot categories of the vectors, when built from a catalogue (see of())
+        self.layout = layout
+        self.lists = None
+        if len(vectors) > exact_limit:
+            self._build_ivf(np.random.default_rng(seed))
+
+    @classmethod
+    def of(cls, catalogue, features, **kwargs):
+        """The index over car_vectors(catalogue, features)."""
+        vectors, layout = _car_vectors(catalogue, features)
+        return cls(vectors, layout=layout, **kwargs)
+
+    def updated(self, catalogue, features, inserted, changed):
+        """
+        The index of `catalogue`: the indexed one with new rows at `inserted`
+        and new values in rows `changed` (both in its numbering; `changed`
+        includes `inserted`). Feature columns are copied over, since a
+        rescaled one changes every car; one-hot parts are redone for the
+        changed rows only. A new fuel or body type needs a new one-hot
+        column, and means a full build.
+        """
+        changed_vectors, _ = _car_vectors(catalogue, features, self.layout, changed) if self.layout else (None, None)
+        if changed_vectors is None:
+            return SimilarityIndex.of(catalogue, features, exact_limit=self.exact_limit, seed=self.seed)
+
+        kept = np.ones(len(features), dtype=bool)
+        kept[inserted] = False
+        old_to_new = np.flatnonzero(kept)
+        vectors = np.empty((len(features), self.vectors.shape[1]), dtype=np.float32)
+        vectors[old_to_new] = self.vectors
+        vectors[:, :features.shape[1]] = features
+        vectors[changed] = changed_vectors
+
+        if self.lists is None:
+            return SimilarityIndex(vectors, self.exact_limit, self.seed, self.layout)
+
+        index = SimilarityIndex.__new__(SimilarityIndex)
+        index.vectors, index.exact_limit, index.seed, index.layout = vectors, self.exact_limit, self.seed, self.layout
+        index.centroids, index.centroid_norms, index.lists = self.centroids, self.centroid_norms, self.lists
+        assigned = np.empty(len(vectors), dtype=np.intp)
+        assigned[old_to_new[self.members]] = np.repeat(np.arange(self.lists), np.diff(self.offsets))
+        moved = old_to_new[(vectors[old_to_new] != self.vectors).any(axis=1)]
+        stale = np.union1d(moved, changed)
+        assigned[stale] = index._assign(vectors[stale], self.centroids)
+        index.members = np.argsort(assigned, kind="stable")
+        index.offsets = np.searchsorted(assigned[index.members], np.arange(self.lists + 1))
+        return index
+
+    def _assign(self, points, centroids):
+        """Index of the nearest centroid of every point, in blocks to bound memory."""
+        centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+        nearest = np.empty(len(points), dtype=np.intp)
+        for start in range(0, len(points), ASSIGN_BLOCK):
+            block = points[start:start + ASSIGN_BLOCK]
+            nearest[start:start + ASSIGN_BLOCK] = np.argmin(centroid_norms - 2 * block @ centroids.T, axis=1)
+        return nearest
+
+    def _build_ivf(self, rng):
+        n, dims = self.vectors.shape
+        count = max(1, int(np.sqrt(n) / 2))
+        sample = self.vectors[np.sort(rng.choice(n, min(n, count * TRAIN_PER_LIST), replace=False))]
+        centroids = sample[rng.choice(len(sample), count, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assigned = self._assign(sample, centroids)
+            sizes = np.bincount(assigned, minlength=count)
+            filled = sizes > 0
+            for j in range(dims):
+                sums = np.bincount(assigned, weights=sample[:, j], minlength=count)
+                centroids[filled, j] = sums[filled] / sizes[filled]
+
+        assigned = self._assign(self.vectors, centroids)
+        self.centroids = centroids
+        self.centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+        # Rows of list l are members[offsets[l]:offsets[l + 1]], in row order
+        self.members = np.argsort(assigned, kind="stable")
+        self.offsets = np.searchsorted(assigned[self.members], np.arange(count + 1))
+        self.lists = count
+
+    def search(self, query, k, exclude=None, nprobe=NPROBE, exact=False):
+        """
+        (rows, distances) of the k cars closest to `query`, closest first,
+        skipping rows where `exclude` is set. exact=True scans every car.
+        Past `nprobe` lists, the IVF search probes the next closest lists
+        until k cars survive `exclude`.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if exact or self.lists is None:
+            rows = np.arange(len(self.vectors))
+            if exclude is not None:
+                rows = rows[~exclude[rows]]
+        else:
+            scores = self.centroid_norms - 2 * self.centroids @ query
+            chunks, found = [], 0
+            for probed, l in enumerate(np.argsort(scores, kind="stable")):
+                if probed >= nprobe and found >= k:
+                    break
+                members = self.members[self.offsets[l]:self.offsets[l + 1]]
+                if exclude is not None:
+                    members = members[~exclude[members]]
+                chunks.append(members)
+                found += len(members)
+            rows = np.concatenate(chunks)
+        return _nearest(rows, _distances(self.vectors, rows, query), k)
+
+    def memory_bytes(self):
+        ivf = 0 if self.lists is None else self.centroids.nbytes + self.members.nbytes + self.offsets.nbytes
+        return self.vectors.nbytes + ivf
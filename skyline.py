@@ -0,0 +1,118 @@
+import numpy as np
+
+# -------- PARETO FRONT (SKYLINE) ------------
+#
+# A car is on the skyline when no other car is at least as good on every
+# objective and strictly better on one. Sort-Filter-Skyline:
+#
+# - identical points are collapsed first; a catalogue lists the same car
+#   many times, so 1M listings are a few tens of thousands of points
+# - the points are sorted by a monotone key (the sum of their scaled
+#   objectives), so a point can only be dominated by points that come
+#   before it, and taken in blocks; each block is checked against the
+#   skyline found so far and against itself with vectorised comparisons
+# - two objectives need no blocks: in lexicographic order a point is on
+#   the skyline exactly when it beats the running minimum of the second one
+#
+# The cost is about distinct points * skyline size instead of n^2.
+
+BLOCK = 2048
+
+# Upper bound on the points x front pairs compared in one go
+PAIRS = 1 << 22
+
+
+def _covered(points, by, same=False):
+    """
+    Mask over `points`: True where some row of `by` is no worse on every
+    column (all minimised). Rows are distinct, so that row dominates it;
+    same=True when `by` is `points` itself, to skip comparing a row with itself.
+    """
+    covered = np.zeros(len(points), dtype=bool)
+    columns = [points[:, j, None] for j in range(points.shape[1])]
+    step = max(1, PAIRS // max(len(points), 1))
+    for start in range(0, len(by), step):
+        chunk = by[start:start + step]
+        no_worse = chunk[None, :, 0] <= columns[0]
+        for j in range(1, len(columns)):
+            no_worse &= chunk[None, :, j] <= columns[j]
+        if same:
+            no_worse[np.arange(start, start + len(chunk)), np.arange(len(chunk))] = False
+        covered |= no_worse.any(axis=1)
+    return covered
+
+
+def _row_words(values):
+    """Unsigned words per row, equal exactly when the rows are; two float32 columns share a word."""
+    if values.dtype == np.float32:
+        bits = values.view(np.uint32).astype(np.uint64)
+        words = [bits[:, j] << np.uint64(32) | bits[:, j + 1] for j in range(0, values.shape[1] - 1, 2)]
+        return words + ([bits[:, -1]] if values.shape[1] % 2 else [])
+    bits = values.view(np.uint64)
+    return [bits[:, j] for j in range(values.shape[1])]
+
+
+def _distinct(values):
+    """(distinct rows, index of each row's distinct row)."""
+    # Integer keys sort faster than floats; the order itself does not matter here
+    order = np.lexsort(_row_words(values)[::-1])
+    ordered = values[order]
+    starts = np.ones(len(values), dtype=bool)
+    starts[1:] = (ordered[1:] != ordered[:-1]).any(axis=1)
+    inverse = np.empty(len(values), dtype=np.intp)
+    inverse[order] = np.cumsum(starts) - 1
+    return ordered[starts], inverse
+
+
+def skyline(values):
+    """
+    Positions of the rows of `values` (n x d, every column minimised) that
+    no other row dominates, in ascending order. Equal rows do not dominate
+    each other, so duplicates of a skyline point are all kept.
+    """
+    values = np.asarray(values)
+    dtype = np.float32 if values.dtype == np.float32 else np.float64
+    # + 0 turns -0.0 into 0.0, which would otherwise count as a different point
+    values = np.ascontiguousarray(values, dtype=dtype) + dtype(0)
+    if len(values) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    distinct, inverse = _distinct(values)
+    on_front = np.zeros(len(distinct), dtype=bool)
+    on_front[_skyline_of_distinct(distinct)] = True
+    return np.flatnonzero(on_front[inverse])
+
+
+def _skyline_of_distinct(values):
+    n, dims = values.shape
+    if dims <= 2:
+        # Lexicographic order: every row that could dominate a row comes before it
+        order = np.lexsort(values.T[::-1])
+        last = values[order, -1]
+        if dims == 1:
+            return order[:1]
+        best_before = np.minimum.accumulate(np.concatenate([[np.inf], last[:-1]]))
+        return order[last < best_before]
+
+    low = values.min(axis=0)
+    spread = values.max(axis=0) - low
+    spread[spread == 0] = 1
+    # Dominating a row means a smaller key, so dominators always come first
+    order = np.lexsort((np.arange(n), ((values - low) / spread).sum(axis=1)))
+
+    front_rows = np.empty(0, dtype=np.intp)
+    front = values[:0]
+    for start in range(0, n, BLOCK):
+        block = order[start:start + BLOCK]
+        points = values[block]
+        keep = ~_covered(points, front)
+        block, points = block[keep], points[keep]
+        keep = ~_covered(points, points, same=True)
+        block, points = block[keep], points[keep]
+        if len(block):
+            # Keys that round to the same sum can leave a dominator for a later block
+            stale = _covered(front, points)
+            front_rows = np.concatenate([front_rows[~stale], block])
+            front = np.vstack([front[~stale], points])
+
+    return front_rows
@@ -129,16 +129,9 @@ const API_BASE_URL = window.location.hostname === 'localhost' || window.location
 
 async function fetchRecommendations(query, topK = 10) {
   try {
-    const response = await fetch(`${API_BASE_URL}/recommend`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        query: query,
-        top_k: topK
-      })
-    });
+    // GET so the browser and any CDN in front can reuse the response (see Cache-Control / ETag)
+    const params = new URLSearchParams({ query: query, top_k: topK });
+    const response = await fetch(`${API_BASE_URL}/recommend?${params}`);
 
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import stat
+import threading
+
+try:
+    import brotli
+except ImportError:  # gzip variants only
+    brotli = None
+
+# -------- STATIC FILES SERVED FROM MEMORY ------------
+#
+# index.html and everything under static/ is read once and kept in memory
+# together with its gzip and brotli encodings, compressed at the highest
+# levels since that happens only once per file. A request costs one stat()
+# to notice edited files, and is answered with the smallest variant the
+# client accepts, or 304 when its ETag still matches.
+
+# Text formats worth compressing; images and fonts already are
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 512
+
+# Best encoding first
+ENCODINGS = ("br", "gzip")
+
+
+class Asset:
+    """One file's bytes, its encodings and a strong ETag per variant."""
+
+    def __init__(self, path, stamp):
+        self.stamp = stamp
+        with open(path, "rb") as f:
+            body = f.read()
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        digest = hashlib.sha1(body).hexdigest()[:16]
+
+        self.variants = {None: (body, digest)}
+        if self.mimetype.startswith(COMPRESSIBLE) and len(body) >= MIN_COMPRESS_BYTES:
+            encoded = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                encoded["br"] = brotli.compress(body, quality=11)
+            for encoding, data in encoded.items():
+                # Only kept when it actually saves bytes
+                if len(data) < len(body):
+                    self.variants[encoding] = (data, f"{digest}-{encoding}")
+
+    def variant(self, accept_encodings):
+        """(encoding or None, body, etag) of the smallest variant the client accepts."""
+        for encoding in ENCODINGS:
+            if encoding in self.variants and accept_encodings[encoding]:
+                return (encoding,) + self.variants[encoding]
+        return (None,) + self.variants[None]
+
+
+class AssetStore:
+    """Files under `root`, loaded on first request and reloaded when they change on disk."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """The Asset for `path` (inside root), or None when there is no such file."""
+        full = os.path.abspath(os.path.join(self.root, path))
+        if not full.startswith(self.root + os.sep):
+            return None
+        try:
+            info = os.stat(full)
+        except OSError:
+            return None
+        if not stat.S_ISREG(info.st_mode):
+            return None
+
+        stamp = (info.st_mtime_ns, info.st_size)
+        asset = self._assets.get(full)
+        if asset is None or asset.stamp != stamp:
+            with self._lock:
+                asset = self._assets.get(full)
+                if asset is None or asset.stamp != stamp:
+                    asset = Asset(full, stamp)
+                    self._assets[full] = asset
+        return asset
+
+    def memory_bytes(self):
+        return sum(len(body) for asset in list(self._assets.values()) for body, _ in asset.variants.values())
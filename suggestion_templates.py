@@ -0,0 +1,121 @@
+from functools import lru_cache
+
+from result_cache import ResultCache
+
+# -------- CARPILOT SUGGESTION AND REASON TEMPLATES ------------
+#
+# Apart from the query text and the budget line, a CarPilot suggestion only
+# depends on the car and the intents. Those parts are rendered the first
+# time a (car, intents) pair is suggested and reused afterwards; a request
+# then only fills in its own query and budget. Cars are keyed on the fields
+# the text shows, so a reload that changes a car renders it afresh.
+#
+# The per-result reason works the same way: its car part ("Price (min):
+# ₹6.2L; Seats: 5") is rendered once per distinct price and seat count.
+
+# (car, intents) pairs kept; the hot ones are the top cars of common searches
+SUGGESTION_CACHE_SIZE = 8192
+
+CAR_FIELDS = ("name", "brand", "final_score", "price_min_lakh", "seats", "power_bhp", "mileage_kmpl",
+              "safety_rating", "fuel_type", "resale_value_5yr")
+
+
+def _intent_reasons(car, intents):
+    """Reasons that come before the budget line."""
+    reasons = []
+
+    # Analyze why this car is the best match
+    if "family" in intents:
+        reasons.append(f"✅ **Perfect for Families**: With {int(car['seats'])} comfortable seats and a {car.get('safety_rating', 'good')} star safety rating, this car prioritizes your family's wellbeing")
+        if car.get('mileage_kmpl'):
+            reasons.append(f"💰 **Cost-Efficient**: {car['mileage_kmpl']} km/l mileage keeps running costs low for daily school runs and weekend trips")
+
+    if "performance" in intents:
+        if car.get('power_bhp'):
+            reasons.append(f"🏎️ **Powerful Performance**: {int(car['power_bhp'])} BHP delivers thrilling acceleration and highway confidence")
+        reasons.append("⚡ **Dynamic Driving**: Built for enthusiasts who demand responsive handling and spirited performance")
+
+    if "budget" in intents:
+        reasons.append(f"💵 **Budget Champion**: At just ₹{car['price_min_lakh']}L, this offers exceptional value without compromising quality")
+        if car.get('mileage_kmpl'):
+            reasons.append(f"📊 **Low Running Costs**: {car['mileage_kmpl']} km/l efficiency means more money stays in your pocket")
+        if car.get('resale_value_5yr'):
+            reasons.append(f"📈 **Strong Resale**: Retains approximately {int(car.get('resale_value_5yr', 0))}% value after 5 years")
+
+    # fuel_type may be missing or None on cars built outside format_results()
+    if "ev" in intents or (car.get('fuel_type') or '').lower() == 'electric':
+        reasons.append("🌱 **Eco-Friendly Choice**: Zero emissions driving helps protect the environment")
+        reasons.append("⚡ **Future-Ready**: Electric powertrain means lower maintenance and no fuel expenses")
+
+    if "luxury" in intents or car['price_min_lakh'] > 50:
+        reasons.append(f"👑 **Premium Experience**: {car['brand']} craftsmanship delivers refined comfort and cutting-edge technology")
+        if car.get('safety_rating'):
+            reasons.append(f"🛡️ **Top-Tier Safety**: {car['safety_rating']} star rating with advanced driver assistance systems")
+
+    return tuple(reasons)
+
+
+def _general_reasons(car, intents):
+    """Reasons that come after the budget line."""
+    reasons = []
+    if car.get('safety_rating') and car['safety_rating'] >= 4 and "family" not in intents:
+        reasons.append(f"🛡️ **Safety First**: {car['safety_rating']} star safety rating for peace of mind")
+
+    if car.get('resale_value_5yr') and car['resale_value_5yr'] >= 60 and "budget" not in intents:
+        reasons.append(f"💎 **Smart Investment**: Strong {int(car['resale_value_5yr'])}% resale value retention")
+    return tuple(reasons)
+
+
+def _key_specs(car):
+    return {
+        "price": f"₹{car['price_min_lakh']}L",
+        "seats": int(car['seats']),
+        "power": f"{int(car['power_bhp'])} BHP" if car.get('power_bhp') else "N/A",
+        "mileage": f"{car['mileage_kmpl']} km/l" if car.get('mileage_kmpl') else "N/A",
+        "safety": f"{car['safety_rating']} ⭐" if car.get('safety_rating') else "N/A"
+    }
+
+
+class SuggestionTemplates:
+    """CarPilot suggestions with everything but the query text and budget line memoised per (car, intents)."""
+
+    def __init__(self, maxsize=SUGGESTION_CACHE_SIZE):
+        self.cache = ResultCache(maxsize=maxsize, ttl=float("inf"))
+
+    def _parts(self, car, intents):
+        key = (tuple(car.get(field) for field in CAR_FIELDS), tuple(intents))
+        parts = self.cache.get(key)
+        if parts is None:
+            intent_text = ", ".join(intents).title()
+            parts = {
+                "head": _intent_reasons(car, intents),
+                "tail": _general_reasons(car, intents),
+                # Everything after the quoted query text
+                "summary": f"', our AI identified {intent_text} priorities. The **{car['name']}** scored {car['final_score']:.3f} - our highest match for your needs.",
+                "key_specs": _key_specs(car)
+            }
+            self.cache.put(key, parts)
+        return parts
+
+    def render(self, car, query_text, intents, params):
+        parts = self._parts(car, intents)
+        reasons = list(parts["head"])
+        # Add budget context if specified
+        if params.get('budget'):
+            reasons.append(f"✓ **Within Budget**: Fits comfortably under your ₹{params['budget']}L budget")
+        reasons.extend(parts["tail"])
+
+        return {
+            "car_name": car['name'],
+            "brand": car['brand'],
+            "score": float(car['final_score']),
+            "summary": f"Based on your search for '{query_text}" + parts["summary"],
+            "reasons": reasons,
+            "key_specs": dict(parts["key_specs"])
+        }
+
+
+@lru_cache(maxsize=65536)
+def car_facts(price, seats):
+    """The car part of a result's reason string."""
+    return f"Price (min): ₹{price}L; Seats: {seats}"
@@ -0,0 +1,62 @@
+import numpy as np
+
+import score_engine
+from benchmark import bench_pipeline, regressions, synthetic_catalogue, timings
+from dataset_store import FEATURE_COLUMNS
+
+# -------- SYNTHETIC CATALOGUES ------------
+
+
+def test_synthetic_catalogue_shape():
+    catalogue = synthetic_catalogue(2000, seed=1)
+    real = score_engine.current_dataset().catalogue
+
+    assert len(catalogue) == 2000
+    assert catalogue.columns == real.columns
+    assert catalogue.features.dtype == np.float32
+    for col in FEATURE_COLUMNS:
+        assert 0.0 <= catalogue[col].min() <= catalogue[col].max() <= 1.0 + 1e-9
+
+
+def test_synthetic_catalogue_is_reproducible():
+    a = synthetic_catalogue(300, seed=7)
+    b = synthetic_catalogue(300, seed=7)
+    assert np.array_equal(a.features, b.features)
+    assert list(a["name"]) == list(b["name"])
+
+# -------- PIPELINE & REGRESSION CHECK ------------
+
+
+def test_pipeline_restores_the_real_catalogue():
+    original = score_engine.current_dataset()
+    report = bench_pipeline(sizes=(500,), queries=["cheap hatchback", "suv"], repeat=1)
+
+    assert score_engine.current_dataset().version == original.version
+    stages = report["cars_500"]
+    for stage in ("rank", "compute_scores", "materialise", "recommend_cold", "recommend_warm", "endpoint"):
+        assert stages[stage]["median_us"] > 0
+
+
+def test_regressions_flags_slower_timings_only():
+    baseline = {"pipeline": {"parse": {"median_us": 10.0}, "cars_500": {"rank": {"median_us": 100.0}}}}
+    current = {"pipeline": {"parse": {"median_us": 14.0}, "cars_500": {"rank": {"median_us": 200.0}},
+                            "cars_1000": {"rank": {"median_us": 999.0}}}}
+
+    assert set(timings(current)) == {"pipeline/parse", "pipeline/cars_500/rank", "pipeline/cars_1000/rank"}
+    assert regressions(current, baseline, tolerance=1.5) == [("pipeline/cars_500/rank", 100.0, 200.0)]
+
+
+def test_every_benchmark_report_is_compared():
+    # The shapes bench_parser, bench_materialise, bench_etl and bench_serving report
+    baseline = {
+        "parser": {"queries": 40, "us_per_query": 10.0, "queries_per_sec": 100000.0},
+        "materialise": {"top_10": {"results": 10, "us_per_page": 50.0, "us_per_result": 5.0}},
+        "etl": {"rows": 1000, "workers_1": {"seconds": 2.0, "rows_per_sec": 500.0}},
+        "serving": {"cores": 4, "clients": 16, "duration_s": 10.0,
+                    "threaded": {"requests_per_sec": 900.0, "p50_ms": 5.0, "p99_ms": 20.0}}
+    }
+    assert timings(baseline) == {"parser": 10.0, "materialise/top_10": 50.0, "etl/workers_1": 2e6,
+                                 "serving/threaded": 20000.0}
+
+    slower_parser = dict(baseline, parser={"queries": 40, "us_per_query": 30.0, "queries_per_sec": 33000.0})
+    assert regressions(slower_parser, baseline) == [("parser", 10.0, 30.0)]
@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Wall-clock budgets for our own code, on top of Flask and NumPy themselves
+IMPORT_BUDGET_S = 0.1
+FIRST_REQUEST_BUDGET_S = 0.25
+
+COLD_START = """
+import json, sys, time
+import flask, flask_cors, numpy  # third-party cost is not ours to budget
+
+start = time.perf_counter()
+sys.path.insert(0, "api")
+import index
+imported = time.perf_counter()
+
+client = index.app.test_client()
+response = client.post("/recommend", json={"query": "family car under 12 lakhs", "top_k": 10})
+served = time.perf_counter()
+
+print(json.dumps({
+    "status": response.status_code,
+    "import_s": imported - start,
+    "first_request_s": served - imported,
+    "pandas": "pandas" in sys.modules,
+    "sklearn": "sklearn" in sys.modules,
+}))
+"""
+
+
+def run_cold_start():
+    # Best of a few runs: the first one may still be writing .pyc files
+    runs = []
+    for _ in range(3):
+        out = subprocess.run(
+            [sys.executable, "-c", COLD_START],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["import_s"] + run["first_request_s"])
+
+
+def test_serverless_entry_point_stays_cheap_to_import():
+    run = run_cold_start()
+
+    assert run["status"] == 200
+    assert not run["pandas"], "the request path must not import pandas"
+    assert not run["sklearn"], "the request path must not import scikit-learn"
+    assert run["import_s"] < IMPORT_BUDGET_S, run
+    assert run["first_request_s"] < FIRST_REQUEST_BUDGET_S, run
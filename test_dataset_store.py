@@ -0,0 +1,106 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+
+SOURCE_CSV = dataset_store.DEFAULT_CSV
+
+
+def copy_csv(tmp_path):
+    csv = str(tmp_path / "cars.csv")
+    shutil.copy(SOURCE_CSV, csv)
+    return csv
+
+
+def test_store_round_trips_the_csv(tmp_path):
+    csv = copy_csv(tmp_path)
+    dataset_store.write_store(pd.read_csv(csv, float_precision="round_trip"), csv)
+
+    assert dataset_store.is_fresh(dataset_store.read_meta(csv), csv)
+    catalogue = dataset_store.load_dataset(csv)
+    frame, features = catalogue.to_frame(), catalogue.features
+
+    pd.testing.assert_frame_equal(frame, pd.read_csv(csv, float_precision="round_trip"), check_exact=True)
+    assert isinstance(features, np.memmap)
+    assert features.dtype == np.float32
+    np.testing.assert_array_equal(features, frame[dataset_store.FEATURE_COLUMNS].to_numpy(dtype=np.float32))
+
+
+def test_touched_but_unchanged_csv_is_still_fresh(tmp_path):
+    csv = copy_csv(tmp_path)
+    dataset_store.write_store(pd.read_csv(csv, float_precision="round_trip"), csv)
+    os.utime(csv, ns=(0, 0))
+
+    assert dataset_store.is_fresh(dataset_store.read_meta(csv), csv)
+
+
+def test_edited_csv_falls_back_to_parsing(tmp_path):
+    csv = copy_csv(tmp_path)
+    dataset_store.write_store(pd.read_csv(csv, float_precision="round_trip"), csv)
+
+    edited = pd.read_csv(csv, float_precision="round_trip")
+    edited.loc[0, "price_min_lakh"] = 99.0
+    edited.to_csv(csv, index=False)
+
+    assert not dataset_store.is_fresh(dataset_store.read_meta(csv), csv)
+    catalogue = dataset_store.load_dataset(csv)
+    assert catalogue["price_min_lakh"][0] == 99.0
+    assert not isinstance(catalogue.features, np.memmap)
+
+
+def test_missing_store_falls_back_to_parsing(tmp_path):
+    csv = copy_csv(tmp_path)
+    assert dataset_store.read_meta(csv) is None
+
+    catalogue = dataset_store.load_dataset(csv)
+    pd.testing.assert_frame_equal(catalogue.to_frame(), pd.read_csv(SOURCE_CSV, float_precision="round_trip"), check_exact=True)
+
+
+def test_committed_store_is_current():
+    assert dataset_store.is_fresh(dataset_store.read_meta(SOURCE_CSV), SOURCE_CSV)
+
+
+def test_columns_are_stored_compact_and_read_back_exactly(tmp_path):
+    csv = copy_csv(tmp_path)
+    expected = pd.read_csv(csv, float_precision="round_trip")
+    dataset_store.write_store(expected, csv)
+    catalogue = dataset_store.load_dataset(csv)
+
+    brand = catalogue["brand"]
+    assert isinstance(brand, dataset_store.EncodedColumn)
+    assert brand.codes.dtype.itemsize <= 2 and isinstance(brand.codes.base, np.memmap)
+    assert len(brand.table) == expected["brand"].nunique()
+    assert catalogue["fuel_type"].codes.dtype == np.int8
+    # One interned string per distinct value, shared by every row
+    assert catalogue["brand"][0] is catalogue["brand"][np.flatnonzero(expected["brand"] == expected["brand"][0])[-1]]
+
+    price = catalogue["price_min_lakh"]
+    assert isinstance(price, dataset_store.ScaledColumn) and price.values.dtype == np.float32
+    assert catalogue["seats"].dtype == np.int8
+    rows = np.array([5, 0, 3])
+    np.testing.assert_array_equal(price[rows], expected["price_min_lakh"].to_numpy()[rows])
+    assert catalogue["brand"][rows].tolist() == expected["brand"][rows].tolist()
+
+    # Lazy rows read the same values as full ones
+    view = catalogue.view(7)
+    assert view["name"] == expected["name"][7] and len(view) == len(expected.columns)
+    assert dict(view) == catalogue.row(7) == expected.iloc[7].to_dict()
+
+    report = catalogue.memory_report()
+    assert report["bytes"] == sum(report["columns"].values()) + catalogue.features.nbytes
+    assert report["bytes"] < expected.memory_usage(deep=True).sum() / 2
+
+
+def test_compact_column_keeps_values_it_cannot_shrink_exactly():
+    assert dataset_store.compact_column(np.array([0, 300, -5])).dtype == np.int16
+    assert isinstance(dataset_store.compact_column(np.array([1.25, 3.5])), dataset_store.ScaledColumn)
+    # Too many decimals for float32, or not decimals at all: kept as float64
+    for values in (np.array([1.2345678, 2.0]), np.array([1 / 3, 0.5]), np.array([1e12 + 0.5])):
+        column = dataset_store.compact_column(values)
+        assert isinstance(column, np.ndarray) and column.dtype == np.float64
+    strings = dataset_store.compact_column(np.array(["a", None, "b", "a"], dtype=object))
+    assert strings.tolist() == ["a", None, "b", "a"] and len(strings.table) == 3
+    np.testing.assert_array_equal(dataset_store.decoded(np.array([1, 2], dtype=np.int8)), np.array([1, 2], dtype=np.int64))
@@ -0,0 +1,230 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+import dataset_store
+import score_engine
+from dataset_updates import scale_feature, update_catalogue
+from normalize_car_prices import RunningAggregate, aggregate_chunks, catalogue_from, read_chunks, save
+
+
+def build(path, raw, tmp_path):
+    """Run the full ETL over `raw` and save the catalogue (with its aggregates) at `path`."""
+    source = tmp_path / f"raw_{len(raw)}.csv"
+    raw.to_csv(source, index=False)
+    totals, _ = aggregate_chunks(read_chunks(str(source), 5000))
+    save(catalogue_from(totals), str(path), totals)
+
+
+@pytest.fixture
+def dump(messy_auction_dump):
+    raw = messy_auction_dump(12000, seed=4)
+    # A few cars that only appear in the later listings
+    late = raw.index >= 9000
+    raw.loc[late & (raw.index % 97 == 0), "make"] = "Zeta"
+    raw.loc[late & (raw.index % 89 == 0), "make"] = "Aardvark"
+    return raw
+
+# -------- NORMALIZATION ------------
+
+
+@pytest.mark.parametrize("values", [np.random.default_rng(0).lognormal(3, 1, 500), np.full(20, 7.25)])
+def test_scale_feature_matches_min_max_scaler(values):
+    expected = MinMaxScaler().fit_transform(values[:, None])[:, 0]
+    assert np.array_equal(scale_feature(values, values.min(), values.max()), expected)
+
+# -------- INCREMENTAL UPDATES ------------
+
+
+@pytest.mark.parametrize("split", [9000, 11990])
+def test_update_equals_full_rebuild(dump, tmp_path, split):
+    full_csv, csv_path = tmp_path / "full.csv", tmp_path / "cars.csv"
+    build(full_csv, dump, tmp_path)
+    build(csv_path, dump.iloc[:split], tmp_path)
+
+    delta = update_catalogue(dump.iloc[split:], str(csv_path))
+
+    assert csv_path.read_bytes() == full_csv.read_bytes()
+    assert len(delta.catalogue) == len(pd.read_csv(full_csv))
+    assert delta.catalogue.checksum == dataset_store.file_checksum(str(full_csv))
+    parsed = dataset_store.read_csv(str(full_csv))
+    assert np.array_equal(delta.catalogue.features, parsed.features)
+
+
+def test_small_update_only_touches_its_rows(dump, tmp_path):
+    csv_path = tmp_path / "cars.csv"
+    build(csv_path, dump.iloc[:11000], tmp_path)
+    before = pd.read_csv(csv_path)
+
+    columns = tmp_path / "cars.store" / "columns"
+    inodes = {path.name: path.stat().st_ino for path in columns.iterdir()}
+
+    listing = small_listing(dump)
+    delta = update_catalogue(listing, str(csv_path))
+    after = pd.read_csv(csv_path)
+
+    # Columns the listing cannot change keep their store files; the rest are written again
+    kept = {path.name for path in columns.iterdir() if inodes[path.name] == path.stat().st_ino}
+    assert kept == {"name.npy", "brand.npy", "seats.npy", "fuel_type.npy", "body_type.npy"}
+    assert np.array_equal(dataset_store.load_dataset(str(csv_path)).features, dataset_store.read_csv(str(csv_path)).features)
+
+    assert delta.rescaled == []
+    assert len(delta.inserted) == 0 and len(delta.changed) == 1
+    untouched = np.ones(len(after), dtype=bool)
+    untouched[delta.changed] = False
+    pd.testing.assert_frame_equal(after[untouched], before[untouched])
+
+
+def test_catalogue_without_aggregates_is_bootstrapped(tmp_path):
+    csv_path = tmp_path / "cars.csv"
+    pd.read_csv(dataset_store.DEFAULT_CSV).to_csv(csv_path, index=False)
+    listing = pd.DataFrame([{"make": "Zeta", "model": "One", "body": "SUV", "year": 2015,
+                             "condition": 4.5, "sellingprice": 25000}])
+
+    delta = update_catalogue(listing, str(csv_path))
+
+    after = pd.read_csv(csv_path)
+    assert len(after) == 527
+    assert after["name"].is_monotonic_increasing
+    assert after.loc[delta.inserted[0], "name"] == "Zeta One"
+
+
+def _update(args):
+    listings, csv_path = args
+    update_catalogue(listings, csv_path)
+
+
+def test_concurrent_updates_from_two_processes_keep_every_listing(dump, tmp_path):
+    full_csv, csv_path = tmp_path / "full.csv", tmp_path / "cars.csv"
+    build(full_csv, dump, tmp_path)
+    build(csv_path, dump.iloc[:9000], tmp_path)
+
+    # Two workers read, update and write the same files at once
+    halves = [(dump.iloc[9000:10500], str(csv_path)), (dump.iloc[10500:], str(csv_path))]
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        list(pool.map(_update, halves))
+
+    def counts(path):
+        return RunningAggregate.load(dataset_store.aggregate_path(str(path))).counts.sum()
+
+    assert counts(csv_path) == counts(full_csv)
+    assert len(pd.read_csv(csv_path)) == len(pd.read_csv(full_csv))
+    assert not os.path.exists(f"{csv_path}.tmp")
+
+# -------- SERVING ------------
+
+
+def assert_same_index(patched, fresh):
+    assert np.array_equal(patched.price_order, fresh.price_order)
+    assert np.array_equal(patched.sorted_prices, fresh.sorted_prices)
+    for attr in ("seat_bits", "fuel_bits", "body_bits"):
+        ours, theirs = getattr(patched, attr), getattr(fresh, attr)
+        for key in theirs:
+            assert np.array_equal(ours[key], theirs[key]), (attr, key)
+        # Levels kept from before the update may have no car left; they still filter correctly
+        assert set(theirs) <= set(ours)
+
+
+def test_serving_picks_up_the_delta(dump, tmp_path):
+    csv_path = tmp_path / "cars.csv"
+    build(csv_path, dump.iloc[:9000], tmp_path)
+    original = score_engine.current_dataset()
+    try:
+        score_engine.load_dataset(str(csv_path))
+        delta = update_catalogue(dump.iloc[9000:], str(csv_path))
+        served = score_engine.apply_delta(delta, str(csv_path))
+
+        fresh = score_engine.LoadedDataset(dataset_store.load_dataset(str(csv_path)), 0, str(csv_path), None)
+        assert served.version == fresh.version
+        assert np.array_equal(served.features, fresh.features)
+        assert_same_index(served.index, fresh.index)
+        for filters in ({}, {"budget": 12}, {"min_seats": 7, "fuel_type": "Petrol"}, {"body_type": "suv"}):
+            ours = score_engine.rank(["family", "budget"], top_k=20, dataset=served, **filters)
+            theirs = score_engine.rank(["family", "budget"], top_k=20, dataset=fresh, **filters)
+            assert all(np.array_equal(a, b) for a, b in zip(ours, theirs))
+    finally:
+        score_engine.install_catalogue(original.catalogue, original.path, original.stamps)
+
+
+def small_listing(dump):
+    """One more listing of a mid-priced existing car: moves no bounds."""
+    listing = dump.iloc[11000:].dropna()
+    return listing[listing["sellingprice"].between(15000, 20000) & (listing["year"] >= 2010)].head(1)
+
+
+@pytest.mark.parametrize("update", ["new_cars", "rescaled", "small"])
+def test_patched_indexes_match_a_fresh_build(dump, tmp_path, update):
+    csv_path = tmp_path / "cars.csv"
+    build(csv_path, dump.iloc[:11000] if update == "small" else dump.iloc[:9000], tmp_path)
+    listings = small_listing(dump) if update == "small" else dump.iloc[9000:]
+    if update == "rescaled":
+        # A record price for a new car moves the price bounds
+        listings = pd.concat([listings, pd.DataFrame([{"make": "Zeta", "model": "Max", "body": "SUV", "year": 2015,
+                                                       "condition": 4.5, "sellingprice": 199000}])])
+    original = score_engine.current_dataset()
+    try:
+        base = score_engine.load_dataset(str(csv_path))
+        delta = update_catalogue(listings, str(csv_path))
+        assert bool(delta.rescaled) == (update == "rescaled")
+        served = score_engine.apply_delta(delta, str(csv_path))
+        fresh = score_engine.LoadedDataset(dataset_store.load_dataset(str(csv_path)), 0, str(csv_path), None)
+
+        if update == "small":
+            # Nothing but the rows' values changed: the name tables are shared
+            assert served.names.trigram_postings is base.names.trigram_postings
+        for combo in fresh.rankings.orders:
+            assert np.array_equal(served.rankings.order(combo), fresh.rankings.orders[combo]), combo
+
+        assert np.array_equal(served.names.name_keys, fresh.names.name_keys)
+        for brand in fresh.names.brand_keys.tolist():
+            assert np.array_equal(served.names.mask(brands=(brand,)), fresh.names.mask(brands=(brand,)))
+        for name in fresh.names.name_keys.tolist():
+            assert np.array_equal(served.names.mask(models=(name,)), fresh.names.mask(models=(name,)))
+        for query in ("zeta one", "aardvark", "toyota", "honda civc"):
+            assert served.names.extract(query) == fresh.names.extract(query)
+
+        assert np.array_equal(served.similar.vectors, fresh.similar.vectors)
+    finally:
+        score_engine.install_catalogue(original.catalogue, original.path, original.stamps)
+
+
+def test_stale_delta_falls_back_to_a_reload(dump, tmp_path):
+    csv_path = tmp_path / "cars.csv"
+    build(csv_path, dump.iloc[:9000], tmp_path)
+    original = score_engine.current_dataset()
+    try:
+        delta = update_catalogue(dump.iloc[9000:], str(csv_path))
+        # The engine is still serving the bundled catalogue, not the one the delta was made from
+        served = score_engine.apply_delta(delta, str(csv_path))
+        assert served.version == delta.catalogue.checksum[:12]
+        assert len(served.features) == len(delta.catalogue)
+    finally:
+        score_engine.install_catalogue(original.catalogue, original.path, original.stamps)
+
+
+def test_listings_endpoint_needs_the_admin_token(monkeypatch):
+    from app import app
+
+    monkeypatch.setenv("MOTORMONY_ADMIN_TOKEN", "secret")
+    client = app.test_client()
+    listing = {"make": "Zeta", "model": "One", "body": "SUV", "year": 2015, "condition": 4.5, "sellingprice": 25000}
+
+    assert client.post("/admin/listings", json={"listings": [listing]}).status_code == 403
+    response = client.post("/admin/listings", json={"listings": "nope"}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 400
+
+
+def test_listings_endpoint_without_the_etl_is_unavailable(monkeypatch):
+    import sys
+    from app import app
+
+    monkeypatch.setenv("MOTORMONY_ADMIN_TOKEN", "secret")
+    # A serving-only install, where the ETL modules are not deployed
+    monkeypatch.setitem(sys.modules, "dataset_updates", None)
+    response = app.test_client().post("/admin/listings", json={"listings": []}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 501
+    assert "not available" in response.get_json()["error"]
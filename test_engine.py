@@ -3,3 +3,179 @@ from score_engine import compute_scores
 results = compute_scores(["family", "budget"], budget=12, min_seats=5)
 
 print(results[["name", "final_score", "price_min_lakh", "seats"]].head(10))
+
+
+# -------- PARITY WITH THE ORIGINAL ROW-BY-ROW SCORER ------------
+
+import itertools
+
+import numpy as np
+
+from score_engine import INTENT_WEIGHTS, df, merge_intent_weights
+
+
+def reference_compute_scores(intent_list, budget=None, min_seats=None):
+    """The original iterrows() implementation, kept as a parity oracle."""
+    weights = merge_intent_weights(intent_list)
+    df_filtered = df.copy()
+
+    if budget:
+        df_filtered = df_filtered[df_filtered["price_min_lakh"] <= budget]
+
+    if min_seats:
+        df_filtered = df_filtered[df_filtered["seats"] >= min_seats]
+
+    scores = []
+    for _, row in df_filtered.iterrows():
+        score = 0
+        for feat, w in weights.items():
+            if feat in row:
+                score += row[feat] * w
+        scores.append(score)
+
+    df_filtered["final_score"] = scores
+    return df_filtered.sort_values("final_score", ascending=False)
+
+
+def assert_same_ranking(fast, slow):
+    assert set(fast["name"]) == set(slow["name"])
+
+    expected = slow.set_index("name")["final_score"]
+    got = fast.set_index("name")["final_score"]
+    np.testing.assert_allclose(got.loc[expected.index], expected, atol=1e-6)
+
+    # Walking the fast ranking, the reference scores must never go up
+    # (beyond float32 rounding); ties may come out in either order.
+    ordered = expected.loc[fast["name"]].to_numpy()
+    assert np.all(np.diff(ordered) <= 1e-6)
+
+
+def test_vectorized_scores_match_reference_for_every_intent_combination():
+    intents = list(INTENT_WEIGHTS)
+    for r in (1, 2, 3):
+        for combo in itertools.combinations(intents, r):
+            assert_same_ranking(compute_scores(list(combo)), reference_compute_scores(list(combo)))
+
+
+def test_vectorized_scores_match_reference_with_filters():
+    for budget, min_seats in [(12, 5), (25, None), (None, 7), (5, 7), (1, None)]:
+        fast = compute_scores(["family", "budget"], budget=budget, min_seats=min_seats)
+        slow = reference_compute_scores(["family", "budget"], budget=budget, min_seats=min_seats)
+        assert_same_ranking(fast, slow)
+
+
+# -------- PARTIAL TOP-K SELECTION ------------
+
+from score_engine import rank, top_k_rows
+
+
+def test_top_k_rows_matches_stable_full_sort():
+    rng = np.random.default_rng(7)
+    # Few distinct values so there are plenty of ties around every cut-off
+    scores = rng.integers(0, 20, size=1000).astype(np.float32)
+    full = np.argsort(-scores, kind="stable")
+
+    for k in (1, 5, 10, 100, 999, 1000, 1500):
+        np.testing.assert_array_equal(top_k_rows(scores, k), full[:k])
+
+    for offset in (0, 10, 990, 1000, 2000):
+        np.testing.assert_array_equal(top_k_rows(scores, 10, offset), full[offset:offset + 10])
+
+
+def test_rank_pages_concatenate_to_full_ranking():
+    full_rows, full_scores, total = rank(["family", "budget"], budget=30)
+    pages = [rank(["family", "budget"], budget=30, top_k=25, offset=offset)[0]
+             for offset in range(0, total, 25)]
+    np.testing.assert_array_equal(np.concatenate(pages), full_rows)
+    assert len(full_rows) == total
+
+
+# -------- BATCHED SCORING ------------
+
+from score_engine import rank_batch
+
+
+def test_rank_batch_is_bit_identical_to_rank():
+    param_list = [
+        {"intents": list(combo), "budget": budget, "min_seats": None, "fuel_type": None, "body_type": body}
+        for combo in itertools.combinations(INTENT_WEIGHTS, 2)
+        for budget, body in [(None, None), (20, None), (None, "sedan")]
+    ]
+    for params, (rows, scores, total) in zip(param_list, rank_batch(param_list, top_k=10)):
+        expected_rows, expected_scores, expected_total = rank(
+            params["intents"], budget=params["budget"], body_type=params["body_type"], top_k=10
+        )
+        np.testing.assert_array_equal(rows, expected_rows)
+        np.testing.assert_array_equal(scores, expected_scores)
+        assert total == expected_total
+
+
+# -------- PRECOMPUTED INTENT RANKINGS ------------
+
+import score_engine
+from score_engine import LoadedDataset, intent_key
+
+
+def dataset_with_budget(monkeypatch, budget_mb):
+    monkeypatch.setattr(score_engine, "RANKING_BUDGET_MB", budget_mb)
+    return LoadedDataset(score_engine.current_dataset().catalogue, 0, None, None)
+
+
+def test_intent_key_ignores_order_and_repeats():
+    assert intent_key(["budget", "family", "budget", "luxury"]) == ("family", "budget")
+    assert merge_intent_weights(["budget", "family"]) == merge_intent_weights(["family", "budget"])
+
+
+def test_precomputed_orders_give_the_scored_ranking(monkeypatch):
+    scored = dataset_with_budget(monkeypatch, 0)
+    precomputed = dataset_with_budget(monkeypatch, 64)
+    assert scored.rankings.orders == {}
+    assert len(precomputed.rankings.orders) == 2 ** len(INTENT_WEIGHTS) - 1
+
+    filters = [{}, {"budget": 12}, {"budget": 1}, {"min_seats": 7}, {"fuel_type": "petrol", "body_type": "suv"},
+               {"budget": 30, "min_seats": 5, "fuel_type": "diesel"}]
+    for intents in (["general"], ["collector"], ["budget", "family"], ["ev", "resale", "performance"]):
+        for params in filters:
+            for top_k, offset in ((10, 0), (10, 40), (1, 0), (None, 0), (500, 100)):
+                ours = rank(intents, top_k=top_k, offset=offset, dataset=precomputed, **params)
+                theirs = rank(intents, top_k=top_k, offset=offset, dataset=scored, **params)
+                for got, expected in zip(ours, theirs):
+                    np.testing.assert_array_equal(got, expected)
+
+
+def test_orders_beyond_the_budget_are_scored_per_query(monkeypatch):
+    n = len(score_engine.current_dataset().features)
+    dataset = dataset_with_budget(monkeypatch, 10.5 * n * 4 / (1024 * 1024))
+
+    report = dataset.rankings.memory_report()
+    assert report["tables"] == 10 and report["bytes"] == 10 * n * 4
+    assert report["bytes"] <= report["budget_bytes"]
+    # The single intents fit; a six-intent combination does not
+    assert dataset.rankings.order(["collector"]) is not None
+    assert dataset.rankings.order(["family", "performance", "budget", "collector", "ev", "resale"]) is None
+    param_list = [{"intents": ["collector"]}, {"intents": ["family", "ev", "resale"], "budget": 15}]
+    for params, (rows, _, _) in zip(param_list, rank_batch(param_list, top_k=10, dataset=dataset)):
+        expected = rank(params["intents"], budget=params.get("budget"), top_k=10, dataset=dataset)[0]
+        np.testing.assert_array_equal(rows, expected)
+
+
+def test_updated_orders_match_a_fresh_sort():
+    rng = np.random.default_rng(5)
+    for trial in range(20):
+        # Few distinct values, so plenty of tied scores
+        n = int(rng.integers(0, 400))
+        features = rng.integers(0, 3, size=(n, len(score_engine.FEATURE_COLUMNS))).astype(np.float32) / 2
+        base = score_engine.IntentRankings(features, 1 << 30)
+
+        inserted = np.sort(rng.choice(n + 5, 5, replace=False))
+        kept = np.ones(n + 5, dtype=bool)
+        kept[inserted] = False
+        grown = np.empty((n + 5, features.shape[1]), dtype=np.float32)
+        grown[kept] = features
+        changed = np.union1d(inserted, rng.choice(n + 5, min(n, 10), replace=False))
+        grown[changed] = rng.integers(0, 3, size=(len(changed), features.shape[1])) / 2
+
+        updated = base.updated(grown, inserted, changed)
+        fresh = score_engine.IntentRankings(grown, 1 << 30)
+        for combo, order in fresh.orders.items():
+            np.testing.assert_array_equal(updated.orders[combo], order)
@@ -0,0 +1,42 @@
+import itertools
+
+import numpy as np
+
+from filter_index import FilterIndex
+from score_engine import compute_scores, df
+
+
+def naive_mask(budget=None, min_seats=None, fuel_type=None, body_type=None):
+    mask = np.ones(len(df), dtype=bool)
+    if budget:
+        mask &= (df["price_min_lakh"] <= budget).to_numpy()
+    if min_seats:
+        mask &= (df["seats"] >= min_seats).to_numpy()
+    if fuel_type:
+        mask &= (df["fuel_type"].str.lower() == fuel_type.lower()).to_numpy()
+    if body_type:
+        mask &= (df["body_type"].str.lower() == body_type.lower()).to_numpy()
+    return mask
+
+
+def test_index_matches_naive_masks():
+    index = FilterIndex(df)
+    budgets = [None, 3.13, 10, 12.5, 1000]
+    seats = [None, 2, 5, 6, 7, 8]
+    fuels = [None, "petrol", "EV", "diesel"]
+    bodies = [None, "suv", "Sedan", "mpv"]
+
+    for budget, min_seats, fuel_type, body_type in itertools.product(budgets, seats, fuels, bodies):
+        filters = dict(budget=budget, min_seats=min_seats, fuel_type=fuel_type, body_type=body_type)
+        mask = index.mask(**filters)
+        if mask is None:
+            assert not any(filters.values())
+            continue
+        np.testing.assert_array_equal(mask, naive_mask(**filters))
+
+
+def test_compute_scores_applies_fuel_and_body_filters():
+    results = compute_scores(["ev"], fuel_type="ev", body_type="suv")
+    assert len(results) == naive_mask(fuel_type="ev", body_type="suv").sum()
+    assert set(results["fuel_type"]) <= {"EV"}
+    assert set(results["body_type"]) <= {"SUV"}
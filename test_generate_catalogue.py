@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+import dataset_store
+from generate_catalogue import generate_catalogue
+from normalize_car_prices import save
+
+# -------- GENERATOR ------------
+
+
+def test_same_seed_same_catalogue():
+    pd.testing.assert_frame_equal(generate_catalogue(1000, seed=5), generate_catalogue(1000, seed=5))
+    assert not generate_catalogue(1000, seed=5).equals(generate_catalogue(1000, seed=6))
+
+
+def test_catalogue_layout_matches_the_real_dataset():
+    real = pd.read_csv(dataset_store.DEFAULT_CSV)
+    synthetic = generate_catalogue(5000, seed=0)
+
+    assert list(synthetic.columns) == list(real.columns)
+    assert set(synthetic["body_type"]) <= set(real["body_type"]) | {"Truck"}
+    assert synthetic["year"].min() >= 2010
+    assert synthetic["price_min_lakh"].between(0.9, 166).all()
+    for col in dataset_store.FEATURE_COLUMNS:
+        assert synthetic[col].between(0.0, 1.0 + 1e-9).all()
+
+
+def test_saved_catalogue_loads_from_its_store(tmp_path):
+    csv_path = str(tmp_path / "cars_synthetic.csv")
+    catalogue = generate_catalogue(2000, seed=2)
+    save(catalogue, csv_path)
+
+    meta = dataset_store.read_meta(csv_path)
+    assert dataset_store.is_fresh(meta, csv_path)
+
+    stored = dataset_store.load_store(csv_path, meta)
+    parsed = dataset_store.read_csv(csv_path)
+    assert stored.checksum == parsed.checksum
+    assert np.array_equal(stored.features, parsed.features)
+    assert list(stored["name"]) == list(parsed["name"])
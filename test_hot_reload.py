@@ -0,0 +1,135 @@
+import shutil
+import threading
+
+import pandas as pd
+import pytest
+
+import score_engine
+from recommendation_system import recommend
+
+QUERY = "cheap car"
+
+
+@pytest.fixture
+def data_copy(tmp_path):
+    """A private copy of the CSV for the engine to serve; restores the real one afterwards."""
+    csv = str(tmp_path / "cars.csv")
+    shutil.copy(score_engine.DATA_PATH, csv)
+    score_engine.load_dataset(csv)
+    yield csv
+    score_engine.load_dataset()
+
+
+def make_cheapest(csv, name):
+    """Rewrite the CSV so `name` becomes the clear winner for a budget query."""
+    frame = pd.read_csv(csv, float_precision="round_trip")
+    frame.loc[frame["name"] == name, ["price_min_lakh_norm", "mileage_kmpl_norm", "safety_rating_norm", "resale_value_5yr_norm"]] = [0.0, 1.0, 1.0, 1.0]
+    frame.to_csv(csv, index=False)
+
+
+def wait_for_reload():
+    thread = score_engine._reload_thread
+    if thread is not None:
+        thread.join(timeout=10)
+
+
+def test_file_change_is_picked_up_in_the_background(data_copy, monkeypatch):
+    before = recommend(QUERY, top_k=1)
+    make_cheapest(data_copy, "Volvo XC90")
+
+    monkeypatch.setattr(score_engine, "WATCH_INTERVAL", 0.01)
+    score_engine.current_dataset().next_check = 0
+    score_engine.current_dataset()
+    wait_for_reload()
+
+    after = recommend(QUERY, top_k=1)
+    assert after["dataset_version"] != before["dataset_version"]
+    assert after["results"][0]["name"] == "Volvo XC90"
+
+
+def test_unchanged_files_do_not_reload(data_copy, monkeypatch):
+    generation = score_engine.current_dataset().generation
+
+    monkeypatch.setattr(score_engine, "WATCH_INTERVAL", 0.01)
+    score_engine.current_dataset().next_check = 0
+    score_engine.current_dataset()
+    wait_for_reload()
+
+    assert score_engine.current_dataset().generation == generation
+
+
+def test_concurrent_requests_see_one_consistent_version(tmp_path):
+    original = str(tmp_path / "a.csv")
+    changed = str(tmp_path / "b.csv")
+    shutil.copy(score_engine.DATA_PATH, original)
+    shutil.copy(score_engine.DATA_PATH, changed)
+    make_cheapest(changed, "Volvo XC90")
+
+    try:
+        expected = {}
+        for csv in (original, changed):
+            version = score_engine.load_dataset(csv).version
+            expected[version] = recommend(QUERY, top_k=5)["results"]
+
+        stop = threading.Event()
+        mismatches = []
+
+        def serve():
+            while not stop.is_set():
+                response = recommend(QUERY, top_k=5)
+                if response["results"] != expected[response["dataset_version"]]:
+                    mismatches.append(response["dataset_version"])
+
+        workers = [threading.Thread(target=serve) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for i in range(20):
+            score_engine.load_dataset(changed if i % 2 else original)
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+        assert mismatches == []
+    finally:
+        score_engine.load_dataset()
+
+
+def test_admin_reload_endpoint(monkeypatch):
+    from app import app
+
+    client = app.test_client()
+    assert client.post("/admin/reload").status_code == 403
+
+    monkeypatch.setenv("MOTORMONY_ADMIN_TOKEN", "s3cret")
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    generation = score_engine.current_dataset().generation
+    response = client.post("/admin/reload?wait=1", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.get_json()["dataset_version"] == score_engine.current_dataset().version
+    assert score_engine.current_dataset().generation == generation + 1
+
+
+def test_second_reload_request_returns_at_once(data_copy, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    load = score_engine.dataset_store.load_dataset
+
+    def slow_load(path):
+        started.set()
+        release.wait(10)
+        return load(path)
+
+    monkeypatch.setattr(score_engine.dataset_store, "load_dataset", slow_load)
+    assert score_engine.reload_in_background(data_copy)
+    assert started.wait(10)
+
+    # The running reload holds the load lock; asking again must not wait for it
+    second = threading.Thread(target=lambda: results.append(score_engine.reload_in_background(data_copy)))
+    results = []
+    second.start()
+    second.join(timeout=1)
+    finished = not second.is_alive()
+    release.set()
+    wait_for_reload()
+    second.join(timeout=10)
+    assert finished and results == [False]
@@ -0,0 +1,90 @@
+import instrumentation
+from app import app
+from instrumentation import Histogram, render_prometheus, server_timing_header, stage
+
+# -------- HISTOGRAMS & FORMATTING ------------
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram(buckets=(0.001, 0.01))
+    for seconds in (0.0005, 0.001, 0.005, 0.5):
+        h.observe(seconds)
+
+    cumulative, total, count = h.snapshot()
+    assert cumulative == [2, 3, 4]
+    assert count == 4
+    assert abs(total - 0.5065) < 1e-12
+
+
+def test_server_timing_header_adds_repeated_stages():
+    header = server_timing_header([("parse", 0.001), ("score", 0.002), ("parse", 0.0005)])
+    assert header == "parse;dur=1.500, score;dur=2.000"
+
+
+def test_stage_records_into_the_current_request():
+    instrumentation.begin_request()
+    with stage("unit-test"):
+        pass
+    timings = instrumentation.end_request()
+
+    assert [name for name, _ in timings] == ["unit-test"]
+    assert 'stage="unit-test",le="+Inf"} ' in render_prometheus()
+
+
+def test_disabled_stage_is_a_shared_no_op(monkeypatch):
+    monkeypatch.setattr(instrumentation, "ENABLED", False)
+    assert stage("a") is stage("b")
+
+    instrumentation.begin_request()
+    with stage("never-recorded"):
+        pass
+    assert instrumentation.end_request() == []
+    assert "never-recorded" not in instrumentation.HISTOGRAMS
+
+# -------- ENDPOINTS ------------
+
+
+def test_recommend_sends_server_timing():
+    client = app.test_client()
+    response = client.post("/recommend", json={"query": "cheap hatchback under 6 lakhs", "top_k": 5})
+
+    assert response.status_code == 200
+    stages = [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")]
+    assert stages[0] == "parse"
+    assert stages[-1] == "total"
+    assert "encode" in stages
+
+
+def test_metrics_endpoint():
+    client = app.test_client()
+    client.post("/recommend", json={"query": "family suv", "top_k": 5})
+    body = client.get("/metrics").get_data(as_text=True)
+
+    assert "# TYPE motormony_stage_duration_seconds histogram" in body
+    assert 'motormony_stage_duration_seconds_count{stage="parse"}' in body
+    assert "motormony_result_cache_hits_total " in body
+    assert "motormony_dataset_cars 526" in body
+    assert "motormony_dataset_bytes " in body
+
+
+def test_bad_requests_get_400():
+    client = app.test_client()
+    assert client.post("/recommend", data="not json", content_type="text/plain").status_code == 400
+    assert client.post("/recommend", json={"query": 5}).status_code == 400
+    assert client.post("/recommend", json={"query": "suv", "top_k": "ten"}).status_code == 400
+    assert client.post("/recommend", json={"query": "suv", "offset": -1}).status_code == 400
+    assert client.post("/recommend/batch", json={"queries": "suv"}).status_code == 400
+
+
+def test_internal_errors_are_logged_not_leaked(monkeypatch, caplog):
+    import app as app_module
+
+    def explode(*args, **kwargs):
+        raise RuntimeError("secret detail")
+
+    monkeypatch.setattr(app_module, "recommend", explode)
+    response = app.test_client().post("/recommend", json={"query": "suv"})
+
+    assert response.status_code == 500
+    assert "secret detail" not in response.get_data(as_text=True)
+    assert "secret detail" in caplog.text
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import score_engine
+from name_index import NameIndex, edit_distance
+from query_corpus import QUERIES
+from recommendation_system import recommend
+from score_engine import LoadedDataset, rank, rank_batch
+
+FRAME = pd.DataFrame({
+    "brand": np.array(["Honda", "Honda", "honda", "Land Rover", "Land Rover", "Toyota", "Toyota", "BMW", "BMW"]),
+    "name": np.array(["Honda City", "Honda Civic", "honda civic", "Land Rover Range Rover",
+                      "Land Rover Range Rover Sport", "Toyota Corolla", "Toyota Camry", "BMW 5 Series",
+                      "BMW 5 Series Gran Turismo"])
+})
+
+
+@pytest.fixture(scope="module")
+def index():
+    return NameIndex(FRAME)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Honda City under 12 lakh", {"models": ("honda city",)}),
+    ("honda under 12 lakh", {"brands": ("honda",)}),
+    ("HONDA civic or a toyota", {"models": ("honda civic",), "brands": ("toyota",)}),
+    ("land rover range rover", {"models": ("land rover range rover", "land rover range rover sport")}),
+    ("bmw 5 series gran turismo", {"models": ("bmw 5 series gran turismo",)}),
+    ("corolla for my family", {"boost": ("toyota corolla",)}),
+    # Typos (a swap, a missing letter, a wrong letter) are only a guess, so they boost
+    ("toyta corola", {"boost": ("toyota corolla",)}),
+    ("hodna civc", {"boost": ("honda civic",)}),
+    ("honda civc", {"brands": ("honda",), "boost": ("honda civic",)}),
+    ("toyta", {"boost": ("toyota camry", "toyota corolla")}),
+    ("camri", {"boost": ("toyota camry",)}),
+    # Parser keywords and bare numbers are never cars: "range" is an EV keyword, "5 seater" is not the 5 Series
+    ("suv with good range", {}),
+    ("5 seater family car", {}),
+    # Everyday words are neither corrected nor read as a model on their own
+    ("city car", {}),
+    ("quick car", {}),
+    ("honda city", {"models": ("honda city",)}),
+])
+def test_extract(index, query, expected):
+    found = index.extract(query)
+    assert found == {key: expected.get(key, ()) for key in ("brands", "models", "boost")}
+
+
+# Queries of the corpus that do name a car; nothing else may come out as a name
+NAMED_QUERIES = {"Tesla"}
+
+EVERYDAY_QUERIES = [
+    "quick car with 300 bhp", "black suv with navigation", "car with a navigation system", "quickest sedan",
+    "reliable car for city driving", "spacious car for a road trip with the dog", "white car with leather seats",
+    "something sporty for weekend escapes", "comfortable cruiser for long highway journeys"
+]
+
+
+def test_everyday_queries_name_no_cars():
+    names = score_engine.current_dataset().names
+    for query in QUERIES + EVERYDAY_QUERIES:
+        found = names.extract(query)
+        if query in NAMED_QUERIES:
+            assert any(found.values()), query
+        else:
+            assert found == {"brands": (), "models": (), "boost": ()}, query
+
+    response = recommend("quick car with 300 bhp", top_k=10)
+    assert len({car["brand"] for car in response["results"]}) > 1
+
+
+def test_corrections_survive_a_concurrent_clear(index):
+    class ClearedRightAway(dict):
+        """What another thread clearing the cache between store and read looks like."""
+
+        def __setitem__(self, key, value):
+            super().__setitem__(key, value)
+            self.clear()
+
+    index._corrections = ClearedRightAway()
+    assert index.correct("corola") == "corolla"
+    index._corrections = {}
+
+
+def test_masks_cover_every_casing(index):
+    assert np.flatnonzero(index.mask(brands=("honda",))).tolist() == [0, 1, 2]
+    assert np.flatnonzero(index.mask(models=("honda civic", "toyota camry"))).tolist() == [1, 2, 6]
+    assert index.mask() is None
+
+
+def test_edit_distance():
+    assert edit_distance("corola", "corolla", 1) == 1
+    assert edit_distance("toyta", "toyota", 1) == 1
+    assert edit_distance("hodna", "honda", 1) == 1
+    assert edit_distance("abcdef", "ghijkl", 2) == 3
+
+# -------- RANKING WITH NAME FILTERS ------------
+
+
+def test_name_filters_and_boosts_rank_like_a_naive_scan(monkeypatch):
+    catalogue = score_engine.current_dataset().catalogue
+    monkeypatch.setattr(score_engine, "RANKING_BUDGET_MB", 0)
+    scored = LoadedDataset(catalogue, 0, None, None)
+    monkeypatch.setattr(score_engine, "RANKING_BUDGET_MB", 64)
+    precomputed = LoadedDataset(catalogue, 0, None, None)
+
+    names = np.char.lower(np.asarray(catalogue["name"]).astype(str))
+    brands = np.char.lower(np.asarray(catalogue["brand"]).astype(str))
+    prices = np.asarray(catalogue["price_min_lakh"])
+    boost = ("volkswagen jetta", "toyota corolla")
+    for intents in (["family"], ["budget", "ev"]):
+        for top_k, offset in ((10, 0), (3, 2), (None, 0)):
+            # Filtering the unfiltered ranking keeps its order
+            expected = rank(intents, dataset=scored)[0]
+            expected = expected[(prices[expected] <= 40) & np.isin(brands[expected], ["honda", "toyota"])]
+            boosted = np.isin(names[expected], boost)
+            expected = np.concatenate([expected[boosted], expected[~boosted]])
+            end = None if top_k is None else offset + top_k
+            for dataset in (scored, precomputed):
+                rows, _, total = rank(intents, budget=40, brands=("honda", "toyota"), boost=boost,
+                                      top_k=top_k, offset=offset, dataset=dataset)
+                np.testing.assert_array_equal(rows, expected[offset:end])
+                assert total == len(expected)
+
+            params = {"intents": intents, "budget": 40, "brands": ("honda", "toyota"), "boost": boost}
+            rows, _, _ = rank_batch([params], top_k=top_k, offset=offset, dataset=scored)[0]
+            np.testing.assert_array_equal(rows, expected[offset:end])
+
+
+def test_recommend_reads_brand_and_model():
+    # A misspelt name is put first, not used as a filter
+    response = recommend("toyta corola", top_k=5)
+    assert response["results"][0]["name"].lower() == "toyota corolla"
+    assert response["total_matches"] > 1
+
+    response = recommend("honda under 40 lakh", top_k=50)
+    assert response["total_matches"] > 0
+    assert all(car["brand"].lower() == "honda" for car in response["results"])
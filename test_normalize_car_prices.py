@@ -0,0 +1,117 @@
+import pandas as pd
+import pytest
+
+from normalize_car_prices import (
+    add_estimates,
+    aggregate,
+    build_catalogue,
+    clean,
+    estimate_columns,
+    normalize_features,
+    round_values
+)
+
+
+@pytest.fixture(scope="module")
+def dump_path(tmp_path_factory, messy_auction_dump):
+    path = tmp_path_factory.mktemp("etl") / "car_prices.csv"
+    messy_auction_dump(20000).to_csv(path, index=False)
+    return str(path)
+
+
+def reference_catalogue(path):
+    """The original single-pass pipeline: whole file in memory, estimators row by row."""
+    df = add_estimates(clean(pd.read_csv(path)))
+    return round_values(normalize_features(aggregate(df)))
+
+# -------- VECTORISED ESTIMATORS ------------
+
+
+def test_estimate_columns_match_the_row_by_row_estimators(dump_path):
+    df = clean(pd.read_csv(dump_path))
+    expected = add_estimates(df.copy())
+    vectorised = estimate_columns(df)
+
+    for col in vectorised.columns:
+        assert list(vectorised[col]) == list(expected[col]), col
+
+
+def test_chunked_reader_estimates_the_same_values(dump_path):
+    from normalize_car_prices import read_chunks
+
+    expected = add_estimates(clean(pd.read_csv(dump_path)))
+    chunked = pd.concat([estimate_columns(clean(chunk)) for chunk in read_chunks(dump_path, 3000)])
+    for col in chunked.columns:
+        assert list(chunked[col]) == list(expected[col]), col
+
+# -------- CHUNKED PIPELINE ------------
+
+
+@pytest.mark.parametrize("chunk_rows", [20000, 4096, 777])
+def test_chunked_pipeline_output_is_identical(dump_path, tmp_path, chunk_rows):
+    expected = reference_catalogue(dump_path)
+    catalogue, rows_read = build_catalogue(dump_path, chunk_rows=chunk_rows)
+
+    assert rows_read == 20000
+    pd.testing.assert_frame_equal(catalogue, expected, check_exact=True)
+
+    expected.to_csv(tmp_path / "expected.csv", index=False)
+    catalogue.to_csv(tmp_path / "chunked.csv", index=False)
+    assert (tmp_path / "chunked.csv").read_bytes() == (tmp_path / "expected.csv").read_bytes()
+
+
+def test_running_aggregate_grows_and_matches_groupby(dump_path):
+    from normalize_car_prices import RunningAggregate
+
+    listings = estimate_columns(clean(pd.read_csv(dump_path)))
+    totals = RunningAggregate(capacity=8)
+    for start in range(0, len(listings), 1000):
+        totals.add(listings.iloc[start:start + 1000])
+
+    pd.testing.assert_frame_equal(totals.result(), aggregate(listings), check_exact=True)
+
+# -------- PARALLEL SHARDS ------------
+
+
+def test_byte_shards_cover_every_row_once(dump_path):
+    from normalize_car_prices import byte_shards, read_chunks, read_shard_chunks
+
+    header, shards = byte_shards(dump_path, 7)
+    assert len(shards) == 7
+    assert all(end == next_start for (_, end), (next_start, _) in zip(shards, shards[1:]))
+
+    whole = pd.concat(read_chunks(dump_path, 50000), ignore_index=True)
+    pieces = pd.concat(
+        [chunk for start, end in shards for chunk in read_shard_chunks(dump_path, start, end, header, 1000)],
+        ignore_index=True
+    )
+    pd.testing.assert_frame_equal(pieces.astype(object), whole.astype(object))
+
+
+def test_parallel_pipeline_matches_serial(dump_path):
+    from normalize_car_prices import build_catalogue_parallel
+
+    serial, rows = build_catalogue(dump_path)
+    parallel, parallel_rows = build_catalogue_parallel(dump_path, workers=3, chunk_rows=2000)
+
+    assert parallel_rows == rows
+    # Means are summed in another order, so only the last binary place may differ
+    pd.testing.assert_frame_equal(parallel, serial, check_exact=False, rtol=1e-12)
+    for col in ("name", "brand", "seats", "fuel_type", "body_type", "year"):
+        assert list(parallel[col]) == list(serial[col]), col
+
+    # Parallelism is opt-in: by default the output is the exact serial result
+    default, _ = build_catalogue_parallel(dump_path, chunk_rows=2000)
+    pd.testing.assert_frame_equal(default, serial, check_exact=True)
+
+
+def test_merged_aggregates_equal_one_pass(dump_path):
+    from normalize_car_prices import RunningAggregate
+
+    listings = estimate_columns(clean(pd.read_csv(dump_path)))
+    first, second = RunningAggregate(), RunningAggregate(capacity=4)
+    first.add(listings.iloc[:6000])
+    second.add(listings.iloc[6000:])
+    first.merge(second)
+
+    pd.testing.assert_frame_equal(first.result(), aggregate(listings), check_exact=False, rtol=1e-12)
@@ -3,3 +3,61 @@ from intent_parser import parse_query
 q = "Family friendly 5 seater car under 12 lakhs with petrol engine"
 
 print(parse_query(q))
+
+
+# -------- REGRESSION CORPUS ------------
+
+from query_corpus import QUERIES
+
+REGRESSION_CORPUS = [
+    ("Family friendly 5 seater car under 12 lakhs with petrol engine",
+     {"intents": ["family", "budget"], "budget": 12.0, "min_seats": 5, "fuel_type": "petrol", "body_type": None}),
+    ("Looking for a sporty performance car under 25 lakhs",
+     {"intents": ["budget", "performance"], "budget": 25.0, "min_seats": None, "fuel_type": None, "body_type": None}),
+    ("Show me rare collector cars",
+     {"intents": ["collector"], "budget": None, "min_seats": None, "fuel_type": None, "body_type": None}),
+    ("Electric SUV with long range",
+     {"intents": ["ev"], "budget": None, "min_seats": None, "fuel_type": "ev", "body_type": "suv"}),
+    ("7 seater MPV for a big family",
+     {"intents": ["family"], "budget": None, "min_seats": 7, "fuel_type": None, "body_type": "mpv"}),
+    ("car that holds value, good resale value",
+     {"intents": ["budget", "resale"], "budget": None, "min_seats": None, "fuel_type": None, "body_type": None}),
+    ("best car under 500000",
+     {"intents": ["budget"], "budget": 5.0, "min_seats": None, "fuel_type": None, "body_type": None}),
+    ("EVs under 15 L",
+     {"intents": ["budget", "ev"], "budget": 15.0, "min_seats": None, "fuel_type": "ev", "body_type": None}),
+    ("gasoline sedan for a family of 5 persons",
+     {"intents": ["family"], "budget": None, "min_seats": 5, "fuel_type": "petrol", "body_type": "sedan"}),
+    ("good value family SUV with 7 seaters",
+     {"intents": ["family", "budget"], "budget": None, "min_seats": 7, "fuel_type": None, "body_type": "suv"}),
+    ("Hybrid MPV for family trips under 30 lakhs",
+     {"intents": ["family", "budget"], "budget": 30.0, "min_seats": None, "fuel_type": "hybrid", "body_type": "mpv"}),
+    ("something reliable",
+     {"intents": ["general"], "budget": None, "min_seats": None, "fuel_type": None, "body_type": None}),
+    # Substring false positives the old any(word in text) matcher produced
+    ("low cost car for every day commute",
+     {"intents": ["budget"], "budget": None, "min_seats": None, "fuel_type": None, "body_type": None}),
+    ("seven seater for weekend trips",
+     {"intents": ["general"], "budget": None, "min_seats": None, "fuel_type": None, "body_type": None}),
+    ("car under 9 lakhs with 12 litre boot",
+     {"intents": ["budget"], "budget": 9.0, "min_seats": None, "fuel_type": None, "body_type": None}),
+    ("12.5 lakh budget sedan",
+     {"intents": ["budget"], "budget": 12.5, "min_seats": None, "fuel_type": None, "body_type": "sedan"}),
+]
+
+
+def test_regression_corpus():
+    for query, expected in REGRESSION_CORPUS:
+        assert parse_query(query) == expected, query
+
+
+def test_helpers_agree_with_parse_query():
+    from intent_parser import detect_intents, extract_body_type, extract_budget, extract_fuel, extract_seats
+
+    for query in QUERIES:
+        params = parse_query(query)
+        assert detect_intents(query) == params["intents"]
+        assert extract_budget(query) == params["budget"]
+        assert extract_seats(query) == params["min_seats"]
+        assert extract_fuel(query) == params["fuel_type"]
+        assert extract_body_type(query) == params["body_type"]
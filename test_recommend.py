@@ -1,9 +1,17 @@
-from recommendation_system import recommend
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from dataset_store import Catalogue
+from recommendation_system import (format_results, generate_carpilot_suggestion, iter_recommend, recommend,
+                                   recommend_batch, result_cache, suggestion_templates)
 
 # 1) Family + budget example
 q1 = "Family friendly 5 seater car under 12 lakhs with petrol engine"
 print("Query 1:", q1)
-for item in recommend(q1, top_k=5):
+for item in recommend(q1, top_k=5)["results"]:
     print(item)
 
 print("\n" + "="*50 + "\n")
@@ -11,7 +19,7 @@ print("\n" + "="*50 + "\n")
 # 2) Performance cars
 q2 = "Looking for a sporty performance car under 25 lakhs"
 print("Query 2:", q2)
-for item in recommend(q2, top_k=5):
+for item in recommend(q2, top_k=5)["results"]:
     print(item)
 
 print("\n" + "="*50 + "\n")
@@ -19,7 +27,7 @@ print("\n" + "="*50 + "\n")
 # 3) Collector / rare
 q3 = "Show me rare collector cars"
 print("Query 3:", q3)
-for item in recommend(q3, top_k=5):
+for item in recommend(q3, top_k=5)["results"]:
     print(item)
 
 print("\n" + "="*50 + "\n")
@@ -27,5 +35,260 @@ print("\n" + "="*50 + "\n")
 # 4) EV with long range
 q4 = "Electric SUV with long range"
 print("Query 4:", q4)
-for item in recommend(q4, top_k=5):
+for item in recommend(q4, top_k=5)["results"]:
     print(item)
+
+
+# -------- BATCH RECOMMENDATIONS ------------
+
+BATCH_QUERIES = [
+    "Family friendly 5 seater car under 12 lakhs with petrol engine",
+    "Looking for a sporty performance car under 25 lakhs",
+    "Show me rare collector cars",
+    "Electric SUV with long range",
+    "family car under 12 lakhs",
+    "Show me rare collector cars",
+    "cheap hatchback",
+    "safe 7 seater family suv with good resale",
+]
+
+
+def test_batch_matches_one_at_a_time():
+    result_cache.clear()
+    batch = recommend_batch(BATCH_QUERIES, top_k=10)
+
+    result_cache.clear()
+    single = [recommend(q, top_k=10) for q in BATCH_QUERIES]
+
+    assert batch == single
+
+
+def test_editing_results_does_not_change_the_cache():
+    query = "Show me rare collector cars"
+    result_cache.clear()
+    expected = json.loads(json.dumps(recommend(query, top_k=5)["results"]))
+
+    recommend(query, top_k=5)["results"][0]["name"] = "HACKED"
+    recommend_batch([query], top_k=5)[0]["results"][0]["name"] = "HACKED"
+    next(e for e in iter_recommend(query, top_k=5) if e["type"] == "car")["car"]["name"] = "HACKED"
+
+    assert recommend(query, top_k=5)["results"] == expected
+    assert recommend_batch([query], top_k=5)[0]["results"] == expected
+
+
+def test_batch_endpoint():
+    from app import app
+
+    client = app.test_client()
+    response = client.post("/recommend/batch", json={"queries": BATCH_QUERIES[:3], "top_k": 3})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [entry["query"] for entry in body["results"]] == BATCH_QUERIES[:3]
+    assert all(len(entry["results"]) <= 3 for entry in body["results"])
+
+    assert client.post("/recommend/batch", json={"queries": "nope"}).status_code == 400
+
+
+# -------- STREAMING (NDJSON) ------------
+
+
+def test_stream_carries_the_same_cars_as_recommend():
+    query = "Family friendly 5 seater car under 12 lakhs with petrol engine"
+    result_cache.clear()
+    events = list(iter_recommend(query, top_k=10))
+    expected = recommend(query, top_k=10)
+
+    assert [e["type"] for e in events[:3]] == ["meta", "car", "carpilot_suggestion"]
+    assert events[-1] == {"type": "end", "total_available": len(expected["results"])}
+    assert [e["car"] for e in events if e["type"] == "car"] == expected["results"]
+    assert events[2]["carpilot_suggestion"] == expected["carpilot_suggestion"]
+    assert events[0]["total_matches"] == expected["total_matches"]
+
+
+def test_stream_endpoint_is_opt_in():
+    from app import app
+
+    client = app.test_client()
+    body = {"query": "Show me rare collector cars", "top_k": 5}
+
+    plain = client.post("/recommend", json=body, headers={"Accept": "*/*"})
+    assert plain.mimetype == "application/json"
+
+    for request_kwargs in ({"json": dict(body, stream=True)},
+                           {"json": body, "headers": {"Accept": "application/x-ndjson"}}):
+        streamed = client.post("/recommend", **request_kwargs)
+        assert streamed.mimetype == "application/x-ndjson"
+        events = [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()]
+        cars = [e["car"] for e in events if e["type"] == "car"]
+        assert cars == plain.get_json()["results"]
+        assert events[0]["query"] == body["query"]
+        assert events[-1]["type"] == "end"
+
+    # Only a real true, or 1 / true in a query string, asks for the stream
+    for value in ("false", "true", 1, "no"):
+        assert client.post("/recommend", json=dict(body, stream=value)).mimetype == "application/json"
+    for value, streamed in (("0", False), ("false", False), ("", False), ("1", True), ("True", True)):
+        response = client.get("/recommend", query_string=dict(body, stream=value))
+        response.get_data()
+        assert (response.mimetype == "application/x-ndjson") == streamed, value
+        assert ("ETag" in response.headers) != streamed
+
+    # JSON and NDJSON share the GET URL: both vary on Accept, and the stream is never stored
+    plain = client.get("/recommend", query_string=body)
+    streamed = client.get("/recommend", query_string=body, headers={"Accept": "application/x-ndjson"})
+    streamed.get_data()
+    assert streamed.mimetype == "application/x-ndjson"
+    assert "Accept" in plain.headers["Vary"] and "Accept" in streamed.headers["Vary"]
+    assert streamed.headers["Cache-Control"] == "no-store"
+    assert "ETag" not in streamed.headers
+
+
+# -------- RESULT MATERIALISATION ------------
+
+
+def test_zero_is_kept_and_missing_becomes_none():
+    data = {
+        "name": np.array(["Zero", "Missing"], dtype=object),
+        "brand": np.array(["A", "B"], dtype=object),
+        "price_min_lakh": np.array([5.0, 6.0]),
+        "seats": np.array([5, 7]),
+        "power_bhp": np.array([0.0, np.nan]),
+        "mileage_kmpl": np.array([0.0, np.nan]),
+        "safety_rating": np.array([0.0, np.nan]),
+        "fuel_type": np.array(["Petrol", None], dtype=object),
+        "body_type": np.array(["Sedan", None], dtype=object),
+        "resale_value_5yr": np.array([0.0, np.nan]),
+        "year": np.array([2015, 2014]),
+    }
+    for col in ("price_min_lakh_norm", "mileage_kmpl_norm", "power_bhp_norm",
+                "safety_rating_norm", "resale_value_5yr_norm"):
+        data[col] = np.zeros(2)
+    dataset = SimpleNamespace(catalogue=Catalogue(data, list(data)))
+
+    zero, missing = format_results([0, 1], np.array([0.5, 0.25]), {"intents": ["general"]}, dataset)
+
+    assert (zero["power_bhp"], zero["mileage_kmpl"], zero["safety_rating"], zero["resale_value_5yr"]) == (0.0, 0.0, 0.0, 0.0)
+    assert (missing["power_bhp"], missing["mileage_kmpl"], missing["safety_rating"], missing["resale_value_5yr"]) == (None,) * 4
+    assert (missing["fuel_type"], missing["body_type"]) == ("N/A", "N/A")
+    assert zero["reason"] == "Intent: general; Score: 0.500; Price (min): ₹5.0L; Seats: 5"
+
+
+# -------- CARPILOT SUGGESTION TEMPLATES ------------
+
+
+FAMILY_CAR = {"name": "Kia Carens", "brand": "Kia", "final_score": 0.8123, "price_min_lakh": 9.5, "seats": 7,
+              "power_bhp": 113.0, "mileage_kmpl": 18.2, "safety_rating": 4.5, "fuel_type": "Petrol",
+              "resale_value_5yr": 65.0}
+ELECTRIC_CAR = {"name": "Tesla Model S", "brand": "Tesla", "final_score": 0.9, "price_min_lakh": 60.25, "seats": 5,
+                "power_bhp": None, "mileage_kmpl": None, "safety_rating": 4.0, "fuel_type": "Electric",
+                "resale_value_5yr": 70.0}
+# Nothing known beyond price and seats, fuel_type included
+BARE_CAR = {"name": "Acura ILX", "brand": "Acura", "final_score": 0.5, "price_min_lakh": 15.61, "seats": 5,
+            "power_bhp": None, "mileage_kmpl": None, "safety_rating": None, "fuel_type": None,
+            "resale_value_5yr": None}
+
+# What the original per-request renderer produced for these cars
+EXPECTED_SUGGESTIONS = [
+    (FAMILY_CAR, "family car under 12 lakh", ["family", "budget"], {"budget": 12.0}, {
+        "car_name": "Kia Carens",
+        "brand": "Kia",
+        "score": 0.8123,
+        "summary": "Based on your search for 'family car under 12 lakh', our AI identified Family, Budget priorities. "
+                   "The **Kia Carens** scored 0.812 - our highest match for your needs.",
+        "reasons": [
+            "✅ **Perfect for Families**: With 7 comfortable seats and a 4.5 star safety rating, this car prioritizes "
+            "your family's wellbeing",
+            "💰 **Cost-Efficient**: 18.2 km/l mileage keeps running costs low for daily school runs and weekend trips",
+            "💵 **Budget Champion**: At just ₹9.5L, this offers exceptional value without compromising quality",
+            "📊 **Low Running Costs**: 18.2 km/l efficiency means more money stays in your pocket",
+            "📈 **Strong Resale**: Retains approximately 65% value after 5 years",
+            "✓ **Within Budget**: Fits comfortably under your ₹12.0L budget"
+        ],
+        "key_specs": {"price": "₹9.5L", "seats": 7, "power": "113 BHP", "mileage": "18.2 km/l", "safety": "4.5 ⭐"}
+    }),
+    (ELECTRIC_CAR, "fast electric car", ["performance", "ev"], {}, {
+        "car_name": "Tesla Model S",
+        "brand": "Tesla",
+        "score": 0.9,
+        "summary": "Based on your search for 'fast electric car', our AI identified Performance, Ev priorities. "
+                   "The **Tesla Model S** scored 0.900 - our highest match for your needs.",
+        "reasons": [
+            "⚡ **Dynamic Driving**: Built for enthusiasts who demand responsive handling and spirited performance",
+            "🌱 **Eco-Friendly Choice**: Zero emissions driving helps protect the environment",
+            "⚡ **Future-Ready**: Electric powertrain means lower maintenance and no fuel expenses",
+            "👑 **Premium Experience**: Tesla craftsmanship delivers refined comfort and cutting-edge technology",
+            "🛡️ **Top-Tier Safety**: 4.0 star rating with advanced driver assistance systems",
+            "🛡️ **Safety First**: 4.0 star safety rating for peace of mind",
+            "💎 **Smart Investment**: Strong 70% resale value retention"
+        ],
+        "key_specs": {"price": "₹60.25L", "seats": 5, "power": "N/A", "mileage": "N/A", "safety": "4.0 ⭐"}
+    }),
+    (BARE_CAR, "any car", ["general"], {}, {
+        "car_name": "Acura ILX",
+        "brand": "Acura",
+        "score": 0.5,
+        "summary": "Based on your search for 'any car', our AI identified General priorities. "
+                   "The **Acura ILX** scored 0.500 - our highest match for your needs.",
+        "reasons": [],
+        "key_specs": {"price": "₹15.61L", "seats": 5, "power": "N/A", "mileage": "N/A", "safety": "N/A"}
+    })
+]
+
+
+@pytest.mark.parametrize("car, query, intents, params, expected", EXPECTED_SUGGESTIONS)
+def test_templates_render_the_expected_suggestion(car, query, intents, params, expected):
+    suggestion_templates.cache.clear()
+    # Twice: the second render comes from the memoised parts
+    for _ in range(2):
+        assert generate_carpilot_suggestion(car, query, intents, params) == expected
+    # The memoised parts leave the query text and budget line to each request
+    other = generate_carpilot_suggestion(car, "something else", intents, {"budget": 30.0})
+    assert other["summary"].startswith("Based on your search for 'something else', ")
+    assert "✓ **Within Budget**: Fits comfortably under your ₹30.0L budget" in other["reasons"]
+
+
+def test_suggestion_parts_are_not_shared_between_responses():
+    first = generate_carpilot_suggestion(FAMILY_CAR, "q", ["family"], {"budget": 10})
+    expected = json.loads(json.dumps(first))
+    first["reasons"].append("changed")
+    first["key_specs"]["price"] = "changed"
+    assert generate_carpilot_suggestion(FAMILY_CAR, "q", ["family"], {"budget": 10}) == expected
+
+
+def test_missing_fuel_type_is_not_an_error():
+    car = dict(recommend("cars", top_k=1)["results"][0], fuel_type=None)
+    suggestion = generate_carpilot_suggestion(car, "q", ["general"], {})
+    assert not any("Electric powertrain" in reason for reason in suggestion["reasons"])
+    assert len(suggestion_templates.cache) > 0
+
+
+# -------- HTTP CACHING ------------
+
+
+def test_get_recommend_is_cacheable_and_revalidates():
+    from app import app
+
+    client = app.test_client()
+    query = "Family friendly 5 seater car under 12 lakhs with petrol engine"
+    posted = client.post("/recommend", json={"query": query, "top_k": 5})
+    fetched = client.get("/recommend", query_string={"query": query, "top_k": 5})
+    assert fetched.status_code == 200
+    assert fetched.get_json() == posted.get_json()
+    assert "max-age" in fetched.headers["Cache-Control"]
+    etag = fetched.headers["ETag"]
+
+    # Same inputs, same tag, from a cold cache too; anything else changes it
+    result_cache.clear()
+    assert client.get("/recommend", query_string={"query": query, "top_k": 5}).headers["ETag"] == etag
+    for other in ({"query": query, "top_k": 6}, {"query": query, "top_k": 5, "offset": 5},
+                  {"query": query + "!", "top_k": 5}, {"query": query, "top_k": 5, "mode": "pareto"}):
+        assert client.get("/recommend", query_string=other).headers["ETag"] != etag
+
+    revalidated = client.get("/recommend", query_string={"query": query, "top_k": 5}, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304 and revalidated.data == b""
+    assert revalidated.headers["ETag"] == etag
+
+    pareto = client.get("/recommend", query_string={"query": query, "mode": "pareto", "objectives": "price,safety"})
+    assert pareto.get_json()["objectives"] == ["price", "safety"]
+    assert client.get("/recommend", query_string={"query": query, "top_k": "ten"}).status_code == 400
+    assert client.get("/recommend").status_code == 400
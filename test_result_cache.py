@@ -0,0 +1,59 @@
+import score_engine
+from recommendation_system import recommend, result_cache
+from result_cache import ResultCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_counters():
+    cache = ResultCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1      # "a" is now most recently used
+    cache.put("c", 3)               # evicts "b"
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1)
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ResultCache(maxsize=10, ttl=5, clock=clock)
+    cache.put("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+
+
+def test_differently_worded_queries_share_one_entry():
+    result_cache.clear()
+    hits = result_cache.hits
+
+    first = recommend("family car under 12 lakhs", top_k=5)
+    second = recommend("a car for my family, under 12 lakh", top_k=5)
+
+    assert result_cache.hits == hits + 1
+    assert first["results"] == second["results"]
+    # The CarPilot text is still rendered for each raw query
+    assert "under 12 lakh'" in second["carpilot_suggestion"]["summary"]
+
+
+def test_reload_invalidates_cache():
+    recommend("family car under 12 lakhs", top_k=5)
+    assert len(result_cache) > 0
+
+    version = score_engine.DATASET_VERSION
+    score_engine.load_dataset()
+
+    assert score_engine.DATASET_VERSION == version + 1
+    assert len(result_cache) == 0
@@ -0,0 +1,114 @@
+import numpy as np
+
+from app import app
+from similarity_index import CATEGORY_WEIGHT, SimilarityIndex, car_vectors
+
+
+def clustered_vectors(n=3000, dims=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.random((30, dims))
+    return (centres[rng.integers(0, 30, n)] + rng.normal(0, 0.05, (n, dims))).astype(np.float32)
+
+
+def brute_force(vectors, query, k, exclude=None):
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    if exclude is not None:
+        distances[exclude] = np.inf
+    return np.lexsort((np.arange(len(vectors)), distances))[:k]
+
+
+def test_car_vectors_one_hot_fuel_and_body():
+    frame = {"fuel_type": np.array(["Petrol", "EV", "petrol"]), "body_type": np.array(["SUV", "SUV", "Sedan"])}
+    vectors = car_vectors(frame, np.zeros((3, 2), dtype=np.float32))
+    # 2 features, fuel: ev / petrol, body: sedan / suv
+    np.testing.assert_array_equal(vectors[:, 2:] / CATEGORY_WEIGHT, [[0, 1, 0, 1], [1, 0, 0, 1], [0, 1, 1, 0]])
+
+
+def test_exact_search_matches_brute_force():
+    vectors = clustered_vectors()
+    index = SimilarityIndex(vectors)
+    assert index.lists is None
+    exclude = np.zeros(len(vectors), dtype=bool)
+    exclude[::7] = True
+    for row in (0, 5, 2999):
+        rows, distances = index.search(vectors[row], 10, exclude=exclude)
+        np.testing.assert_array_equal(rows, brute_force(vectors, vectors[row], 10, exclude))
+        assert np.all(np.diff(distances) >= 0)
+
+
+def test_ivf_finds_the_exact_neighbours():
+    vectors = clustered_vectors()
+    index = SimilarityIndex(vectors, exact_limit=100)
+    assert index.lists == int(np.sqrt(len(vectors)) / 2)
+    assert sorted(index.members) == list(range(len(vectors)))
+
+    for row in range(0, 3000, 97):
+        exact, exact_distances = index.search(vectors[row], 10, exact=True)
+        # Probing every list is an exact search
+        np.testing.assert_array_equal(index.search(vectors[row], 10, nprobe=index.lists)[0], exact)
+        _, distances = index.search(vectors[row], 10)
+        assert np.count_nonzero(distances <= exact_distances[-1]) >= 9
+
+
+def test_ivf_probes_more_lists_until_k_cars_survive():
+    vectors = clustered_vectors()
+    index = SimilarityIndex(vectors, exact_limit=100)
+    exclude = np.zeros(len(vectors), dtype=bool)
+    exclude[::3] = True
+
+    # More cars than the default nprobe lists hold
+    rows, _ = index.search(vectors[0], 1500, exclude=exclude)
+    assert len(rows) == 1500 and not exclude[rows].any()
+    # Asking for every car probes every list: an exact search
+    everything, _ = index.search(vectors[0], len(vectors), exclude=exclude)
+    np.testing.assert_array_equal(everything, index.search(vectors[0], len(vectors), exclude=exclude, exact=True)[0])
+    assert len(everything) == np.count_nonzero(~exclude)
+
+def test_updated_ivf_reassigns_only_changed_rows():
+    rng = np.random.default_rng(1)
+    fuel = np.array(["Petrol", "EV", "Diesel"])[rng.integers(0, 3, 3000)]
+    catalogue = {"fuel_type": fuel, "body_type": np.full(3000, "SUV")}
+    features = clustered_vectors(dims=5)
+    index = SimilarityIndex.of(catalogue, features, exact_limit=100)
+
+    # Two cars inserted at rows 10 and 2000, and two existing ones changed
+    inserted = np.array([10, 2000])
+    new_features = np.insert(features, [10, 1999], rng.random((2, 5)).astype(np.float32), axis=0)
+    new_features[[50, 900]] = rng.random((2, 5))
+    changed = np.array([10, 50, 900, 2000])
+    new_catalogue = {"fuel_type": np.insert(fuel, [10, 1999], "EV"), "body_type": np.full(3002, "SUV")}
+    updated = index.updated(new_catalogue, new_features, inserted, changed)
+
+    np.testing.assert_array_equal(updated.vectors, car_vectors(new_catalogue, new_features))
+    assert updated.centroids is index.centroids
+    assert sorted(updated.members) == list(range(3002))
+    assigned = np.repeat(np.arange(updated.lists), np.diff(updated.offsets))[np.argsort(updated.members)]
+    np.testing.assert_array_equal(assigned, index._assign(updated.vectors, index.centroids))
+
+    # A fuel type the index has no column for means a full build
+    new_catalogue["fuel_type"][10] = "Hydrogen"
+    rebuilt = index.updated(new_catalogue, new_features, inserted, changed)
+    np.testing.assert_array_equal(rebuilt.vectors, car_vectors(new_catalogue, new_features))
+
+# -------- /similar ENDPOINT ------------
+
+
+def test_similar_endpoint():
+    client = app.test_client()
+    response = client.get("/similar?name=Acura MDX&top_k=5")
+    assert response.status_code == 200
+    assert "search;dur=" in response.headers["Server-Timing"]
+    data = response.get_json()
+    assert data["car"]["name"] == "Acura MDX"
+    assert len(data["results"]) == 5
+    assert all(car["name"].lower() != "acura mdx" for car in data["results"])
+    distances = [car["distance"] for car in data["results"]]
+    assert distances == sorted(distances)
+
+    # Misspelt, or without its brand, is still the same car
+    assert client.get("/similar?name=akura mdx").get_json()["car"]["name"] == "Acura MDX"
+    assert client.get("/similar?name=mdx").get_json()["car"]["name"] == "Acura MDX"
+    assert client.get("/similar?name=Xyzzy Teapot").status_code == 404
+    assert client.get("/similar").status_code == 400
+    assert client.get("/similar?name=mdx&top_k=0").status_code == 400
+    assert client.get("/similar?name=mdx&top_k=10000").status_code == 400
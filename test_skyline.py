@@ -0,0 +1,87 @@
+import numpy as np
+
+import score_engine
+import skyline as skyline_module
+from app import app
+from intent_parser import detect_objectives
+from recommendation_system import recommend, result_cache
+from score_engine import OBJECTIVES, default_objectives, pareto, rank
+from skyline import skyline
+
+
+def naive_skyline(values):
+    """Every row checked against every other row: the O(n^2) definition."""
+    keep = [i for i, point in enumerate(values)
+            if not ((values <= point).all(axis=1) & (values < point).any(axis=1)).any()]
+    return np.array(keep, dtype=np.intp)
+
+
+def test_skyline_matches_the_definition(monkeypatch):
+    rng = np.random.default_rng(3)
+    for trial in range(200):
+        # Small blocks so the block-vs-front and in-block paths both run
+        monkeypatch.setattr(skyline_module, "BLOCK", int(rng.integers(1, 64)))
+        n, dims = int(rng.integers(0, 300)), int(rng.integers(1, 5))
+        if trial % 2:
+            # Few distinct values: plenty of ties and exact duplicates
+            values = rng.integers(0, 4, size=(n, dims)).astype(np.float32)
+        else:
+            values = rng.random((n, dims))
+        np.testing.assert_array_equal(skyline(values), naive_skyline(values))
+
+
+def test_duplicates_of_a_skyline_point_are_all_kept():
+    values = np.array([[1, 2], [2, 1], [1, 2], [2, 2], [2, 1]], dtype=np.float32)
+    np.testing.assert_array_equal(skyline(values), [0, 1, 2, 4])
+    # -0.0 and 0.0 are the same point, whatever their bits say
+    np.testing.assert_array_equal(skyline(np.array([[0.0, 1.0], [-0.0, 1.0], [1.0, 0.0]], dtype=np.float32)), [0, 1, 2])
+
+
+def test_pareto_returns_the_undominated_filtered_cars():
+    dataset = score_engine.current_dataset()
+    for objectives in (["price", "safety"], ["power", "mileage", "price"], list(OBJECTIVES)):
+        for filters in ({}, {"budget": 15, "min_seats": 5}, {"fuel_type": "petrol", "body_type": "suv"}):
+            rows, scores, total = pareto(["family"], objectives, dataset=dataset, **filters)
+            candidates = rank(["general"], dataset=dataset, **filters)[0]
+
+            columns = [score_engine.FEATURE_COLUMNS.index(OBJECTIVES[name][0]) for name in objectives]
+            signs = np.array([-OBJECTIVES[name][1] for name in objectives], dtype=np.float32)
+            values = dataset.features[candidates][:, columns] * signs
+            assert set(rows.tolist()) == set(candidates[naive_skyline(values)].tolist())
+            assert total == len(rows)
+            # Ordered by the intents' score, best first
+            assert np.all(np.diff(scores) <= 0)
+
+
+def test_objectives_come_from_the_query_or_the_intents():
+    assert detect_objectives("safe and cheap family car") == ["price", "safety"]
+    assert detect_objectives("Show me rare collector cars") == []
+    assert default_objectives(["budget"]) == ("price", "mileage")
+
+    result_cache.clear()
+    assert recommend("safe and cheap family car", mode="pareto")["objectives"] == ["price", "safety"]
+    collector = recommend("Show me rare collector cars", mode="pareto")
+    assert collector["objectives"] == list(default_objectives(["collector"]))
+    response = recommend("Show me rare collector cars", mode="pareto", objectives=["power", "price"])
+    assert response["objectives"] == ["price", "power"]
+    assert "objectives" not in recommend("Show me rare collector cars")
+
+
+def test_pareto_endpoint():
+    client = app.test_client()
+    body = {"query": "safe and cheap family car under 20 lakh", "mode": "pareto", "top_k": 100}
+    response = client.post("/recommend", json=body)
+    assert response.status_code == 200
+    data = response.get_json()
+    expected = pareto(["family", "budget"], ["price", "safety"], budget=20.0, top_k=100)
+    assert data["objectives"] == ["price", "safety"]
+    assert data["total_matches"] == expected[2]
+    assert len(data["results"]) == len(expected[0])
+    assert all("Pareto-optimal on price, safety" in car["reason"] for car in data["results"])
+
+    for bad in ({"mode": "skyline"}, {"mode": "pareto", "objectives": ["speed"]},
+                {"mode": "pareto", "objectives": []}, {"mode": "rank", "objectives": ["price"]},
+                {"mode": "pareto", "objectives": [["price"]]}, {"mode": "pareto", "objectives": [{"a": 1}]}):
+        response = client.post("/recommend", json=dict(body, **bad))
+        assert response.status_code == 400
+        assert "error" in response.get_json()
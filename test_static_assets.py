@@ -0,0 +1,63 @@
+import gzip
+import os
+
+import static_assets
+from app import app
+from static_assets import AssetStore
+
+
+def test_variants_decode_to_the_file(tmp_path):
+    text = ("body { color: red; }\n" * 200).encode()
+    (tmp_path / "style.css").write_bytes(text)
+    (tmp_path / "tiny.js").write_bytes(b"x=1")
+    (tmp_path / "logo.png").write_bytes(os.urandom(4096))
+    store = AssetStore(tmp_path)
+
+    css = store.get("style.css")
+    assert css.mimetype == "text/css"
+    assert gzip.decompress(css.variants["gzip"][0]) == text
+    if static_assets.brotli is not None:
+        assert static_assets.brotli.decompress(css.variants["br"][0]) == text
+    assert len({etag for _, etag in css.variants.values()}) == len(css.variants)
+
+    # Too small, or not text: served as is
+    assert list(store.get("tiny.js").variants) == [None]
+    assert list(store.get("logo.png").variants) == [None]
+
+
+def test_edited_files_are_reloaded_and_nothing_outside_root_is_served(tmp_path):
+    (tmp_path / "public").mkdir()
+    (tmp_path / "secret.txt").write_text("secret")
+    page = tmp_path / "public" / "index.html"
+    page.write_text("old")
+    store = AssetStore(tmp_path / "public")
+
+    first = store.get("index.html")
+    assert store.get("index.html") is first
+    page.write_text("new page")
+    assert store.get("index.html").variants[None][0] == b"new page"
+
+    assert store.get("../secret.txt") is None
+    assert store.get("missing.html") is None
+    assert store.get("") is None
+
+
+def test_static_routes_negotiate_encoding_and_revalidate():
+    client = app.test_client()
+    plain = client.get("/static/js/app.js", headers={"Accept-Encoding": "identity"})
+    assert plain.status_code == 200 and "Content-Encoding" not in plain.headers
+    assert plain.data == open(os.path.join(os.path.dirname(__file__), "static", "js", "app.js"), "rb").read()
+
+    zipped = client.get("/static/js/app.js", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.data) == plain.data
+    assert "Accept-Encoding" in zipped.headers["Vary"]
+    assert zipped.headers["ETag"] != plain.headers["ETag"]
+
+    again = client.get("/static/js/app.js", headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
+
+    home = client.get("/")
+    assert home.status_code == 200 and home.mimetype == "text/html"
+    assert home.headers["Cache-Control"] == "no-cache"
+    assert client.get("/static/nope.js").status_code == 404
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+import app as app_module
+import instrumentation
+from worker_pool import BoundedExecutor, Overloaded
+
+
+def test_inline_without_workers():
+    pool = BoundedExecutor(workers=0, queue=0)
+    assert pool.run(threading.current_thread) is threading.current_thread()
+
+
+def test_runs_on_a_scoring_thread_with_the_callers_timings():
+    pool = BoundedExecutor(workers=2, queue=2)
+
+    def work():
+        with instrumentation.stage("score"):
+            return threading.current_thread().name
+
+    instrumentation.begin_request()
+    try:
+        assert pool.run(work).startswith("scoring")
+    finally:
+        timings = instrumentation.end_request()
+    assert [name for name, _ in timings] == ["score"]
+
+
+def test_refuses_work_beyond_the_queue():
+    pool = BoundedExecutor(workers=1, queue=0)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    busy = threading.Thread(target=pool.run, args=(block,))
+    busy.start()
+    started.wait(5)
+    try:
+        with pytest.raises(Overloaded):
+            pool.run(lambda: None)
+    finally:
+        release.set()
+        busy.join()
+    # Slots come back once the work is done
+    assert pool.run(lambda: 42) == 42
+
+
+def test_busy_server_answers_503(monkeypatch):
+    class Full:
+        def run(self, fn, *args, **kwargs):
+            raise Overloaded()
+
+    monkeypatch.setattr(app_module, "scoring_pool", Full())
+    client = app_module.app.test_client()
+    response = client.post("/recommend", json={"query": "family car"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.post("/recommend/batch", json={"queries": ["suv"]}).status_code == 503
+    # Asking for the NDJSON stream does not get around the bound
+    assert client.post("/recommend", json={"query": "family car", "stream": True}).status_code == 503
+    streamed = client.get("/recommend?query=family+car", headers={"Accept": "application/x-ndjson"})
+    assert streamed.status_code == 503
@@ -0,0 +1,54 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# -------- BOUNDED SCORING POOL ------------
+#
+# Request threads hand the CPU-bound part of a request (parse, rank,
+# format) to a fixed pool of scoring threads. At most `workers` run at once
+# and at most `queue` more wait; anything beyond that is refused straight
+# away with Overloaded, so a burst turns into quick 503s instead of an
+# ever-growing backlog of requests that will time out anyway.
+
+
+class Overloaded(Exception):
+    """Every scoring thread is busy and the wait queue is full."""
+
+
+class BoundedExecutor:
+    """
+    A ThreadPoolExecutor with a bounded queue. With workers=0 calls run
+    inline on the caller's thread, which keeps the dev server and the
+    serverless entry point free of extra threads.
+    """
+
+    def __init__(self, workers, queue):
+        self.workers = workers
+        self.queue = queue
+        self._slots = threading.BoundedSemaphore(workers + queue) if workers else None
+        # Threads are only started on first use, so a preloading master that
+        # never scores forks without any
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scoring") if workers else None
+
+    def run(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) on a scoring thread; blocks until it returns."""
+        if self._pool is None:
+            return fn(*args, **kwargs)
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded()
+        # Same context as the caller, so stage timings reach its request
+        context = contextvars.copy_context()
+
+        def task():
+            try:
+                return context.run(fn, *args, **kwargs)
+            finally:
+                # Before the result is handed back, so the caller's next call finds the slot free
+                self._slots.release()
+
+        try:
+            future = self._pool.submit(task)
+        except BaseException:
+            self._slots.release()
+            raise
+        return future.result()